@@ -0,0 +1,39 @@
+import json
+import os
+import sys
+import timeit
+
+# run from anywhere in a home assistant development environment, integration is imported from this checkout
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.eufy_security import encoder  # noqa: E402
+from custom_components.eufy_security.const import SET_GUARD_MODE_MESSAGE  # noqa: E402
+
+ITERATIONS = 300000
+SERIAL_NUMBER = "T8010P1234567890"
+
+
+def encode_with_copy() -> str:
+    # command path before templates, dict is copied, filled and dumped for every message
+    message = SET_GUARD_MODE_MESSAGE.copy()
+    message["serialNumber"] = SERIAL_NUMBER
+    message["mode"] = 1
+    message["messageId"] = f"{message['messageId']}.1"
+    return json.dumps(message)
+
+
+def encode_with_template() -> str:
+    return encoder.SET_GUARD_MODE_COMMAND.encode(messageId=f"{encoder.SET_GUARD_MODE_COMMAND.message_id}.1", serialNumber=SERIAL_NUMBER, mode=1)
+
+
+def main():
+    # both paths must produce the same message
+    assert json.loads(encode_with_copy()) == json.loads(encode_with_template())
+    backend = "json" if encoder.dumps is json.dumps else "orjson"
+    for label, function in (("copy + json.dumps", encode_with_copy), (f"template ({backend})", encode_with_template)):
+        elapsed = timeit.timeit(function, number=ITERATIONS)
+        print(f"{label:<24} {int(ITERATIONS / elapsed):>10} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import logging
+import os
+from queue import Queue
+import sys
+import timeit
+
+# run from anywhere in a home assistant development environment, integration is imported from this checkout
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.eufy_security.const import DOMAIN  # noqa: E402
+from custom_components.eufy_security.log import LazyPayload  # noqa: E402
+
+FRAME_ITERATIONS = 200000
+MESSAGE_ITERATIONS = 2000
+NAME = "Front Door"
+
+# debug is off, as in a normal installation, so every record is discarded
+logging.basicConfig(level=logging.INFO)
+_LOGGER: logging.Logger = logging.getLogger("custom_components.eufy_security")
+queue: Queue = Queue()
+for index in range(20):
+    queue.put(index)
+payload = {"type": "event", "event": {"source": "device", "event": "property changed", "serialNumber": "T8410P0000000000", "name": "battery", "value": [1] * 2000}}
+
+
+def frame_before():
+    # queue thread logged three f-strings per busy loop iteration
+    for _ in range(3):
+        _LOGGER.debug(f"{DOMAIN} {NAME} - handle_queue_threaded - while - 0 {queue.qsize()} - True - True")
+
+
+def frame_after():
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug("%s %s - handle_queue_threaded - %s - %s %s - %s - %s", DOMAIN, NAME, "drained", 0, queue.qsize(), True, True)
+
+
+def message_before():
+    _LOGGER.debug(f"{DOMAIN} - on_message - {payload}")
+
+
+def message_after():
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug("%s - on_message - %s", DOMAIN, LazyPayload(payload))
+
+
+def main():
+    for label, function, iterations in (
+        ("per frame, before", frame_before, FRAME_ITERATIONS),
+        ("per frame, after", frame_after, FRAME_ITERATIONS),
+        ("per message, before", message_before, MESSAGE_ITERATIONS),
+        ("per message, after", message_after, MESSAGE_ITERATIONS),
+    ):
+        elapsed = timeit.timeit(function, number=iterations)
+        print(f"{label:<22} {elapsed / iterations * 1e9:>10.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
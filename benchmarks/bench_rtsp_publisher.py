@@ -0,0 +1,134 @@
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+# run from anywhere in a home assistant development environment, integration is imported from this checkout
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.eufy_security.metrics import Metrics  # noqa: E402
+from custom_components.eufy_security.rtsp import H264_FU_A, HEVC_FU, RtspPublisher  # noqa: E402
+from custom_components.eufy_security.video import iter_nal_units  # noqa: E402
+
+FPS = 15
+DURATION = 30  # seconds of video per codec
+KEYFRAME_INTERVAL = 15
+KEYFRAME_SIZE = 60000
+FRAME_SIZE = 15000
+
+
+def make_frame(keyframe: bool, size: int, codec: str) -> bytes:
+    # random slice data without start codes, key frames carry parameter sets like p2p frames do
+    body = os.urandom(size).replace(b"\x00\x00", b"\x00\x01")
+    if codec == "hevc":
+        if keyframe == True:
+            return b"\x00\x00\x00\x01\x40\x01VPS\x00\x00\x00\x01\x42\x01SPS\x00\x00\x00\x01\x44\x01PPS\x00\x00\x01\x26\x01" + body
+        return b"\x00\x00\x00\x01\x02\x01" + body
+    if keyframe == True:
+        return b"\x00\x00\x00\x01\x67\x64\x00\x1fSPS\x00\x00\x00\x01\x68PPS\x00\x00\x01\x65" + body
+    return b"\x00\x00\x00\x01\x41" + body
+
+
+def read_request(stream) -> tuple:
+    lines = []
+    while True:
+        line = stream.readline()
+        if line in (b"\r\n", b""):
+            break
+        lines.append(line.decode().strip())
+    headers = {line.split(":")[0].lower(): line.split(":", 1)[1].strip() for line in lines[1:]}
+    return lines[0].split(" ")[0], headers, stream.read(int(headers.get("content-length", 0)))
+
+
+def reassemble(payload: bytes, codec: str, fragment: bytearray):
+    # returns nal unit when payload completes one, fragment collects fragmentation units
+    nal_type = (payload[0] >> 1) & 0x3F if codec == "hevc" else payload[0] & 0x1F
+    if (codec == "h264" and nal_type != H264_FU_A) or (codec == "hevc" and nal_type != HEVC_FU):
+        return bytes(payload)
+    header_length = 3 if codec == "hevc" else 2
+    fu_header = payload[header_length - 1]
+    if fu_header & 0x80:
+        fragment.clear()
+        if codec == "hevc":
+            fragment.extend(((payload[0] & 0x81) | ((fu_header & 0x3F) << 1), payload[1]))
+        else:
+            fragment.append((payload[0] & 0xE0) | (fu_header & 0x1F))
+    fragment.extend(payload[header_length:])
+    return bytes(fragment) if fu_header & 0x40 else None
+
+
+# stand-in for rtsp add-on, accepts one publisher and collects its nal units
+def serve(listen_socket: socket.socket, codec: str, result: dict):
+    connection, _ = listen_socket.accept()
+    stream = connection.makefile("rb")
+    result["methods"] = []
+    for _ in range(3):
+        method, headers, body = read_request(stream)
+        result["methods"].append(method)
+        if method == "ANNOUNCE":
+            result["sdp"] = body.decode()
+        connection.sendall(f"RTSP/1.0 200 OK\r\nCSeq: {headers['cseq']}\r\nSession: 1234;timeout=60\r\n\r\n".encode())
+    result["nal_units"] = []
+    fragment = bytearray()
+    while True:
+        header = stream.read(4)
+        if len(header) < 4:
+            break
+        if header[:1] != b"$":
+            # teardown after last packet
+            result["methods"].append((header + stream.readline()).decode().split(" ")[0])
+            break
+        packet = stream.read(struct.unpack("!H", header[2:])[0])
+        nal_unit = reassemble(packet[12:], codec, fragment)
+        if not nal_unit is None:
+            result["nal_units"].append(nal_unit)
+    connection.close()
+
+
+def run_publisher(codec: str, frames: list):
+    listen_socket = socket.socket()
+    listen_socket.bind(("127.0.0.1", 0))
+    listen_socket.listen(1)
+    result = {}
+    server = threading.Thread(target=serve, args=(listen_socket, codec, result))
+    server.start()
+    metrics = Metrics()
+    publisher = RtspPublisher("bench", f"rtsp://127.0.0.1:{listen_socket.getsockname()[1]}/SERIAL", metrics)
+    publisher.start()
+    started_at = time.process_time()
+    for index, frame in enumerate(frames):
+        publisher.publish(frame, codec, index / FPS)
+    cpu = time.process_time() - started_at
+    publisher.teardown(*publisher.stop())
+    server.join()
+    listen_socket.close()
+
+    expected = [bytes(nal_unit) for frame in frames for nal_unit in iter_nal_units(frame)]
+    print(f"{codec}: {' '.join(result['methods'])} - nal units {'match' if result['nal_units'] == expected else 'MISMATCH'} - {dict(metrics.counters)}")
+    print(f"  {len(frames)} frames: cpu {cpu * 1000:.1f} ms, {cpu / DURATION * 100:.3f}% of a core per stream")
+
+
+def run_pipe(frames: list):
+    # only the in-process part of the ffmpeg relay, its own demuxing and muxing comes on top
+    process = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    started_at = time.process_time()
+    for frame in frames:
+        process.stdin.write(frame)
+    cpu = time.process_time() - started_at
+    process.stdin.close()
+    process.wait()
+    print(f"pipe to relay process: cpu {cpu * 1000:.1f} ms")
+
+
+def main():
+    for codec in ("h264", "hevc"):
+        frames = [make_frame(index % KEYFRAME_INTERVAL == 0, KEYFRAME_SIZE if index % KEYFRAME_INTERVAL == 0 else FRAME_SIZE, codec) for index in range(FPS * DURATION)]
+        run_publisher(codec, frames)
+    run_pipe(frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,44 @@ from datetime import timedelta
 import logging
 
 import asyncio
+import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import Config
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers import aiohttp_client
+import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.aiohttp_client import async_create_clientsession
 from homeassistant.helpers.event import async_call_later, async_track_time_interval
 
+from .const import BATCH_COMMANDS, BATCH_COMPLETED_EVENT, DEFAULT_BATCH_CONCURRENCY
 from .const import CONF_PORT, CONF_HOST, DOMAIN, PLATFORMS, DEFAULT_SYNC_INTERVAL, CONF_USE_RTSP_SERVER_ADDON, DEFAULT_USE_RTSP_SERVER_ADDON, CONF_SYNC_INTERVAL, DEFAULT_SYNC_INTERVAL
 from .coordinator import EufySecurityDataUpdateCoordinator
+from .llhls import LowLatencyHlsView
+from .webrtc import WebRtcView
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
+BATCH_SCHEMA = vol.Schema(
+    {
+        vol.Required("commands"): vol.All(
+            cv.ensure_list,
+            [
+                vol.Schema(
+                    {
+                        vol.Required("command"): vol.In(list(BATCH_COMMANDS.keys())),
+                        vol.Required("serial_number"): cv.string,
+                        vol.Optional("value"): vol.Any(bool, int, cv.string),
+                    }
+                )
+            ],
+        ),
+        vol.Optional("max_concurrency", default=DEFAULT_BATCH_CONCURRENCY): vol.All(vol.Coerce(int), vol.Range(min=1, max=64)),
+    }
+)
+PROFILE_SCHEMA = vol.Schema({vol.Optional("duration", default=30): vol.All(vol.Coerce(float), vol.Range(min=1, max=600))})
+
 
 async def async_setup(hass: HomeAssistant, config: Config):
     if DOMAIN not in hass.data:
@@ -32,8 +56,21 @@ async def async_setup(hass: HomeAssistant, config: Config):
         coordinator: EufySecurityDataUpdateCoordinator = hass.data[DOMAIN]
         await coordinator.async_refresh()
 
+    async def async_handle_batch(call):
+        coordinator: EufySecurityDataUpdateCoordinator = hass.data[DOMAIN]
+        summary = await coordinator.async_send_batch(call.data["commands"], call.data["max_concurrency"])
+        hass.bus.async_fire(BATCH_COMPLETED_EVENT, summary)
+
     hass.services.async_register(DOMAIN, "force_sync", async_force_sync)
+    async def async_handle_profile(call):
+        coordinator: EufySecurityDataUpdateCoordinator = hass.data[DOMAIN]
+        await coordinator.profiler.async_profile(call.data["duration"])
+
+    hass.services.async_register(DOMAIN, "batch", async_handle_batch, schema=BATCH_SCHEMA)
+    hass.services.async_register(DOMAIN, "profile", async_handle_profile, schema=PROFILE_SCHEMA)
     hass.services.async_register(DOMAIN, "send_message", async_handle_send_message)
+    hass.http.register_view(LowLatencyHlsView(hass))
+    hass.http.register_view(WebRtcView(hass))
     return True
 
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry):
@@ -41,9 +78,10 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry):
         hass.data.setdefault(DOMAIN, {})
 
     coordinator: EufySecurityDataUpdateCoordinator = EufySecurityDataUpdateCoordinator(hass, config_entry)
+    if not coordinator.video_worker_pool is None:
+        await hass.async_add_executor_job(coordinator.video_worker_pool.start)
 
-    await coordinator.initialize_ws()
-    await coordinator.async_refresh()
+    await coordinator.async_initialize()
 
     _LOGGER.debug(f"{DOMAIN} - coordinator initialized - {coordinator.data}")
 
@@ -71,6 +109,11 @@ async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
         )
     )
     if unloaded:
+        coordinator.lanes.stop()
+        if not coordinator.ws is None:
+            await coordinator.ws.async_close()
+        if not coordinator.video_worker_pool is None:
+            await hass.async_add_executor_job(coordinator.video_worker_pool.shutdown)
         hass.data[DOMAIN] = []
 
     return unloaded
@@ -0,0 +1,106 @@
+import logging
+
+import shlex
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .ffmpeg_process import FrameWriter, ManagedFFmpeg
+from .llhls import FFMPEG_LLHLS_OUTPUT, LowLatencyPlaylist
+from .metrics import Metrics
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+ABR_LOW_SUFFIX = "_low"  # low variant playlist is served under serial number with this suffix
+ABR_QUERY = "abr"  # marks playlist requests of master playlist viewers, home assistant stream does not send it
+ABR_IDLE_TIMEOUT = 15  # seconds without a playlist request before a variant is no longer consumed
+ABR_HIGH_BANDWIDTH = 2000000  # bits per second, announced for passthrough variant until a segment is complete
+# video bitrate in kbit/s by height of low variant
+ABR_LOW_BITRATES = {240: 300, 360: 500, 480: 800}
+# p2p frames are decoded once, scaled and encoded again, output is fragmented mp4 like passthrough ll-hls output
+# a key frame every second lets every segment start on one
+FFMPEG_ABR_COMMAND = (
+    "-y -framerate {video_fps} -f {video_codec} -i -"
+    " -an -vf scale=-2:{height} -c:v libx264 -preset veryfast -tune zerolatency -profile:v main"
+    " -b:v {bitrate}k -maxrate {bitrate}k -bufsize {buffer_size}k -g {video_fps} -sc_threshold 0"
+    " -nostats -progress pipe:2 -loglevel {loglevel} "
+) + FFMPEG_LLHLS_OUTPUT
+
+
+# low resolution variant of a camera next to its passthrough ll-hls playlist
+# fed from camera's frame listeners, its ffmpeg runs only while master playlist viewers request variant playlist
+class LowResolutionVariant:
+    def __init__(self, hass: HomeAssistant, name: str, binary: str, metrics: Metrics, height: int, part_duration: int, loglevel: str) -> None:
+        self.hass: HomeAssistant = hass
+        self.name: str = f"{name} {height}p"
+        self.metrics: Metrics = metrics
+        self.height: int = height
+        self.part_duration: int = part_duration
+        self.loglevel: str = loglevel
+        self.playlist: LowLatencyPlaylist = LowLatencyPlaylist(self.name, part_duration / 1000)
+        # progress gauges of this ffmpeg are kept apart from camera's own ffmpeg
+        self.ffmpeg: ManagedFFmpeg = ManagedFFmpeg(hass, self.name, binary, Metrics(), on_output=self.playlist.feed)
+        # frames are written to ffmpeg on a thread of their own, video thread only queues them
+        self.writer: FrameWriter = FrameWriter(self.name, self.ffmpeg, metrics, "abr")
+        self.codec: str = None
+        self.requested_at: float = None
+
+    @property
+    def bitrate(self) -> int:
+        return ABR_LOW_BITRATES.get(self.height, ABR_LOW_BITRATES[360])
+
+    @property
+    def is_running(self) -> bool:
+        return self.ffmpeg.is_running
+
+    def is_requested(self) -> bool:
+        return not self.requested_at is None and time.monotonic() - self.requested_at < ABR_IDLE_TIMEOUT
+
+    async def async_start(self, codec: str, fps: int) -> bool:
+        _LOGGER.debug(f"{DOMAIN} {self.name} - abr - start variant - codec {codec} - fps {fps}")
+        self.codec = codec
+        self.playlist.start_stream()
+        arguments = FFMPEG_ABR_COMMAND.format(
+            video_fps=fps,
+            video_codec=codec,
+            height=self.height,
+            bitrate=self.bitrate,
+            buffer_size=2 * self.bitrate,
+            loglevel=self.loglevel,
+            part_duration=self.part_duration * 1000,
+        )
+        started = await self.ffmpeg.async_open(shlex.split(arguments))
+        if started == True:
+            self.writer.start()
+            self.metrics.increment("abr_starts")
+        return started
+
+    def stop(self):
+        self.writer.stop()
+        if self.ffmpeg.is_running == True:
+            _LOGGER.debug(f"{DOMAIN} {self.name} - abr - stop variant")
+            self.ffmpeg.kill()
+
+    def on_frame(self, frame_bytes, codec: str):
+        # called on camera video thread, before frame is relayed to passthrough ffmpeg
+        if self.ffmpeg.is_running == False:
+            return
+        if codec != self.codec:
+            # camera restarts variant with new codec
+            self.metrics.increment("abr_frames_dropped")
+            return
+        self.writer.put(frame_bytes, codec)
+
+    def get_master_playlist(self, passthrough: LowLatencyPlaylist, serial_number: str) -> str:
+        # variant uris carry abr query, so their requests keep stream and low variant running
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:9",
+            "#EXT-X-INDEPENDENT-SEGMENTS",
+            f"#EXT-X-STREAM-INF:BANDWIDTH={passthrough.get_peak_bitrate(ABR_HIGH_BANDWIDTH)}",
+            f"playlist.m3u8?token={passthrough.token}&{ABR_QUERY}=1",
+            f"#EXT-X-STREAM-INF:BANDWIDTH={self.playlist.get_peak_bitrate(self.bitrate * 1000)}",
+            f"../{serial_number}{ABR_LOW_SUFFIX}/playlist.m3u8?token={self.playlist.token}&{ABR_QUERY}=1",
+        ]
+        return "\n".join(lines) + "\n"
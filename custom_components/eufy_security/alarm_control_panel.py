@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import voluptuous as vol
 from decimal import Decimal
@@ -61,13 +60,13 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
     async_add_devices(entities, True)
     # register entity level services
     platform = entity_platform.async_get_current_platform()
-    platform.async_register_entity_service("alarm_guard_schedule", {}, "alarm_guard_schedule")
-    platform.async_register_entity_service("alarm_arm_custom1", {}, "alarm_arm_custom1")
-    platform.async_register_entity_service("alarm_arm_custom2", {}, "alarm_arm_custom2")
-    platform.async_register_entity_service("alarm_arm_custom3", {}, "alarm_arm_custom3")
-    platform.async_register_entity_service("alarm_guard_geo", {}, "alarm_guard_geo")
-    platform.async_register_entity_service("alarm_trigger_with_duration", ALARM_TRIGGER_SCHEMA, "alarm_trigger_with_duration")
-    platform.async_register_entity_service("reset_alarm", {}, "reset_alarm")
+    platform.async_register_entity_service("alarm_guard_schedule", {}, "async_alarm_guard_schedule")
+    platform.async_register_entity_service("alarm_arm_custom1", {}, "async_alarm_arm_custom1")
+    platform.async_register_entity_service("alarm_arm_custom2", {}, "async_alarm_arm_custom2")
+    platform.async_register_entity_service("alarm_arm_custom3", {}, "async_alarm_arm_custom3")
+    platform.async_register_entity_service("alarm_guard_geo", {}, "async_alarm_guard_geo")
+    platform.async_register_entity_service("alarm_trigger_with_duration", ALARM_TRIGGER_SCHEMA, "async_alarm_trigger_with_duration")
+    platform.async_register_entity_service("reset_alarm", {}, "async_reset_alarm")
 
 
 
@@ -78,41 +77,46 @@ class EufySecurityAlarmControlPanel(EufySecurityEntity, AlarmControlPanelEntity)
         self._attr_code_arm_required = False
         self._attr_supported_features = SUPPORT_ALARM_ARM_HOME | SUPPORT_ALARM_ARM_AWAY | SUPPORT_ALARM_TRIGGER
 
-    async def set_guard_mode(self, target_mode: str):
-        await self.coordinator.async_set_guard_mode(self.device.serial_number, STATES_TO_CODES[target_mode])
+    async def async_set_guard_mode(self, target_mode: str):
+        # state follows currentMode, station's effective mode, schedule and geo resolve into another mode
+        # so only modes that become effective as they are shown ahead of station
+        if target_mode in (STATE_GUARD_SCHEDULE, STATE_GUARD_GEO):
+            await self.coordinator.async_set_guard_mode(self.device.serial_number, STATES_TO_CODES[target_mode])
+            return
+        await self.async_send_optimistic("currentMode", STATES_TO_CODES[target_mode], self.coordinator.async_set_guard_mode(self.device.serial_number, STATES_TO_CODES[target_mode]))
 
-    def alarm_disarm(self, code) -> None:
-        asyncio.run_coroutine_threadsafe(self.set_guard_mode(STATE_ALARM_DISARMED), self.coordinator.hass.loop).result()
+    async def async_alarm_disarm(self, code=None) -> None:
+        await self.async_set_guard_mode(STATE_ALARM_DISARMED)
 
-    def alarm_arm_home(self, code) -> None:
-        asyncio.run_coroutine_threadsafe(self.set_guard_mode(STATE_ALARM_ARMED_HOME), self.coordinator.hass.loop).result()
+    async def async_alarm_arm_home(self, code=None) -> None:
+        await self.async_set_guard_mode(STATE_ALARM_ARMED_HOME)
 
-    def alarm_arm_away(self, code) -> None:
-        asyncio.run_coroutine_threadsafe(self.set_guard_mode(STATE_ALARM_ARMED_AWAY), self.coordinator.hass.loop).result()
+    async def async_alarm_arm_away(self, code=None) -> None:
+        await self.async_set_guard_mode(STATE_ALARM_ARMED_AWAY)
 
-    def alarm_guard_schedule(self) -> None:
-        asyncio.run_coroutine_threadsafe(self.set_guard_mode(STATE_GUARD_SCHEDULE), self.coordinator.hass.loop).result()
+    async def async_alarm_guard_schedule(self) -> None:
+        await self.async_set_guard_mode(STATE_GUARD_SCHEDULE)
 
-    def alarm_arm_custom1(self) -> None:
-        asyncio.run_coroutine_threadsafe(self.set_guard_mode(STATE_ALARM_CUSTOM1), self.coordinator.hass.loop).result()
+    async def async_alarm_arm_custom1(self) -> None:
+        await self.async_set_guard_mode(STATE_ALARM_CUSTOM1)
 
-    def alarm_arm_custom2(self) -> None:
-        asyncio.run_coroutine_threadsafe(self.set_guard_mode(STATE_ALARM_CUSTOM2), self.coordinator.hass.loop).result()
+    async def async_alarm_arm_custom2(self) -> None:
+        await self.async_set_guard_mode(STATE_ALARM_CUSTOM2)
 
-    def alarm_arm_custom3(self) -> None:
-        asyncio.run_coroutine_threadsafe(self.set_guard_mode(STATE_ALARM_CUSTOM3), self.coordinator.hass.loop).result()
+    async def async_alarm_arm_custom3(self) -> None:
+        await self.async_set_guard_mode(STATE_ALARM_CUSTOM3)
 
-    def alarm_guard_geo(self) -> None:
-        asyncio.run_coroutine_threadsafe(self.set_guard_mode(STATE_GUARD_GEO), self.coordinator.hass.loop).result()
+    async def async_alarm_guard_geo(self) -> None:
+        await self.async_set_guard_mode(STATE_GUARD_GEO)
 
-    def alarm_trigger(self, code) -> None:
-        asyncio.run_coroutine_threadsafe(self.coordinator.async_trigger_alarm(self.device.serial_number), self.coordinator.hass.loop).result()
+    async def async_alarm_trigger(self, code=None) -> None:
+        await self.coordinator.async_trigger_alarm(self.device.serial_number)
 
-    def alarm_trigger_with_duration(self, duration: int = 10) -> None:
-        asyncio.run_coroutine_threadsafe(self.coordinator.async_trigger_alarm(self.device.serial_number, duration), self.coordinator.hass.loop).result()
+    async def async_alarm_trigger_with_duration(self, duration: int = 10) -> None:
+        await self.coordinator.async_trigger_alarm(self.device.serial_number, duration)
 
-    def reset_alarm(self) -> None:
-        asyncio.run_coroutine_threadsafe(self.coordinator.async_reset_alarm(self.device.serial_number), self.coordinator.hass.loop).result()
+    async def async_reset_alarm(self) -> None:
+        await self.coordinator.async_reset_alarm(self.device.serial_number)
 
     @property
     def id(self):
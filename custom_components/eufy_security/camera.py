@@ -1,29 +1,48 @@
 import logging
 
 import asyncio
+from datetime import timedelta
+from functools import partial
 import traceback
-from queue import Queue
+from queue import Empty, Queue
 import threading
+import time
 import os
+import shlex
 
 from time import sleep
 
-from haffmpeg.camera import CameraMjpeg
 from haffmpeg.tools import IMAGE_JPEG, ImageFrame
 from homeassistant.components.camera import Camera
 from homeassistant.components.camera import SUPPORT_ON_OFF, SUPPORT_STREAM
 from homeassistant.components.ffmpeg import DATA_FFMPEG
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import SERVER_PORT
 from homeassistant.components.stream import Stream, create_stream
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_call_later
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
 from homeassistant.helpers import config_validation as cv, entity_platform
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.network import NoURLAvailableError, get_url
 
 from .const import DEFAULT_CODEC, DOMAIN, NAME, START_LIVESTREAM_AT_INITIALIZE, Device, DEFAULT_FFMPEG_ANALYZE_DURATION
-from .const import wait_for_value
+from .const import STREAM_START_TIMEOUT, CLIP_RECORDED_EVENT, CLIPS_DIRECTORY, MOSAIC_DIRECTORY, RTSP_RELAY_NATIVE
+from .abr import ABR_IDLE_TIMEOUT, ABR_LOW_SUFFIX, ABR_QUERY, LowResolutionVariant
 from .entity import EufySecurityEntity
+from .ffmpeg_process import ManagedFFmpeg
+from .llhls import FFMPEG_LLHLS_OUTPUT, LowLatencyPlaylist
+from .log import LazyPayload
+from .mjpeg import MJPEG_IMAGE_TIMEOUT, MjpegStream
+from .mosaic import TILE_EMPTY, TILE_LIVE, TILE_PICTURE, MosaicCompositor
+from .pacer import FramePacer
+from .recorder import ClipRecorder
+from .rtsp import RtspPublisher
+from .stream_session import StreamSession, CONSUMER_PREWARM, CONSUMER_RECORDER, CONSUMER_RING, CONSUMER_SERVICE, CONSUMER_SNAPSHOT, CONSUMER_VIEWER, CONSUMER_WEBRTC, CONSUMER_ABR, CONSUMER_MJPEG
 from .coordinator import EufySecurityDataUpdateCoordinator
+from .video import DEFAULT_VIDEO_FPS, is_keyframe
+from .video_worker import VideoChannel
+from .webrtc import WebRtcOutput, is_webrtc_available
 
 STATE_IDLE = "Idle"
 STATE_STREAMING = "Streaming"
@@ -33,8 +52,19 @@ STATE_LIVE_STREAMING = "livestream started"
 STREAMING_SOURCE_RTSP = "rtsp"
 STREAMING_SOURCE_P2P = "p2p"
 EMPTY_QUEUE_COUNTER_LIMIT = 10
+QUEUE_POLL_INTERVAL = 0.25  # seconds
+# full property refresh is reported as "properties"
+STREAMING_PROPERTIES = ["rtspStream", "rtspUrl", "liveStreamingStatus", "properties"]
+PREWARM_PROPERTIES = ["motionDetected", "personDetected", "ringing"]
+VIEWER_CHECK_INTERVAL = timedelta(seconds=30)
+FFMPEG_WATCHDOG_INTERVAL = timedelta(seconds=1)
+ABR_CHECK_INTERVAL = timedelta(seconds=2)
+MOSAIC_CHECK_INTERVAL = timedelta(seconds=10)
+# changes of these properties change inputs of mosaic
+MOSAIC_RESTART_PROPERTIES = ["is_streaming", "pictureUrl"]
 FFMPEG_COMMAND = [
     "-y",
+    "-framerate", "{video_fps}",
     "-analyzeduration", "{analyze_duration}",
     "-protocol_whitelist", "pipe,file,tcp",
     "-f", "{video_codec}",
@@ -42,21 +72,25 @@ FFMPEG_COMMAND = [
     "-vcodec", "copy",
     "-protocol_whitelist", "pipe,file,tcp,udp,rtsp,rtp",
 ]
-FFMPEG_OPTIONS = (
+FFMPEG_HLS_OPTIONS = (
     " -hls_init_time 0"
     " -hls_time 1"
     " -hls_segment_type mpegts"
     " -hls_playlist_type event "
     " -hls_list_size 2"
+)
+FFMPEG_OPTIONS = (
     " -preset ultrafast"
     " -tune zerolatency"
     " -g 15"
     " -sc_threshold 0"
     " -fflags genpts+nobuffer+flush_packets"
-    " -loglevel debug"
-    " -report"
+    " -nostats"
+    " -progress pipe:2"
 )
 
+FFMPEG_ERROR_LINES = 20
+
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
 
@@ -70,6 +104,12 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
             camera: EufySecurityCamera = EufySecurityCamera(coordinator, config_entry, device)
             entities.append(camera)
 
+    # one grid of selected cameras for wall displays, instead of a player per camera
+    if coordinator.config.mosaic == True:
+        selected = [camera for camera in entities if len(coordinator.config.mosaic_cameras) == 0 or camera.device.serial_number in coordinator.config.mosaic_cameras]
+        if len(selected) > 0:
+            entities.append(EufySecurityMosaicCamera(coordinator, config_entry, selected))
+
     _LOGGER.debug(f"{DOMAIN} - camera setup entries - {entities}")
     async_add_devices(entities, True)
 
@@ -96,22 +136,59 @@ class EufySecurityCamera(EufySecurityEntity, Camera):
         self.stop_stream_function = self.async_stop_livestream
         self.queue: Queue = Queue()
         self.empty_queue_counter = 0
+        # frames are written on a constant rate schedule, bursts of p2p frames are smoothed
+        self.pacer: FramePacer = FramePacer(self.device.metrics)
+        # called on video thread with every p2p frame before it is paced and written to ffmpeg
+        self.frame_listeners: list = []
+        self.recorder: ClipRecorder = None
+
+        # stream started ahead of viewers or held for recorder on motion / person / ring events
+        self.hold_stop_callbacks: dict = {}
+        self.viewer_check_callback = None
+        self.stream_requested_at: float = None
+        self.stream_requested_by: str = None
 
         # video generation using ffmpeg for p2p
         self.ffmpeg_binary = self.coordinator.hass.data[DATA_FFMPEG].binary
-        self.ffmpeg = CameraMjpeg(self.ffmpeg_binary)
+        self.ffmpeg = ManagedFFmpeg(self.coordinator.hass, self.device.name, self.ffmpeg_binary, self.device.metrics, write_timeout=self.coordinator.config.ffmpeg_stall_timeout)
+        self.device.ffmpeg_log = self.ffmpeg.log
+        # restarted ffmpeg is fed from next key frame on, frames before it can not be decoded
+        self.wait_for_keyframe: bool = False
+        self.ffmpeg_watchdog_callback = None
+        self.ffmpeg_restarting: bool = False
+        # watchdog and codec or frame rate changes restart ffmpeg, one restart runs at a time
+        self.ffmpeg_restart_lock: asyncio.Lock = asyncio.Lock()
+        self.ffmpeg_fps: int = None
         self.default_codec = DEFAULT_CODEC
 
+        # native relay publishes frames to rtsp add-on itself, without an ffmpeg process in between
+        self.rtsp_publisher: RtspPublisher = None
+        self.llhls_playlist: LowLatencyPlaylist = None
         if self.coordinator.config.use_rtsp_server_addon == True:
             self.p2p_url = f"rtsp://{self.coordinator.config.rtsp_server_address}:{self.coordinator.config.rtsp_server_port}/{self.device.serial_number}"
             self.ffmpeg_output = f"-f rtsp -rtsp_transport tcp {self.p2p_url}"
+            if self.coordinator.config.rtsp_relay == RTSP_RELAY_NATIVE:
+                self.rtsp_publisher = RtspPublisher(self.device.name, self.p2p_url, self.device.metrics)
+        elif self.coordinator.config.llhls == True:
+            # ll-hls parts are cut from ffmpeg output and served by home assistant, stream component reads them too
+            self.llhls_playlist = LowLatencyPlaylist(self.device.name, self.coordinator.config.llhls_part_duration / 1000)
+            self.coordinator.llhls_playlists[self.device.serial_number] = self.llhls_playlist
+            self.ffmpeg.on_output = self.llhls_playlist.feed
+            self.ffmpeg_output = FFMPEG_LLHLS_OUTPUT.format(part_duration=self.coordinator.config.llhls_part_duration * 1000)
+            self.p2p_url = f"{self.get_internal_url()}/api/{DOMAIN}/llhls/{self.device.serial_number}/playlist.m3u8?token={self.llhls_playlist.token}"
         else:
             self.ffmpeg_output = f"{DOMAIN}-{self.device.serial_number}.m3u8"
             self.p2p_url = self.ffmpeg_output
 
+        # ffmpeg is fed by a worker process through a shared memory ring, instead of this process' video thread
+        # ll-hls output is read back from ffmpeg's stdout, so it needs ffmpeg in this process
+        self.video_channel: VideoChannel = None
+        if not self.coordinator.video_worker_pool is None and self.rtsp_publisher is None and self.llhls_playlist is None:
+            self.video_channel = self.coordinator.video_worker_pool.create_channel(self.device.serial_number)
+
         # when HA started, p2p streaming was active, catch up with p2p streaming
         if self.device.state.get(START_LIVESTREAM_AT_INITIALIZE) == True:
-            async_call_later(self.coordinator.hass, 0, self.async_start_livestream)
+            async_call_later(self.coordinator.hass, 0, self.async_start_livestream_at_initialize)
 
         # for rtsp streaming
         if not self.device.state.get("rtspStream", None) is None:
@@ -123,64 +200,466 @@ class EufySecurityCamera(EufySecurityEntity, Camera):
             if self.device.state["rtspUrl"] is None:
                 async_call_later(self.coordinator.hass, 0, self.async_start_rtsp)
 
+        # viewers, services, pre-warm and snapshots share one stream source
+        self.stream_session: StreamSession = StreamSession(
+            self.coordinator.hass,
+            self.device.name,
+            lambda: self.start_stream_function(),
+            lambda: self.stop_stream_function(),
+            self.coordinator.config.stream_grace_period,
+            # p2p streams are relayed by the station, rtsp streams come directly from the camera
+            self.coordinator.stream_scheduler if self.start_stream_function == self.async_start_livestream else None,
+            self.device.state.get("stationSerialNumber"),
+        )
+        self.stream_session.on_consumers_dropped = self.clear_holds
+
+        # mjpeg clients share one decoder, it is fed with p2p frames or reads rtsp stream itself
+        self.mjpeg: MjpegStream = MjpegStream(
+            self.coordinator.hass,
+            self.device.name,
+            self.ffmpeg_binary,
+            self.device.metrics,
+            self.coordinator.config.mjpeg_fps,
+            self.coordinator.config.ffmpeg_loglevel,
+            self.async_open_mjpeg,
+            self.async_close_mjpeg,
+        )
+        if self.start_stream_function == self.async_start_livestream:
+            self.add_frame_listener(self.mjpeg.on_frame)
+
+        # clips are muxed from p2p frames, rtsp streams never pass through the integration
+        if self.coordinator.config.record_clips == True and self.start_stream_function == self.async_start_livestream:
+            self.recorder = ClipRecorder(
+                self.coordinator.hass,
+                self.device.name,
+                self.device.serial_number,
+                self.ffmpeg_binary,
+                self.coordinator.hass.config.path(CLIPS_DIRECTORY, self.device.serial_number),
+                self.coordinator.config.clip_pre_roll,
+                self.coordinator.config.clip_duration,
+                self.coordinator.config.clip_retention,
+                self.device.metrics,
+                self.on_clip_recorded,
+                lambda: self.device.video_fps,
+            )
+            self.add_frame_listener(self.recorder.add_frame)
+
+        # webrtc peers get p2p h264 frames as they are, without ffmpeg in between
+        self.webrtc: WebRtcOutput = None
+        if self.coordinator.config.webrtc == True and self.start_stream_function == self.async_start_livestream:
+            if is_webrtc_available() == True:
+                self.webrtc = WebRtcOutput(self.coordinator.hass, self.device.name, self.device.metrics, self.async_release_webrtc)
+                self.add_frame_listener(self.webrtc.on_frame)
+                self.coordinator.webrtc_offer_handlers[self.device.serial_number] = self.async_handle_web_rtc_offer
+            else:
+                _LOGGER.error(f"{DOMAIN} {self.name} - webrtc output needs aiortc, it is not installed")
+
+        # low resolution variant next to passthrough ll-hls playlist, both listed in a master playlist
+        self.abr: LowResolutionVariant = None
+        self.abr_requested_at: float = None
+        self.abr_check_callback = None
+        self.abr_checking: bool = False
+        if self.coordinator.config.abr == True and self.start_stream_function == self.async_start_livestream:
+            if not self.llhls_playlist is None:
+                self.abr = LowResolutionVariant(
+                    self.coordinator.hass,
+                    self.device.name,
+                    self.ffmpeg_binary,
+                    self.device.metrics,
+                    self.coordinator.config.abr_height,
+                    self.coordinator.config.llhls_part_duration,
+                    self.coordinator.config.ffmpeg_loglevel,
+                )
+                self.add_frame_listener(self.abr.on_frame)
+                self.coordinator.llhls_playlists[f"{self.device.serial_number}{ABR_LOW_SUFFIX}"] = self.abr.playlist
+                self.llhls_playlist.get_master = partial(self.abr.get_master_playlist, self.llhls_playlist, self.device.serial_number)
+                self.llhls_playlist.on_request = partial(self.on_abr_request, False)
+                self.abr.playlist.on_request = partial(self.on_abr_request, True)
+            else:
+                _LOGGER.error(f"{DOMAIN} {self.name} - abr variants need low latency hls output")
+
     async def async_added_to_hass(self):
         await super().async_added_to_hass()
-        self.coordinator.hass.bus.async_listen(f"{DOMAIN}_{self.device.serial_number}_event_received", self.handle_incoming_video_data)
+        self.async_on_remove(self.mjpeg.stop)
+        if not self.abr is None:
+            self.async_on_remove(self.abr.stop)
+        if not self.webrtc is None:
+            self.async_on_remove(lambda: self.coordinator.hass.async_create_task(self.webrtc.async_close()))
+        self.async_on_remove(self.coordinator.add_video_handler(self.device.serial_number, self.handle_incoming_video_data))
+        self.async_on_remove(self.coordinator.hass.bus.async_listen(f"{DOMAIN}_{self.device.serial_number}_livestream_at_initialize", self.async_start_livestream_at_initialize))
+        self.async_on_remove(self.device.add_listener(self.on_device_change))
+        # initial stream state, later transitions are driven by property changes
+        self.set_is_streaming()
+
+    def on_device_change(self, property_name: str):
+        # stream state machine input, waiters are woken up without delay
+        if property_name in STREAMING_PROPERTIES:
+            self.set_is_streaming()
+        if property_name in PREWARM_PROPERTIES and self.coordinator.config.prewarm_stream == True and self.device.state.get(property_name) == True:
+            # ring is a person waiting at the door, it outranks motion when station slots are limited
+            consumer = CONSUMER_RING if property_name == "ringing" else CONSUMER_PREWARM
+            self.hass.async_create_task(self.async_prewarm(consumer))
+        if property_name in PREWARM_PROPERTIES and not self.recorder is None and self.device.state.get(property_name) == True:
+            self.hass.async_create_task(self.async_record_clip())
+
+    def add_frame_listener(self, listener):
+        self.frame_listeners.append(listener)
+
+        def remove_listener():
+            self.frame_listeners.remove(listener)
+
+        return remove_listener
+
+    async def async_handle_web_rtc_offer(self, offer_sdp: str) -> str:
+        if self.webrtc is None:
+            raise HomeAssistantError(f"{self.name} has no webrtc output")
+        # every peer holds the stream until its connection closes
+        if self.device.is_streaming == False:
+            self.request_stream(CONSUMER_WEBRTC)
+        await self.stream_session.async_acquire(CONSUMER_WEBRTC)
+        try:
+            return await self.webrtc.async_handle_offer(offer_sdp)
+        except HomeAssistantError:
+            await self.stream_session.async_release(CONSUMER_WEBRTC)
+            raise
+
+    async def async_release_webrtc(self):
+        await self.stream_session.async_release(CONSUMER_WEBRTC)
+
+    def on_abr_request(self, low_variant: bool, request):
+        # home assistant stream reads passthrough playlist too, only master playlist viewers are counted
+        if not ABR_QUERY in request.query:
+            return
+        self.abr_requested_at = time.monotonic()
+        if low_variant == True:
+            self.abr.requested_at = self.abr_requested_at
+        if self.abr_checking == False and (self.stream_session.has_consumer(CONSUMER_ABR) == False or (low_variant == True and self.abr.is_running == False)):
+            self.abr_checking = True
+            self.hass.async_create_task(self.async_check_abr())
+
+    async def async_check_abr(self, event_time=None):
+        # master playlist viewers hold the stream, low variant is encoded only while its playlist is requested
+        if not event_time is None and self.abr_checking == True:
+            return
+        self.abr_checking = True
+        try:
+            if self.abr_requested_at is None or time.monotonic() - self.abr_requested_at >= ABR_IDLE_TIMEOUT:
+                _LOGGER.debug(f"{DOMAIN} {self.name} - abr - no viewer left")
+                self.abr.stop()
+                if not self.abr_check_callback is None:
+                    self.abr_check_callback()
+                    self.abr_check_callback = None
+                await self.stream_session.async_release(CONSUMER_ABR)
+                return
+            if self.abr_check_callback is None:
+                self.abr_check_callback = async_track_time_interval(self.hass, self.async_check_abr, ABR_CHECK_INTERVAL)
+            if self.stream_session.has_consumer(CONSUMER_ABR) == False:
+                if self.device.is_streaming == False:
+                    self.request_stream(CONSUMER_ABR)
+                await self.stream_session.async_acquire(CONSUMER_ABR)
+            if self.abr.is_requested() == False:
+                self.abr.stop()
+            elif self.device.is_streaming == True and self.ffmpeg_restarting == False:
+                if self.abr.ffmpeg.has_exited == True or (self.abr.is_running == True and self.abr.ffmpeg.is_stalled(self.coordinator.config.ffmpeg_stall_timeout) == True):
+                    _LOGGER.warning(f"{DOMAIN} {self.name} - abr - variant ffmpeg failed, restarting - last lines: {self.abr.ffmpeg.get_log(5)}")
+                    self.abr.stop()
+                if self.abr.is_running == False:
+                    await self.abr.async_start(self.default_codec, self.device.video_fps or DEFAULT_VIDEO_FPS)
+        except HomeAssistantError as ex:
+            _LOGGER.error(f"{DOMAIN} {self.name} - abr - stream could not be started: {ex}")
+        finally:
+            self.abr_checking = False
+
+    async def handle_async_mjpeg_stream(self, request):
+        return await self.mjpeg.async_handle_request(request)
+
+    async def async_open_mjpeg(self):
+        # every mjpeg client is a viewer, clients together hold the stream once
+        if self.device.is_streaming == False and self.coordinator.config.auto_start_stream == False:
+            return
+        if self.stream_session.has_consumer(CONSUMER_MJPEG) == False:
+            if self.device.is_streaming == False:
+                self.request_stream(CONSUMER_MJPEG)
+            await self.stream_session.async_acquire(CONSUMER_MJPEG)
+        if await self.device.async_wait_for(lambda device: device.is_streaming == True, STREAM_START_TIMEOUT) == False:
+            return
+        if self.device.stream_source_type == STREAMING_SOURCE_P2P:
+            await self.mjpeg.async_start(["-framerate", str(self.device.video_fps or DEFAULT_VIDEO_FPS), "-f", self.default_codec, "-i", "-"], self.default_codec)
+        else:
+            await self.mjpeg.async_start(["-rtsp_transport", "tcp", "-i", self.device.stream_source_address])
+
+    async def async_close_mjpeg(self):
+        await self.stream_session.async_release(CONSUMER_MJPEG)
+
+    def on_clip_recorded(self, clip_path: str):
+        # called on event loop once clip is closed
+        self.coordinator.hass.bus.async_fire(CLIP_RECORDED_EVENT, {"serial_number": self.device.serial_number, "entity_id": self.entity_id, "path": clip_path})
+
+    def request_stream(self, requested_by: str):
+        if self.stream_requested_at is None:
+            self.stream_requested_at = time.monotonic()
+            self.stream_requested_by = requested_by
+
+    def record_first_frame(self):
+        # time from stream request to first p2p frame, or to rtsp url for rtsp streams
+        if not self.stream_requested_at is None:
+            elapsed = time.monotonic() - self.stream_requested_at
+            self.device.metrics.observe("time_to_first_frame", elapsed)
+            self.device.metrics.observe(f"time_to_first_frame.{self.stream_requested_by}", elapsed)
+            self.stream_requested_at = None
+
+    async def async_prewarm(self, consumer: str = CONSUMER_PREWARM):
+        # runs as a background task, a stream that can not be started, eg no free station slot, is only logged
+        try:
+            await self.async_hold_stream(consumer, self.coordinator.config.prewarm_grace_period)
+        except HomeAssistantError as ex:
+            _LOGGER.warning(f"{DOMAIN} {self.name} - prewarm for {consumer} failed - {ex}")
+
+    async def async_record_clip(self):
+        # recorder writes pre-roll right away when stream is already running, otherwise from first key frame
+        self.recorder.trigger()
+        try:
+            await self.async_hold_stream(CONSUMER_RECORDER, self.coordinator.config.clip_duration)
+        except HomeAssistantError as ex:
+            _LOGGER.warning(f"{DOMAIN} {self.name} - clip recording stream failed - {ex}")
+
+    async def async_hold_stream(self, consumer: str, hold_for: int):
+        # session may have dropped consumer since last trigger, eg stream was stopped, then it is acquired again
+        if self.stream_session.has_consumer(consumer) == False:
+            if self.device.is_streaming == False:
+                _LOGGER.debug(f"{DOMAIN} {self.name} - hold stream - start for {consumer}")
+                self.request_stream(consumer)
+            await self.stream_session.async_acquire(consumer)
+        # every new trigger extends the hold
+        if not self.hold_stop_callbacks.get(consumer) is None:
+            self.hold_stop_callbacks.pop(consumer)()
+        self.hold_stop_callbacks[consumer] = async_call_later(self.hass, hold_for, partial(self.async_end_hold, consumer))
+
+    async def async_end_hold(self, consumer: str, executed_at=None):
+        _LOGGER.debug(f"{DOMAIN} {self.name} - hold stream - end for {consumer}")
+        self.hold_stop_callbacks.pop(consumer, None)
+        await self.stream_session.async_release(consumer)
+
+    async def async_acquire_viewer(self):
+        if self.stream_session.has_consumer(CONSUMER_VIEWER) == False:
+            await self.stream_session.async_acquire(CONSUMER_VIEWER)
+        if self.viewer_check_callback is None:
+            self.viewer_check_callback = async_track_time_interval(self.hass, self.async_check_viewer, VIEWER_CHECK_INTERVAL)
+
+    def clear_holds(self):
+        # session dropped every consumer, holds and viewer check have nothing left to release
+        for cancel_hold in self.hold_stop_callbacks.values():
+            cancel_hold()
+        self.hold_stop_callbacks.clear()
+        if not self.viewer_check_callback is None:
+            self.viewer_check_callback()
+            self.viewer_check_callback = None
+
+    async def async_check_viewer(self, event_time=None):
+        # home assistant stream drops its outputs when nobody watches, that is when viewer leaves
+        outputs = {} if self.stream is None else self.stream.outputs()
+        if len(outputs) > 0 and self.stream_session.active == True:
+            return
+        self.viewer_check_callback()
+        self.viewer_check_callback = None
+        await self.stream_session.async_release(CONSUMER_VIEWER)
 
     async def check_and_set_codec(self):
         if self.device.codec != self.default_codec:
             _LOGGER.debug(f"{DOMAIN} {self.name} - set codec - default {self.default_codec} - incoming {self.device.codec}")
             self.default_codec = self.device.codec
-            await self.coordinator.hass.async_add_executor_job(self.stop_ffmpeg)
-            await self.start_ffmpeg()
+            if not self.rtsp_publisher is None:
+                # publisher announces the new codec on next key frame
+                self.mjpeg.stop()
+                return
+            await self.async_restart_ffmpeg()
+        elif self.rtsp_publisher is None and not self.ffmpeg_fps is None and not self.device.video_fps is None and self.device.video_fps != self.ffmpeg_fps:
+            _LOGGER.debug(f"{DOMAIN} {self.name} - set fps - ffmpeg {self.ffmpeg_fps} - incoming {self.device.video_fps}")
+            await self.async_restart_ffmpeg()
+        else:
+            return
+        # mjpeg clients start shared decoder again with new codec and frame rate
+        self.mjpeg.stop()
+        if not self.abr is None:
+            # abr check starts it again with new codec and frame rate
+            self.abr.stop()
+
+    async def async_restart_ffmpeg(self):
+        async with self.ffmpeg_restart_lock:
+            self.ffmpeg_restarting = True
+            try:
+                self.device.metrics.increment("ffmpeg_restarts")
+                self.wait_for_keyframe = True
+                await self.coordinator.hass.async_add_executor_job(self.stop_ffmpeg)
+                await self.start_ffmpeg()
+            finally:
+                self.ffmpeg_restarting = False
+
+    async def async_check_ffmpeg(self, event_time=None):
+        # watchdog of p2p relay, a crashed, failed or hung ffmpeg is restarted instead of leaving stream dead
+        if self.ffmpeg_restarting == True or self.device.is_streaming != True:
+            return
+        reason = None
+        if not self.video_channel is None:
+            if self.video_channel.is_stalled == True:
+                reason = "stalled"
+                self.device.metrics.increment("ffmpeg_stalls")
+            elif self.video_channel.opened == True and self.video_channel.is_running == False:
+                reason = "failed"
+        elif self.ffmpeg.has_exited == True:
+            reason = "exited"
+        elif self.ffmpeg.is_running == True and self.ffmpeg.is_stalled(self.coordinator.config.ffmpeg_stall_timeout) == True:
+            reason = "stalled"
+            self.device.metrics.increment("ffmpeg_stalls")
+        if reason is None:
+            return
+        _LOGGER.warning(f"{DOMAIN} {self.name} - ffmpeg watchdog - {reason}, restarting - last lines: {self.ffmpeg.get_log(5)}")
+        await self.async_restart_ffmpeg()
 
-    async def handle_incoming_video_data(self, event):
+    async def handle_incoming_video_data(self, event_value: dict):
         await self.check_and_set_codec()
-        self.queue.put(event.data)
+        self.device.metrics.increment("frames_in")
+        self.record_first_frame()
+        self.queue.put((time.monotonic(), event_value))
+
+    def log_queue_state(self, step: str):
+        # guarded, arguments of this log are not free to compute
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("%s %s - handle_queue_threaded - %s - %s %s - %s - %s", DOMAIN, self.name, step, self.empty_queue_counter, self.queue.qsize(), self.is_relay_running(), self.device.is_streaming)
 
     def handle_queue_threaded(self):
-        _LOGGER.debug(f"{DOMAIN} {self.name} - handle_queue_threaded - start - {self.queue.qsize()} - {self.ffmpeg.is_running} - {self.device.is_streaming}")
+        self.log_queue_state("start")
+        thread_profile = None
+        self.pacer.reset()
         while self.empty_queue_counter < EMPTY_QUEUE_COUNTER_LIMIT:
-            _LOGGER.debug(f"{DOMAIN} {self.name} - handle_queue_threaded - while - {self.empty_queue_counter} {self.queue.qsize()} - {self.ffmpeg.is_running} - {self.device.is_streaming}")
-            if self.queue.empty() == True or self.ffmpeg.is_running == False:
+            thread_profile = self.coordinator.profiler.update_thread_profile(thread_profile)
+            if self.is_relay_running() == False:
                 self.empty_queue_counter = self.empty_queue_counter + 1
-                _LOGGER.debug(f"{DOMAIN} {self.name} - handle_queue_threaded - sleeping 1 {self.empty_queue_counter} {self.queue.qsize()} - {self.ffmpeg.is_running} - {self.device.is_streaming}")
-            else:
-                while not self.queue.empty() and self.ffmpeg.is_running == True:
-                    self.empty_queue_counter = 0
-                    frame_bytes = bytearray(self.queue.get()["data"])
-                    if not frame_bytes is None:
-                        self.write_bytes_to_ffmeg(frame_bytes)
-                _LOGGER.debug(f"{DOMAIN} {self.name} - handle_queue_threaded - sleeping 2 - {self.empty_queue_counter} {self.queue.qsize()} - {self.ffmpeg.is_running} - {self.device.is_streaming}")
-            _LOGGER.debug(f"{DOMAIN} {self.name} - handle_queue_threaded - sleeping 3 - {self.empty_queue_counter} {self.queue.qsize()} - {self.ffmpeg.is_running} - {self.device.is_streaming}")
-            sleep(0.25)
-        _LOGGER.debug(f"{DOMAIN} {self.name} - handle_queue_threaded - finish - {self.empty_queue_counter} {self.queue.qsize()} - {self.ffmpeg.is_running} - {self.device.is_streaming}")
+                self.log_queue_state("empty")
+                sleep(QUEUE_POLL_INTERVAL)
+                continue
+            try:
+                # frames are taken as they arrive instead of being polled in batches
+                received_at, event_value = self.queue.get(timeout=QUEUE_POLL_INTERVAL)
+            except Empty:
+                self.empty_queue_counter = self.empty_queue_counter + 1
+                self.log_queue_state("empty")
+                continue
+            self.empty_queue_counter = 0
+            frame_bytes = bytearray(event_value["data"])
+            # listeners like webrtc get frame as it arrives, without pacing delay and ffmpeg write
+            self.notify_frame_listeners(frame_bytes)
+            delay, presentation_time = self.pacer.schedule(received_at, self.device.video_fps or DEFAULT_VIDEO_FPS)
+            # rtp packets carry presentation time, only ffmpeg input without timestamps needs frames paced
+            if delay > 0 and self.rtsp_publisher is None:
+                sleep(delay)
+            self.relay_frame(frame_bytes, presentation_time)
+            if not self.video_channel is None and self.queue.empty() == True:
+                self.video_channel.flush()
+        self.log_queue_state("finish")
+        if not self.recorder is None:
+            self.recorder.finish()
+        if not thread_profile is None:
+            self.coordinator.profiler.collect_thread_profile(thread_profile)
 
         if self.empty_queue_counter >= EMPTY_QUEUE_COUNTER_LIMIT and self.device.is_streaming == True:
-            asyncio.run_coroutine_threadsafe(self.async_stop_livestream(), self.coordinator.hass.loop).result()
+            # stopped on event loop, this thread does not wait for the station's answer
+            asyncio.run_coroutine_threadsafe(self.async_stop_idle_stream(), self.coordinator.hass.loop)
             return
 
+    async def async_stop_idle_stream(self):
+        # no p2p frames came in for a while, stream is stopped through session, so its consumers and slot are dropped too
+        _LOGGER.debug(f"{DOMAIN} {self.name} - no frames received, stop stream")
+        try:
+            await self.stream_session.async_stop()
+        except HomeAssistantError as ex:
+            _LOGGER.warning(f"{DOMAIN} {self.name} - stop idle stream failed - {ex}")
+
+    def is_relay_running(self) -> bool:
+        if not self.rtsp_publisher is None:
+            return self.rtsp_publisher.active
+        if not self.video_channel is None:
+            return self.video_channel.is_running
+        return self.ffmpeg.is_running
+
+    def relay_frame(self, frame_bytes, presentation_time: float):
+        if not self.rtsp_publisher is None:
+            self.rtsp_publisher.publish(frame_bytes, self.default_codec, presentation_time)
+            return
+        if self.wait_for_keyframe == True:
+            if is_keyframe(frame_bytes, self.default_codec) == False:
+                self.device.metrics.increment("frames_dropped")
+                return
+            self.wait_for_keyframe = False
+        if not self.video_channel is None:
+            if self.video_channel.write(frame_bytes) == True:
+                self.device.metrics.increment("frames_out")
+            else:
+                self.device.metrics.increment("frames_dropped")
+        else:
+            self.write_bytes_to_ffmeg(frame_bytes)
+
+    def notify_frame_listeners(self, frame_bytes):
+        # same frame object is shared by every listener, listeners must not modify it
+        for listener in self.frame_listeners:
+            try:
+                listener(frame_bytes, self.default_codec)
+            except Exception as ex:
+                _LOGGER.error(f"{DOMAIN} {self.name} - frame listener exception: {ex}- traceback: {traceback.format_exc()}")
+
     def write_bytes_to_ffmeg(self,frame_bytes):
         if self.ffmpeg.is_running == True:
             try:
-                self.ffmpeg.process.stdin.write(frame_bytes)
+                self.ffmpeg.write(frame_bytes)
+                self.device.metrics.increment("frames_out")
+            except (TimeoutError, BrokenPipeError) as ex:
+                # hung or exited ffmpeg, frames are dropped until watchdog restarts it
+                self.device.metrics.increment("frames_dropped")
+                _LOGGER.debug(f"{DOMAIN} {self.name} - video ffmpeg error - {ex}")
             except Exception as ex:
+                self.device.metrics.increment("frames_dropped")
                 _LOGGER.error(f"{DOMAIN} {self.name} video_thread exception: {ex}- traceback: {traceback.format_exc()}")
-                _, ffmpeg_error = self.ffmpeg.process.communicate()
-                if ffmpeg_error is not None:
-                    ffmpeg_error = ffmpeg_error.decode()
-                    _LOGGER.debug(f"{DOMAIN} {self.name} - video ffmpeg error - {ffmpeg_error}")
+                # stderr is already drained into log ring, waiting on process here would block video thread
+                _LOGGER.debug("%s %s - video ffmpeg error - %s", DOMAIN, self.name, LazyPayload(self.ffmpeg.get_log(FFMPEG_ERROR_LINES)))
         else:
+            self.device.metrics.increment("frames_dropped")
             _LOGGER.error(f"{DOMAIN} {self.name} - video ffmpeg error - ffmpeg is not running")
 
-    async def start_ffmpeg(self, executed_at=None):
-        _LOGGER.debug(f"{DOMAIN} {self.name} - start_ffmpeg 1 - codec {self.default_codec}")
+    def get_ffmpeg_command(self) -> list:
         ffmpeg_command_instance = FFMPEG_COMMAND.copy()
         input_index = ffmpeg_command_instance.index("-i")
         ffmpeg_command_instance[input_index - 1] = self.default_codec
         ffmpeg_command_instance[input_index - 5] = str(int(self.coordinator.config.ffmpeg_analyze_duration) * 1000000)
+        # raw h264 / hevc input has no timestamps, demuxer derives them from frame rate instead of its default 25
+        self.ffmpeg_fps = self.device.video_fps or DEFAULT_VIDEO_FPS
+        ffmpeg_command_instance[ffmpeg_command_instance.index("-framerate") + 1] = str(self.ffmpeg_fps)
+        return ffmpeg_command_instance
+
+    def get_internal_url(self) -> str:
+        try:
+            return get_url(self.coordinator.hass, allow_external=False, allow_cloud=False)
+        except NoURLAvailableError:
+            return f"http://127.0.0.1:{SERVER_PORT}"
+
+    def get_ffmpeg_options(self) -> list:
+        ffmpeg_options = shlex.split(FFMPEG_OPTIONS) + ["-loglevel", self.coordinator.config.ffmpeg_loglevel]
+        if self.llhls_playlist is None:
+            ffmpeg_options = shlex.split(FFMPEG_HLS_OPTIONS) + ffmpeg_options
+        if self.coordinator.config.ffmpeg_report == True:
+            ffmpeg_options.append("-report")
+        return ffmpeg_options
+
+    async def start_ffmpeg(self, executed_at=None):
+        _LOGGER.debug(f"{DOMAIN} {self.name} - start_ffmpeg 1 - codec {self.default_codec}")
+        ffmpeg_command_instance = self.get_ffmpeg_command()
         _LOGGER.debug(f"{DOMAIN} {self.name} - start_ffmpeg 2 - ffmpeg_command_instance {ffmpeg_command_instance}")
-        result = await self.ffmpeg.open(cmd=ffmpeg_command_instance, input_source=None, extra_cmd=FFMPEG_OPTIONS, output=self.ffmpeg_output, stderr_pipe=True, stdout_pipe=True)
+        if not self.video_channel is None:
+            # same command line as haffmpeg would build, started by worker process, a dead worker is respawned in executor
+            await self.hass.async_add_executor_job(self.video_channel.open, [self.ffmpeg_binary] + ffmpeg_command_instance + self.get_ffmpeg_options() + shlex.split(self.ffmpeg_output), self.coordinator.config.ffmpeg_stall_timeout)
+            return True
+        if not self.llhls_playlist is None:
+            self.llhls_playlist.start_stream()
+        result = await self.ffmpeg.async_open(ffmpeg_command_instance + self.get_ffmpeg_options() + shlex.split(self.ffmpeg_output))
         _LOGGER.debug(f"{DOMAIN} {self.name} - start_ffmpeg 3 - ffmpeg_command_instance {ffmpeg_command_instance}")
 
         return result
@@ -188,6 +667,9 @@ class EufySecurityCamera(EufySecurityEntity, Camera):
     def stop_ffmpeg(self):
         try:
             _LOGGER.debug(f"{DOMAIN} {self.name} - stop_ffmpeg - 1")
+            if not self.video_channel is None:
+                self.video_channel.close()
+                return
             try:
                 self.ffmpeg.kill()
             except Exception as ex:
@@ -197,32 +679,50 @@ class EufySecurityCamera(EufySecurityEntity, Camera):
             _LOGGER.error(f"{DOMAIN} {self.name} - stop_ffmpeg exception: {ex2}- traceback: {traceback.format_exc()}")
         _LOGGER.debug(f"{DOMAIN} {self.name} - stop_ffmpeg - done")
 
+    def clear_queue(self):
+        self.device.metrics.increment("frames_dropped", self.queue.qsize())
+        self.queue.queue.clear()
+
     def start_p2p(self):
         _LOGGER.debug(f"{DOMAIN} {self.name} - start_p2p - 1")
-        self.queue.queue.clear()
+        self.clear_queue()
         self.empty_queue_counter = 0
-        if self.ffmpeg.is_running == True:
+        if self.ffmpeg.is_running == True or (not self.video_channel is None and self.video_channel.opened == True):
             _LOGGER.debug(f"{DOMAIN} {self.name} - start_p2p - ffmeg - running - stop it")
             self.stop_ffmpeg()
         _LOGGER.debug(f"{DOMAIN} {self.name} - start_p2p - 2")
-        async_call_later(self.hass, 0, self.start_ffmpeg)
+        if not self.rtsp_publisher is None:
+            self.rtsp_publisher.start()
+        else:
+            async_call_later(self.hass, 0, self.start_ffmpeg)
+            if self.ffmpeg_watchdog_callback is None:
+                self.ffmpeg_watchdog_callback = async_track_time_interval(self.hass, self.async_check_ffmpeg, FFMPEG_WATCHDOG_INTERVAL)
         _LOGGER.debug(f"{DOMAIN} {self.name} - start_p2p - 3")
         self.p2p_thread = threading.Thread(target=self.handle_queue_threaded, daemon=True)
         self.p2p_thread.start()
 
     def stop_p2p(self):
-        self.queue.queue.clear()
+        self.clear_queue()
+        if not self.ffmpeg_watchdog_callback is None:
+            self.ffmpeg_watchdog_callback()
+            self.ffmpeg_watchdog_callback = None
         if not self.stream is None:
             self.stream.stop()
             self.stream = None
-        if self.ffmpeg.is_running == True:
+        if self.ffmpeg.is_running == True or (not self.video_channel is None and self.video_channel.opened == True):
             self.stop_ffmpeg()
+        if not self.rtsp_publisher is None:
+            # teardown blocks on a stalled server or a packet in flight, it is sent off event loop
+            self.hass.async_add_executor_job(self.rtsp_publisher.teardown, *self.rtsp_publisher.stop())
+        if not self.abr is None:
+            self.abr.stop()
+        self.mjpeg.stop()
         self.p2p_thread = None
         self.empty_queue_counter = 0
 
     @property
     def state(self) -> str:
-        self.set_is_streaming()
+        # pure read, streaming fields are kept up to date by stream state transitions
         if self.device.is_streaming:
             if not self.device.stream_source_type is None:
                 return f"{STATE_STREAMING} - {self.device.stream_source_type}"
@@ -236,53 +736,80 @@ class EufySecurityCamera(EufySecurityEntity, Camera):
                 return f"{STATE_IDLE} - {self.device.state['battery']} %"
             return STATE_IDLE
 
+    def get_stream_source(self):
+        # stream state is one of idle (None), rtsp or p2p, p2p wins when both are reported
+        if self.device.state.get("liveStreamingStatus") == STATE_LIVE_STREAMING:
+            return STREAMING_SOURCE_P2P, self.p2p_url
+        if self.device.state.get("rtspStream", False) == True and self.device.state.get("rtspUrl"):
+            return STREAMING_SOURCE_RTSP, self.device.state["rtspUrl"]
+        return None, None
+
     def set_is_streaming(self):
-        # based on streaming options, set streaming variables
-        prev_is_streaming = self.device.is_streaming
-        if (self.device.state.get("rtspStream", False) == True or self.device.state["liveStreamingStatus"] == STATE_LIVE_STREAMING):
-            if self.device.state.get("rtspStream", False) == True:
-                if self.device.state["rtspUrl"]:
-                    self.device.stream_source_type = STREAMING_SOURCE_RTSP
-                    self.device.stream_source_address = self.device.state["rtspUrl"]
-                    self.device.is_streaming = True
-            if self.device.state["liveStreamingStatus"] == STATE_LIVE_STREAMING:
-                self.device.stream_source_type = STREAMING_SOURCE_P2P
-                self.device.stream_source_address = self.p2p_url
-                if prev_is_streaming == False:
-                    self.start_p2p()
-                self.device.is_streaming = True
-        else:
-            if prev_is_streaming == True:
-                if self.device.stream_source_type == STREAMING_SOURCE_P2P:
-                    self.stop_p2p()
-            self.device.stream_source_type = None
-            self.device.stream_source_address = None
-            self.device.is_streaming = False
+        # called only when a streaming property changes, side effects run once per transition
+        source_type, source_address = self.get_stream_source()
+        prev_is_streaming = self.device.is_streaming == True
+        prev_source_type = self.device.stream_source_type if prev_is_streaming == True else None
+        if source_type == prev_source_type and source_address == self.device.stream_source_address:
+            return
+
+        _LOGGER.debug(f"{DOMAIN} {self.name} - stream state - {prev_source_type} -> {source_type}")
+        if prev_source_type == STREAMING_SOURCE_P2P and source_type != STREAMING_SOURCE_P2P:
+            self.stop_p2p()
+        if source_type == STREAMING_SOURCE_P2P and prev_source_type != STREAMING_SOURCE_P2P:
+            self.start_p2p()
+        if source_type == STREAMING_SOURCE_RTSP:
+            self.record_first_frame()
+
+        self.device.stream_source_type = source_type
+        self.device.stream_source_address = source_address
+        self.device.is_streaming = not source_type is None
+
+        if prev_is_streaming != self.device.is_streaming:
+            if self.device.is_streaming == True:
+                self.stream_session.on_source_started()
+            else:
+                self.stream_session.on_source_stopped()
+        self.device.notify("is_streaming")
 
     async def initiate_turn_on(self):
-        await self.coordinator.hass.async_add_executor_job(self.turn_on)
-        await wait_for_value(self.device.__dict__, "is_streaming", False, interval=0.1)
+        await self.async_acquire_viewer()
+        await self.device.async_wait_for(lambda device: device.is_streaming == True, STREAM_START_TIMEOUT)
 
     async def stream_source(self):
         _LOGGER.debug(f"{DOMAIN} {self.name} - stream_source - start")
+        started_at = time.monotonic()
+        prewarmed = self.stream_session.has_consumer(CONSUMER_PREWARM) or self.stream_session.has_consumer(CONSUMER_RING)
         if self.device.is_streaming == False:
             if self.coordinator.config.auto_start_stream == False:
                 return None
-            await self.initiate_turn_on()
-            _LOGGER.debug(f"{DOMAIN} {self.name} - stream_source - initiate finished")
+            self.request_stream(CONSUMER_VIEWER)
+        # viewer joins the running stream too, so it is kept after pre-warm grace period
+        await self.initiate_turn_on()
+        _LOGGER.debug(f"{DOMAIN} {self.name} - stream_source - initiate finished")
+        self.device.metrics.observe("stream_source_wait.prewarmed" if prewarmed == True else "stream_source_wait.cold", time.monotonic() - started_at)
         _LOGGER.debug(f"{DOMAIN} {self.name} - stream_source - address - {self.device.stream_source_address}")
         return self.device.stream_source_address
 
-    def camera_image(self, width=None, height=None) -> bytes:
-        return asyncio.run_coroutine_threadsafe(self.async_camera_image(width, height), self.coordinator.hass.loop).result()
-
     async def async_camera_image(self, width=None, height=None) -> bytes:
+        # shared mjpeg decoder already has a recent image, no ffmpeg has to be started for it
+        image = self.mjpeg.get_image(MJPEG_IMAGE_TIMEOUT)
+        if not image is None and width is None and height is None:
+            self.picture_bytes = image
+            return image
         # if streaming is active, do not overwrite live image
         if self.device.is_streaming == True:
             size_command = None
             if width and height:
                 size_command = f"-s {width}x{height}"
-            image_frame_bytes = await ImageFrame(self.ffmpeg_binary).get_image(self.device.stream_source_address, extra_cmd = size_command)
+            started_at = time.monotonic()
+            # hold the running stream while grabbing the frame, snapshots never start a stream
+            acquired = await self.stream_session.async_acquire(CONSUMER_SNAPSHOT, start=False)
+            try:
+                image_frame_bytes = await ImageFrame(self.ffmpeg_binary).get_image(self.device.stream_source_address, extra_cmd = size_command)
+            finally:
+                if acquired == True:
+                    await self.stream_session.async_release(CONSUMER_SNAPSHOT)
+            self.device.metrics.observe("snapshot_latency", time.monotonic() - started_at)
             if (not image_frame_bytes is None) and len(image_frame_bytes) > 0:
                 _LOGGER.debug(f"{DOMAIN} {self.name} - camera_image len - {len(image_frame_bytes)}")
                 self.picture_bytes = image_frame_bytes
@@ -297,15 +824,25 @@ class EufySecurityCamera(EufySecurityEntity, Camera):
                         _LOGGER.debug(f"{DOMAIN} {self.name} - camera_image -{current_picture_url} - {len(self.picture_bytes)}")
         return self.picture_bytes
 
-    def turn_on(self) -> None:
-        asyncio.run_coroutine_threadsafe(self.start_stream_function(), self.coordinator.hass.loop).result()
+    async def async_turn_on(self) -> None:
+        await self.stream_session.async_acquire(CONSUMER_SERVICE)
 
-    def turn_off(self) -> None:
-        asyncio.run_coroutine_threadsafe(self.stop_stream_function(), self.coordinator.hass.loop).result()
+    async def async_turn_off(self) -> None:
+        await self.stream_session.async_stop()
 
     async def async_start_livestream(self, executed_at=None) -> None:
         await self.coordinator.async_set_livestream(self.device.serial_number, "start")
 
+    async def async_start_livestream_at_initialize(self, executed_at=None) -> None:
+        # stream running before restart is held like a started service stream, until it is turned off
+        # it runs as a background callback, a failed catch up is only logged
+        if self.stream_session.has_consumer(CONSUMER_SERVICE) == True:
+            return
+        try:
+            await self.stream_session.async_acquire(CONSUMER_SERVICE)
+        except HomeAssistantError as ex:
+            _LOGGER.warning(f"{DOMAIN} {self.name} - catch up with livestream failed - {ex}")
+
     async def async_stop_livestream(self) -> None:
         await self.coordinator.async_set_livestream(self.device.serial_number, "stop")
 
@@ -316,10 +853,10 @@ class EufySecurityCamera(EufySecurityEntity, Camera):
         await self.coordinator.async_set_rtsp(self.device.serial_number, False)
 
     async def async_enable(self) -> None:
-        await self.coordinator.async_set_device_state(self.device.serial_number, True)
+        await self.async_send_optimistic("enabled", True, self.coordinator.async_set_device_state(self.device.serial_number, True))
 
     async def async_disable(self) -> None:
-        await self.coordinator.async_set_device_state(self.device.serial_number, False)
+        await self.async_send_optimistic("enabled", False, self.coordinator.async_set_device_state(self.device.serial_number, False))
 
     @property
     def id(self):
@@ -356,3 +893,82 @@ class EufySecurityCamera(EufySecurityEntity, Camera):
     @property
     def supported_features(self) -> int:
         return SUPPORT_ON_OFF | SUPPORT_STREAM
+
+
+class EufySecurityMosaicCamera(Camera):
+    def __init__(self, coordinator: EufySecurityDataUpdateCoordinator, config_entry: ConfigEntry, cameras: list):
+        Camera.__init__(self)
+        self.coordinator: EufySecurityDataUpdateCoordinator = coordinator
+        self.entry: ConfigEntry = config_entry
+        self.cameras: list = cameras
+        self.compositor: MosaicCompositor = MosaicCompositor(
+            self.coordinator.hass,
+            "mosaic",
+            self.coordinator.hass.data[DATA_FFMPEG].binary,
+            self.coordinator.metrics,
+            self.coordinator.config.mosaic_fps,
+            self.coordinator.config.ffmpeg_loglevel,
+            self.coordinator.hass.config.path(MOSAIC_DIRECTORY),
+            self.async_get_tiles,
+        )
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        for camera in self.cameras:
+            self.async_on_remove(camera.device.add_listener(self.on_device_change))
+        self.async_on_remove(async_track_time_interval(self.hass, self.compositor.async_check, MOSAIC_CHECK_INTERVAL))
+        self.async_on_remove(self.compositor.stop)
+
+    def on_device_change(self, property_name: str):
+        if property_name in MOSAIC_RESTART_PROPERTIES:
+            self.compositor.schedule_restart()
+
+    async def async_get_tiles(self) -> list:
+        # streaming cameras are read from their stream source, others show their last picture, mosaic never starts a stream
+        tiles = []
+        for camera in self.cameras:
+            if camera.device.is_streaming == True and camera.device.stream_source_address:
+                tiles.append((TILE_LIVE, camera.device.stream_source_address))
+                continue
+            try:
+                picture = await camera.async_camera_image()
+            except Exception as ex:  # pylint: disable=broad-except
+                _LOGGER.debug(f"{DOMAIN} {self.name} - mosaic - picture of {camera.name} failed: {ex}")
+                picture = None
+            if picture is None or len(picture) == 0:
+                tiles.append((TILE_EMPTY, None))
+                continue
+            tiles.append((TILE_PICTURE, await self.hass.async_add_executor_job(self.compositor.write_picture, camera.device.serial_number, picture)))
+        return tiles
+
+    async def async_camera_image(self, width=None, height=None) -> bytes:
+        return await self.compositor.async_get_image()
+
+    @property
+    def frame_interval(self) -> float:
+        # mjpeg stream of home assistant asks for images at this rate
+        return 1 / self.coordinator.config.mosaic_fps
+
+    @property
+    def unique_id(self):
+        return f"{DOMAIN}_mosaic_camera"
+
+    @property
+    def name(self):
+        return f"{NAME} Mosaic"
+
+    @property
+    def brand(self):
+        return NAME
+
+    @property
+    def available(self) -> bool:
+        return not not self.coordinator.data
+
+    @property
+    def should_poll(self) -> bool:
+        return False
+
+    @property
+    def extra_state_attributes(self):
+        return {"cameras": [camera.device.serial_number for camera in self.cameras], "running": self.compositor.is_running}
@@ -10,6 +10,17 @@ from homeassistant.helpers.aiohttp_client import async_create_clientsession
 
 from .const import CONF_AUTO_START_STREAM, CONF_PORT, CONF_HOST, DEFAULT_AUTO_START_STREAM, DEFAULT_HOST, DEFAULT_PORT, DOMAIN, CONF_USE_RTSP_SERVER_ADDON, CONF_FFMPEG_ANALYZE_DURATION, DEFAULT_FFMPEG_ANALYZE_DURATION, DEFAULT_SYNC_INTERVAL, CONF_SYNC_INTERVAL, DEFAULT_USE_RTSP_SERVER_ADDON
 from .const import CONF_RTSP_SERVER_ADDRESS, DEFAULT_RTSP_SERVER_PORT, CONF_RTSP_SERVER_PORT
+from .const import CONF_SEND_RATE_LIMIT, DEFAULT_SEND_RATE_LIMIT, CONF_DIAGNOSTIC_SENSORS, DEFAULT_DIAGNOSTIC_SENSORS
+from .const import CONF_PREWARM_STREAM, DEFAULT_PREWARM_STREAM, CONF_PREWARM_GRACE_PERIOD, DEFAULT_PREWARM_GRACE_PERIOD
+from .const import CONF_STREAM_GRACE_PERIOD, DEFAULT_STREAM_GRACE_PERIOD, CONF_MAX_P2P_STREAMS, DEFAULT_MAX_P2P_STREAMS
+from .const import CONF_RTSP_RELAY, DEFAULT_RTSP_RELAY, RTSP_RELAY_FFMPEG, RTSP_RELAY_NATIVE, CONF_VIDEO_WORKERS, DEFAULT_VIDEO_WORKERS
+from .const import CONF_RECORD_CLIPS, DEFAULT_RECORD_CLIPS, CONF_CLIP_PRE_ROLL, DEFAULT_CLIP_PRE_ROLL
+from .const import CONF_CLIP_DURATION, DEFAULT_CLIP_DURATION, CONF_CLIP_RETENTION, DEFAULT_CLIP_RETENTION
+from .const import CONF_FFMPEG_LOGLEVEL, DEFAULT_FFMPEG_LOGLEVEL, FFMPEG_LOGLEVELS, CONF_FFMPEG_REPORT, DEFAULT_FFMPEG_REPORT
+from .const import CONF_FFMPEG_STALL_TIMEOUT, DEFAULT_FFMPEG_STALL_TIMEOUT, CONF_LLHLS, DEFAULT_LLHLS, CONF_LLHLS_PART_DURATION, DEFAULT_LLHLS_PART_DURATION
+from .const import CONF_WEBRTC, DEFAULT_WEBRTC, CONF_ABR, DEFAULT_ABR, CONF_ABR_HEIGHT, DEFAULT_ABR_HEIGHT, ABR_HEIGHTS
+from .const import CONF_MOSAIC, DEFAULT_MOSAIC, CONF_MOSAIC_CAMERAS, DEFAULT_MOSAIC_CAMERAS, CONF_MOSAIC_FPS, DEFAULT_MOSAIC_FPS
+from .const import CONF_MJPEG_FPS, DEFAULT_MJPEG_FPS
 from .websocket import EufySecurityWebSocket
 
 _LOGGER = logging.getLogger(__name__)
@@ -24,7 +35,31 @@ class EufySecurityOptionFlowHandler(config_entries.OptionsFlow):
                 vol.Optional(CONF_RTSP_SERVER_ADDRESS, default=self.config_entry.options.get(CONF_RTSP_SERVER_ADDRESS, config_entry.data.get(CONF_HOST))): str,
                 vol.Optional(CONF_RTSP_SERVER_PORT, default=self.config_entry.options.get(CONF_RTSP_SERVER_PORT, DEFAULT_RTSP_SERVER_PORT)): int,
                 vol.Optional(CONF_FFMPEG_ANALYZE_DURATION, default=self.config_entry.options.get(CONF_FFMPEG_ANALYZE_DURATION, DEFAULT_FFMPEG_ANALYZE_DURATION)): vol.All(vol.Coerce(float), vol.Range(min=1, max=100)),
+                vol.Optional(CONF_FFMPEG_LOGLEVEL, default=self.config_entry.options.get(CONF_FFMPEG_LOGLEVEL, DEFAULT_FFMPEG_LOGLEVEL)): vol.In(FFMPEG_LOGLEVELS),
+                vol.Optional(CONF_FFMPEG_REPORT, default=self.config_entry.options.get(CONF_FFMPEG_REPORT, DEFAULT_FFMPEG_REPORT)): bool,
+                vol.Optional(CONF_FFMPEG_STALL_TIMEOUT, default=self.config_entry.options.get(CONF_FFMPEG_STALL_TIMEOUT, DEFAULT_FFMPEG_STALL_TIMEOUT)): vol.All(vol.Coerce(int), vol.Range(min=2, max=60)),
                 vol.Optional(CONF_AUTO_START_STREAM, default=self.config_entry.options.get(CONF_AUTO_START_STREAM, DEFAULT_AUTO_START_STREAM)): bool,
+                vol.Optional(CONF_SEND_RATE_LIMIT, default=self.config_entry.options.get(CONF_SEND_RATE_LIMIT, DEFAULT_SEND_RATE_LIMIT)): vol.All(vol.Coerce(int), vol.Range(min=0, max=1000)),
+                vol.Optional(CONF_DIAGNOSTIC_SENSORS, default=self.config_entry.options.get(CONF_DIAGNOSTIC_SENSORS, DEFAULT_DIAGNOSTIC_SENSORS)): bool,
+                vol.Optional(CONF_PREWARM_STREAM, default=self.config_entry.options.get(CONF_PREWARM_STREAM, DEFAULT_PREWARM_STREAM)): bool,
+                vol.Optional(CONF_PREWARM_GRACE_PERIOD, default=self.config_entry.options.get(CONF_PREWARM_GRACE_PERIOD, DEFAULT_PREWARM_GRACE_PERIOD)): vol.All(vol.Coerce(int), vol.Range(min=5, max=600)),
+                vol.Optional(CONF_STREAM_GRACE_PERIOD, default=self.config_entry.options.get(CONF_STREAM_GRACE_PERIOD, DEFAULT_STREAM_GRACE_PERIOD)): vol.All(vol.Coerce(int), vol.Range(min=0, max=600)),
+                vol.Optional(CONF_MAX_P2P_STREAMS, default=self.config_entry.options.get(CONF_MAX_P2P_STREAMS, DEFAULT_MAX_P2P_STREAMS)): vol.All(vol.Coerce(int), vol.Range(min=0, max=8)),
+                vol.Optional(CONF_RTSP_RELAY, default=self.config_entry.options.get(CONF_RTSP_RELAY, DEFAULT_RTSP_RELAY)): vol.In([RTSP_RELAY_FFMPEG, RTSP_RELAY_NATIVE]),
+                vol.Optional(CONF_LLHLS, default=self.config_entry.options.get(CONF_LLHLS, DEFAULT_LLHLS)): bool,
+                vol.Optional(CONF_LLHLS_PART_DURATION, default=self.config_entry.options.get(CONF_LLHLS_PART_DURATION, DEFAULT_LLHLS_PART_DURATION)): vol.All(vol.Coerce(int), vol.Range(min=100, max=1000)),
+                vol.Optional(CONF_ABR, default=self.config_entry.options.get(CONF_ABR, DEFAULT_ABR)): bool,
+                vol.Optional(CONF_ABR_HEIGHT, default=self.config_entry.options.get(CONF_ABR_HEIGHT, DEFAULT_ABR_HEIGHT)): vol.In(ABR_HEIGHTS),
+                vol.Optional(CONF_WEBRTC, default=self.config_entry.options.get(CONF_WEBRTC, DEFAULT_WEBRTC)): bool,
+                vol.Optional(CONF_MJPEG_FPS, default=self.config_entry.options.get(CONF_MJPEG_FPS, DEFAULT_MJPEG_FPS)): vol.All(vol.Coerce(int), vol.Range(min=1, max=15)),
+                vol.Optional(CONF_MOSAIC, default=self.config_entry.options.get(CONF_MOSAIC, DEFAULT_MOSAIC)): bool,
+                vol.Optional(CONF_MOSAIC_CAMERAS, default=self.config_entry.options.get(CONF_MOSAIC_CAMERAS, DEFAULT_MOSAIC_CAMERAS)): str,
+                vol.Optional(CONF_MOSAIC_FPS, default=self.config_entry.options.get(CONF_MOSAIC_FPS, DEFAULT_MOSAIC_FPS)): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
+                vol.Optional(CONF_VIDEO_WORKERS, default=self.config_entry.options.get(CONF_VIDEO_WORKERS, DEFAULT_VIDEO_WORKERS)): vol.All(vol.Coerce(int), vol.Range(min=0, max=16)),
+                vol.Optional(CONF_RECORD_CLIPS, default=self.config_entry.options.get(CONF_RECORD_CLIPS, DEFAULT_RECORD_CLIPS)): bool,
+                vol.Optional(CONF_CLIP_PRE_ROLL, default=self.config_entry.options.get(CONF_CLIP_PRE_ROLL, DEFAULT_CLIP_PRE_ROLL)): vol.All(vol.Coerce(int), vol.Range(min=0, max=30)),
+                vol.Optional(CONF_CLIP_DURATION, default=self.config_entry.options.get(CONF_CLIP_DURATION, DEFAULT_CLIP_DURATION)): vol.All(vol.Coerce(int), vol.Range(min=5, max=300)),
+                vol.Optional(CONF_CLIP_RETENTION, default=self.config_entry.options.get(CONF_CLIP_RETENTION, DEFAULT_CLIP_RETENTION)): vol.All(vol.Coerce(int), vol.Range(min=1, max=1000)),
             }
         )
 
@@ -12,6 +12,8 @@ from homeassistant.const import (
 )
 from homeassistant.components.binary_sensor import DEVICE_CLASS_MOTION
 
+from .metrics import Metrics
+
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
 # Base component constants
@@ -36,6 +38,30 @@ CONF_RTSP_SERVER_PORT = "rtsp_server_port"
 CONF_FFMPEG_ANALYZE_DURATION = "ffmpeg_analyze_duration"
 CONF_SYNC_INTERVAL = "sync_interval"
 CONF_AUTO_START_STREAM = "auto_start_stream"
+CONF_SEND_RATE_LIMIT = "send_rate_limit"
+CONF_DIAGNOSTIC_SENSORS = "diagnostic_sensors"
+CONF_PREWARM_STREAM = "prewarm_stream"
+CONF_PREWARM_GRACE_PERIOD = "prewarm_grace_period"
+CONF_STREAM_GRACE_PERIOD = "stream_grace_period"
+CONF_MAX_P2P_STREAMS = "max_p2p_streams"
+CONF_RECORD_CLIPS = "record_clips"
+CONF_RTSP_RELAY = "rtsp_relay"
+CONF_VIDEO_WORKERS = "video_workers"
+CONF_CLIP_PRE_ROLL = "clip_pre_roll"
+CONF_CLIP_DURATION = "clip_duration"
+CONF_CLIP_RETENTION = "clip_retention"
+CONF_FFMPEG_LOGLEVEL = "ffmpeg_loglevel"
+CONF_FFMPEG_REPORT = "ffmpeg_report"
+CONF_FFMPEG_STALL_TIMEOUT = "ffmpeg_stall_timeout"
+CONF_LLHLS = "llhls"
+CONF_LLHLS_PART_DURATION = "llhls_part_duration"
+CONF_WEBRTC = "webrtc"
+CONF_ABR = "abr"
+CONF_ABR_HEIGHT = "abr_height"
+CONF_MOSAIC = "mosaic"
+CONF_MOSAIC_CAMERAS = "mosaic_cameras"
+CONF_MOSAIC_FPS = "mosaic_fps"
+CONF_MJPEG_FPS = "mjpeg_fps"
 
 DEFAULT_HOST = "0.0.0.0"
 DEFAULT_PORT = 3000
@@ -45,6 +71,57 @@ DEFAULT_SYNC_INTERVAL = 600  # seconds
 DEFAULT_FFMPEG_ANALYZE_DURATION: float = 1.2 # microseconds
 DEFAULT_CODEC = "h264"
 DEFAULT_AUTO_START_STREAM = True
+DEFAULT_SEND_RATE_LIMIT = 0  # messages per second, 0 is unlimited
+DEFAULT_DIAGNOSTIC_SENSORS = False
+DEFAULT_PREWARM_STREAM = False
+DEFAULT_PREWARM_GRACE_PERIOD = 30  # seconds
+DEFAULT_STREAM_GRACE_PERIOD = 10  # seconds
+DEFAULT_MAX_P2P_STREAMS = 0  # per station, 0 is unlimited
+DEFAULT_RECORD_CLIPS = False
+RTSP_RELAY_FFMPEG = "ffmpeg"
+RTSP_RELAY_NATIVE = "native"
+DEFAULT_RTSP_RELAY = RTSP_RELAY_FFMPEG
+DEFAULT_VIDEO_WORKERS = 0  # 0 feeds ffmpeg from camera threads
+DEFAULT_CLIP_PRE_ROLL = 5  # seconds
+DEFAULT_CLIP_DURATION = 30  # seconds
+DEFAULT_CLIP_RETENTION = 20  # clips per camera
+FFMPEG_LOGLEVELS = ["quiet", "panic", "fatal", "error", "warning", "info", "verbose", "debug"]
+DEFAULT_FFMPEG_LOGLEVEL = "error"
+DEFAULT_FFMPEG_REPORT = False  # report file grows with every frame on debug level
+DEFAULT_FFMPEG_STALL_TIMEOUT = 5  # seconds
+DEFAULT_LLHLS = False
+DEFAULT_LLHLS_PART_DURATION = 200  # milliseconds
+DEFAULT_WEBRTC = False
+DEFAULT_ABR = False
+ABR_HEIGHTS = [240, 360, 480]
+DEFAULT_ABR_HEIGHT = 360  # pixels
+DEFAULT_MOSAIC = False
+DEFAULT_MOSAIC_CAMERAS = ""  # comma separated serial numbers, empty is every camera
+DEFAULT_MOSAIC_FPS = 2
+DEFAULT_MJPEG_FPS = 5
+
+COMMAND_TIMEOUT = 10  # seconds
+START_LISTENING_TIMEOUT = 30  # seconds
+STREAM_START_TIMEOUT = 5  # seconds
+DEFAULT_BATCH_CONCURRENCY = 8
+BATCH_COMPLETED_EVENT = f"{DOMAIN}_batch_completed"
+CLIP_RECORDED_EVENT = f"{DOMAIN}_clip_recorded"
+CLIPS_DIRECTORY = f"{DOMAIN}_clips"
+MOSAIC_DIRECTORY = f"{DOMAIN}_mosaic"
+# batch command name to coordinator method, value is passed as second argument when given
+BATCH_COMMANDS = {
+    "set_guard_mode": "async_set_guard_mode",
+    "set_device_state": "async_set_device_state",
+    "set_rtsp": "async_set_rtsp",
+    "set_livestream": "async_set_livestream",
+    "set_lock": "async_set_lock",
+    "trigger_alarm": "async_trigger_alarm",
+    "reset_alarm": "async_reset_alarm",
+}
+
+STORAGE_KEY = f"{DOMAIN}.cache"
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10  # seconds
 
 START_LIVESTREAM_AT_INITIALIZE = "start livestream at initialize"
 LATEST_CODEC = "latest codec"
@@ -56,8 +133,9 @@ SET_API_SCHEMA = {
 START_LISTENING_MESSAGE = {"messageId": "start_listening", "command": "start_listening"}
 POLL_REFRESH_MESSAGE = {"messageId": "poll_refresh", "command": "driver.poll_refresh"}
 GET_LIVESTREAM_STATUS_PLACEHOLDER = "get_livestream_status"
+GET_PROPERTIES_METADATA_PLACEHOLDER = "get_properties_metadata"
 GET_PROPERTIES_METADATA_MESSAGE = {
-    "messageId": "get_properties_metadata",
+    "messageId": GET_PROPERTIES_METADATA_PLACEHOLDER + ".{serial_no}",
     "command": "{0}.get_properties_metadata",
     "serialNumber": None,
 }
@@ -136,6 +214,11 @@ EVENT_CONFIGURATION: dict = {
         "value": "state",
         "type": "state",
     },
+    "rings": {
+        "name": "ringing",
+        "value": "state",
+        "type": "state",
+    },
     "got rtsp url": {
         "name": "rtspUrl",
         "value": "rtspUrl",
@@ -235,16 +318,6 @@ DEVICE_CATEGORY = {
     DEVICE_TYPE.SOLO_CAMERA_SPOTLIGHT_SOLAR: "CAMERA",
 }
 
-async def wait_for_value(ref_dict: dict, ref_key: str, value, max_counter: int=50, interval=0.25):
-    _LOGGER.debug(f"{DOMAIN} - wait start - {ref_key}")
-    for counter in range(max_counter):
-        _LOGGER.debug(f"{DOMAIN} - wait - {counter} - {ref_key} {ref_dict.get(ref_key)}")
-        if ref_dict.get(ref_key, value) == value:
-            await asyncio.sleep(interval)
-        else:
-            return True
-    return False
-
 def get_child_value(data, key, default_value=None):
     value = data
     for x in key.split("."):
@@ -257,6 +330,11 @@ def get_child_value(data, key, default_value=None):
                 value = default_value
     return value
 
+# camera streaming keys in device state, they are valid only for the current session
+RUNTIME_STATE_KEYS = ["rtspUrl", "liveStreamingStatus", START_LIVESTREAM_AT_INITIALIZE]
+# event flags are true only for a moment, a restored value would show an event that is long over
+TRANSIENT_STATE_KEYS = ["motionDetected", "personDetected", "ringing"]
+
 class Device:
     def __init__(self, serial_number: str, state: dict) -> None:
         self.serial_number: str = serial_number
@@ -275,6 +353,39 @@ class Device:
         self.stream_source_type: str = None
         self.stream_source_address: str = None
         self.codec = None
+        self.video_fps: int = None
+        self.metrics: Metrics = Metrics()
+        # last stderr lines of ffmpeg, shared by camera for diagnostics
+        self.ffmpeg_log = None
+
+        # observers are woken up on changes instead of polling device fields
+        self.listeners: list = []
+        self.waiters: list = []
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+        return lambda: self.listeners.remove(callback)
+
+    def notify(self, property_name: str = None):
+        # must be called from event loop
+        for callback in list(self.listeners):
+            callback(property_name)
+        for predicate, future in list(self.waiters):
+            if not future.done() and predicate(self) == True:
+                future.set_result(True)
+
+    async def async_wait_for(self, predicate, timeout: float) -> bool:
+        if predicate(self) == True:
+            return True
+        waiter = (predicate, asyncio.get_event_loop().create_future())
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiters.remove(waiter)
 
     def set_properties(self, properties: dict):
         self.properties = properties
@@ -283,7 +394,8 @@ class Device:
         self.type = str(type)
         self.category = DEVICE_CATEGORY.get(type, "UNKNOWN")
 
-        if self.is_camera() == True:
+        # streaming fields are initialized once, live properties can arrive after cached ones
+        if self.is_camera() == True and self.is_streaming is None:
             self.state["rtspUrl"] = None
             self.state["liveStreamingStatus"] = None
             self.state[START_LIVESTREAM_AT_INITIALIZE] = False
@@ -293,6 +405,28 @@ class Device:
             self.codec = DEFAULT_CODEC
 
 
+    def update_state(self, state: dict):
+        # keep the same dict instance, entities created from cache hold a reference to it
+        self.state.update(state)
+        self.name = state["name"]
+        self.model = state["model"]
+        self.hardware_version = state["hardwareVersion"]
+        self.software_version = state["softwareVersion"]
+
+    def to_cache(self) -> dict:
+        state = {key: value for key, value in self.state.items() if not key in RUNTIME_STATE_KEYS + TRANSIENT_STATE_KEYS}
+        properties = self.properties
+        if not properties is None:
+            properties = {key: value for key, value in properties.items() if not key in TRANSIENT_STATE_KEYS}
+        return {"state": state, "properties": properties}
+
+    @classmethod
+    def from_cache(cls, serial_number: str, cached: dict):
+        device = cls(serial_number, dict(cached["state"]))
+        if cached.get("properties"):
+            device.set_properties(cached["properties"])
+        return device
+
     def is_camera(self):
         if self.category in ["CAMERA", "DOORBELL"]:
             return True
@@ -315,6 +449,11 @@ class Device:
             codec = "hevc"
         self.codec = codec
 
+    def set_video_fps(self, video_fps: int):
+        # some cameras report 0 before first key frame
+        if not video_fps is None and video_fps > 0:
+            self.video_fps = video_fps
+
 class EufyConfig:
     def __init__(self, config_entry: ConfigEntry) -> None:
         self.host: str = config_entry.data.get(CONF_HOST)
@@ -324,4 +463,28 @@ class EufyConfig:
         self.rtsp_server_address: str = config_entry.options.get(CONF_RTSP_SERVER_ADDRESS, self.host)
         self.rtsp_server_port: int = config_entry.options.get(CONF_RTSP_SERVER_PORT, DEFAULT_RTSP_SERVER_PORT)
         self.ffmpeg_analyze_duration: int = config_entry.options.get(CONF_FFMPEG_ANALYZE_DURATION, DEFAULT_FFMPEG_ANALYZE_DURATION)
-        self.auto_start_stream: bool = config_entry.options.get(CONF_AUTO_START_STREAM, DEFAULT_AUTO_START_STREAM)
\ No newline at end of file
+        self.auto_start_stream: bool = config_entry.options.get(CONF_AUTO_START_STREAM, DEFAULT_AUTO_START_STREAM)
+        self.send_rate_limit: int = config_entry.options.get(CONF_SEND_RATE_LIMIT, DEFAULT_SEND_RATE_LIMIT)
+        self.diagnostic_sensors: bool = config_entry.options.get(CONF_DIAGNOSTIC_SENSORS, DEFAULT_DIAGNOSTIC_SENSORS)
+        self.prewarm_stream: bool = config_entry.options.get(CONF_PREWARM_STREAM, DEFAULT_PREWARM_STREAM)
+        self.prewarm_grace_period: int = config_entry.options.get(CONF_PREWARM_GRACE_PERIOD, DEFAULT_PREWARM_GRACE_PERIOD)
+        self.stream_grace_period: int = config_entry.options.get(CONF_STREAM_GRACE_PERIOD, DEFAULT_STREAM_GRACE_PERIOD)
+        self.max_p2p_streams: int = config_entry.options.get(CONF_MAX_P2P_STREAMS, DEFAULT_MAX_P2P_STREAMS)
+        self.rtsp_relay: str = config_entry.options.get(CONF_RTSP_RELAY, DEFAULT_RTSP_RELAY)
+        self.video_workers: int = config_entry.options.get(CONF_VIDEO_WORKERS, DEFAULT_VIDEO_WORKERS)
+        self.record_clips: bool = config_entry.options.get(CONF_RECORD_CLIPS, DEFAULT_RECORD_CLIPS)
+        self.clip_pre_roll: int = config_entry.options.get(CONF_CLIP_PRE_ROLL, DEFAULT_CLIP_PRE_ROLL)
+        self.clip_duration: int = config_entry.options.get(CONF_CLIP_DURATION, DEFAULT_CLIP_DURATION)
+        self.clip_retention: int = config_entry.options.get(CONF_CLIP_RETENTION, DEFAULT_CLIP_RETENTION)
+        self.ffmpeg_loglevel: str = config_entry.options.get(CONF_FFMPEG_LOGLEVEL, DEFAULT_FFMPEG_LOGLEVEL)
+        self.ffmpeg_report: bool = config_entry.options.get(CONF_FFMPEG_REPORT, DEFAULT_FFMPEG_REPORT)
+        self.ffmpeg_stall_timeout: int = config_entry.options.get(CONF_FFMPEG_STALL_TIMEOUT, DEFAULT_FFMPEG_STALL_TIMEOUT)
+        self.llhls: bool = config_entry.options.get(CONF_LLHLS, DEFAULT_LLHLS)
+        self.llhls_part_duration: int = config_entry.options.get(CONF_LLHLS_PART_DURATION, DEFAULT_LLHLS_PART_DURATION)
+        self.webrtc: bool = config_entry.options.get(CONF_WEBRTC, DEFAULT_WEBRTC)
+        self.abr: bool = config_entry.options.get(CONF_ABR, DEFAULT_ABR)
+        self.abr_height: int = config_entry.options.get(CONF_ABR_HEIGHT, DEFAULT_ABR_HEIGHT)
+        self.mosaic: bool = config_entry.options.get(CONF_MOSAIC, DEFAULT_MOSAIC)
+        self.mosaic_cameras: list = [serial_number.strip() for serial_number in config_entry.options.get(CONF_MOSAIC_CAMERAS, DEFAULT_MOSAIC_CAMERAS).split(",") if serial_number.strip() != ""]
+        self.mosaic_fps: int = config_entry.options.get(CONF_MOSAIC_FPS, DEFAULT_MOSAIC_FPS)
+        self.mjpeg_fps: int = config_entry.options.get(CONF_MJPEG_FPS, DEFAULT_MJPEG_FPS)
\ No newline at end of file
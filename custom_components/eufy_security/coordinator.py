@@ -3,39 +3,62 @@ import logging
 import aiohttp
 import asyncio
 from datetime import timedelta
+from itertools import count
 from queue import Queue
 import json
+import time
 from homeassistant.config_entries import ConfigEntry
 
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import aiohttp_client
 from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.helpers.update_coordinator import UpdateFailed
 from homeassistant.helpers.translation import component_translation_path
-from .const import CONF_SYNC_INTERVAL, DEFAULT_SYNC_INTERVAL, DEVICE_TYPE, LATEST_CODEC, SET_LOCK_MESSAGE, EufyConfig, get_child_value, wait_for_value, Device
+from .const import CONF_SYNC_INTERVAL, DEFAULT_SYNC_INTERVAL, DEVICE_TYPE, LATEST_CODEC, EufyConfig, get_child_value, Device
 
 from .const import (
+    BATCH_COMMANDS,
+    COMMAND_TIMEOUT,
+    DEFAULT_BATCH_CONCURRENCY,
     DOMAIN,
+    START_LISTENING_TIMEOUT,
     MESSAGE_IDS_TO_PROCESS,
     MESSAGE_TYPES_TO_PROCESS,
-    POLL_REFRESH_MESSAGE,
     EVENT_CONFIGURATION,
     START_LISTENING_MESSAGE,
-    SET_API_SCHEMA,
-    SET_RTSP_STREAM_MESSAGE,
     GET_PROPERTIES_MESSAGE,
-    GET_PROPERTIES_METADATA_MESSAGE,
-    GET_LIVESTREAM_STATUS_MESSAGE,
     GET_LIVESTREAM_STATUS_PLACEHOLDER,
-    SET_LIVESTREAM_MESSAGE,
-    SET_DEVICE_STATE_MESSAGE,
-    SET_GUARD_MODE_MESSAGE,
-    STATION_TRIGGER_ALARM,
-    STATION_RESET_ALARM,
     START_LIVESTREAM_AT_INITIALIZE,
+    STORAGE_KEY,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
 )
-from .websocket import EufySecurityWebSocket
+from .encoder import (
+    CommandTemplate,
+    GET_LIVESTREAM_STATUS_COMMAND,
+    GET_PROPERTIES_COMMAND,
+    GET_PROPERTIES_METADATA_COMMAND,
+    LIVESTREAM_COMMANDS,
+    POLL_REFRESH_COMMAND,
+    SET_API_SCHEMA_COMMAND,
+    SET_DEVICE_STATE_COMMAND,
+    SET_GUARD_MODE_COMMAND,
+    SET_LOCK_COMMAND,
+    SET_RTSP_STREAM_COMMAND,
+    START_LISTENING_COMMAND,
+    STATION_RESET_ALARM_COMMAND,
+    STATION_TRIGGER_ALARM_COMMAND,
+)
+from .log import LazyPayload, LogSampler, VIDEO_FRAME_LOG_SAMPLE_RATE
+from .metrics import Metrics
+from .profiler import EufySecurityProfiler
+from .lanes import MessageLanes
+from .stream_scheduler import StreamScheduler
+from .video_worker import VideoWorkerPool
+from .websocket import EufySecurityWebSocket, PRIORITY_BULK, PRIORITY_CONTROL
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
@@ -44,63 +67,174 @@ class EufySecurityDataUpdateCoordinator(DataUpdateCoordinator):
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
         self.config: EufyConfig = EufyConfig(config_entry)
         super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=timedelta(seconds=self.config.sync_interval))
+        self.config_entry: ConfigEntry = config_entry
         self.ws = None
+        self.ws_lock: asyncio.Lock = asyncio.Lock()
+        self.store: Store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self.restored_from_cache: bool = False
+        self.device_list_changed: bool = False
+        self.properties_fetched: set = set()
+        self.properties_ready: asyncio.Event = asyncio.Event()
+        self.pending_commands: dict = {}
+        self.metrics: Metrics = Metrics()
+        self.video_log_sampler: LogSampler = LogSampler(VIDEO_FRAME_LOG_SAMPLE_RATE)
+        self.profiler: EufySecurityProfiler = EufySecurityProfiler(hass)
+        self.stream_scheduler: StreamScheduler = StreamScheduler(self.config.max_p2p_streams, self.metrics)
+        self.lanes: MessageLanes = MessageLanes(self.hass, self.handle_lane_message, self.metrics)
+        self.video_handlers: dict = {}
+        # ll-hls playlists of cameras by serial number, served by LowLatencyHlsView
+        self.llhls_playlists: dict = {}
+        # webrtc offer handlers of cameras by serial number, called by WebRtcView
+        self.webrtc_offer_handlers: dict = {}
+        self.video_worker_pool: VideoWorkerPool = None
+        if self.config.video_workers > 0:
+            self.video_worker_pool = VideoWorkerPool(self.config.video_workers)
+        self.command_counter = count(1)
         self.session: aiohttp.ClientSession = aiohttp_client.async_get_clientsession(hass)
         self.platforms = []
         self.data = {}
         self.devices: dict = None
         self.stations: dict = None
 
-    async def initialize_ws(self) -> bool:
-        self.ws: EufySecurityWebSocket = EufySecurityWebSocket(self.hass, self.config.host, self.config.port, self.session, self.on_open, self.on_message, self.on_close, self.on_error)
-        await self.ws.set_ws()
-        await self.async_start_listening()
-        if await self.check_if_started_listening() == False:
-            _LOGGER.debug(f"{DOMAIN} - check_if_started_listening - returned False")
-            raise Exception("Start Listening was not completed in timely manner")
-
-    async def check_if_started_listening(self):
-        _LOGGER.debug(f"{DOMAIN} - check_if_started_listening")
-
-        if await wait_for_value(self.__dict__, "devices", None) == True:
-            return await self.check_if_device_properties_fetched()
-        return False
+    async def async_initialize(self):
+        # with a cache, entities are created from last known data and live data is reconciled in background
+        if await self.async_restore_cache() == True:
+            _LOGGER.debug(f"{DOMAIN} - async_initialize - restored from cache - devices {len(self.devices)} - stations {len(self.stations)}")
+            self.hass.async_create_task(self.async_initialize_in_background())
+            return
+        await self.initialize_ws()
+        await self.async_refresh()
 
-    async def check_if_device_properties_fetched(self):
-        _LOGGER.debug(f"{DOMAIN} - get_device_properties")
+    async def async_initialize_in_background(self):
+        try:
+            await self.initialize_ws()
+            await self.async_refresh()
+        except Exception as ex:  # pylint: disable=broad-except
+            _LOGGER.error(f"{DOMAIN} - async_initialize_in_background - exception: %s", ex)
 
-        for device in self.devices.values():
-            _LOGGER.debug(f"{DOMAIN} - get_device_properties - {device}")
-            if await wait_for_value(device.__dict__, "properties", {}) == False:
-                return False
-        return True
+    async def async_restore_cache(self) -> bool:
+        cached = await self.store.async_load()
+        if not cached or not cached.get("devices"):
+            return False
 
-    async def process_start_listening_response(self, states: dict):
-        self.data["devices"] = {}
-        self.data["stations"] = {}
+        self.data["devices"] = {serial_number: Device.from_cache(serial_number, value) for serial_number, value in cached["devices"].items()}
+        self.data["stations"] = {serial_number: Device.from_cache(serial_number, value) for serial_number, value in cached.get("stations", {}).items()}
         self.devices = self.data["devices"]
         self.stations = self.data["stations"]
+        self.restored_from_cache = True
+        return True
 
-        for state in states["devices"]:
-            device = Device(state["serialNumber"], state)
-            self.devices[device.serial_number] = device
-            await self.async_get_properties_for_device(device.serial_number)
+    def to_cache(self) -> dict:
+        return {
+            "devices": {serial_number: device.to_cache() for serial_number, device in self.devices.items()},
+            "stations": {serial_number: device.to_cache() for serial_number, device in self.stations.items()},
+        }
+
+    def async_save_cache(self):
+        self.store.async_delay_save(self.to_cache, STORAGE_SAVE_DELAY)
 
-        for state in states["stations"]:
-            device = Device(state["serialNumber"], state)
-            self.stations[device.serial_number] = device
+    async def initialize_ws(self) -> bool:
+        async with self.ws_lock:
+            if not self.ws is None and not self.ws.ws is None and self.ws.ws.closed == False:
+                return
+            if not self.ws is None:
+                self.metrics.increment("websocket_reconnects")
+                await self.ws.async_close()
+            self.ws: EufySecurityWebSocket = EufySecurityWebSocket(self.hass, self.config.host, self.config.port, self.session, self.on_open, self.on_message, self.on_close, self.on_error, self.config.send_rate_limit)
+            await self.ws.set_ws()
+            self.properties_ready.clear()
+            await self.async_start_listening()
+            if await self.check_if_started_listening() == False:
+                _LOGGER.debug(f"{DOMAIN} - check_if_started_listening - returned False")
+                raise Exception("Start Listening was not completed in timely manner")
 
+    async def check_if_started_listening(self):
+        _LOGGER.debug(f"{DOMAIN} - check_if_started_listening")
+        # set when start_listening response is processed and properties of all devices arrived
+        try:
+            await asyncio.wait_for(self.properties_ready.wait(), START_LISTENING_TIMEOUT)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def process_start_listening_response(self, states: dict):
+        if self.devices is None:
+            self.data["devices"] = {}
+            self.data["stations"] = {}
         self.devices = self.data["devices"]
         self.stations = self.data["stations"]
+        self.properties_fetched = set()
+
+        # reconcile live states with known devices, existing device objects are updated in place
+        known_serial_numbers = set(self.devices.keys()) | set(self.stations.keys())
+        live_serial_numbers = set()
+        for source, states_of_source in [(self.devices, states["devices"]), (self.stations, states["stations"])]:
+            for state in states_of_source:
+                serial_number = state["serialNumber"]
+                live_serial_numbers.add(serial_number)
+                if serial_number in source:
+                    source[serial_number].update_state(state)
+                else:
+                    source[serial_number] = Device(serial_number, state)
+
+        for serial_number in known_serial_numbers - live_serial_numbers:
+            self.devices.pop(serial_number, None)
+            self.stations.pop(serial_number, None)
+
+        self.device_list_changed = self.restored_from_cache == True and known_serial_numbers != live_serial_numbers
+        if self.device_list_changed == True:
+            _LOGGER.debug(f"{DOMAIN} - device list changed since cache - added {live_serial_numbers - known_serial_numbers} - removed {known_serial_numbers - live_serial_numbers}")
+
+        if len(self.devices) == 0:
+            self.properties_ready.set()
+        for device in list(self.devices.values()):
+            await self.async_get_properties_for_device(device.serial_number)
 
     async def process_get_properties_response(self, properties: dict):
         device: Device = self.devices[get_child_value(properties, "serialNumber.value")]
         device.set_properties(properties)
+        device.notify("properties")
         if device.is_camera() == True:
             await self.async_get_livestream_status(device.serial_number)
 
+        self.properties_fetched.add(device.serial_number)
+        if self.properties_fetched.issuperset(self.devices.keys()):
+            self.properties_ready.set()
+            if self.device_list_changed == True:
+                # entities were created from an outdated device list, reload to pick up the live one
+                # live list is saved first, a reload restoring the outdated cache would find the list changed again
+                self.device_list_changed = False
+                await self.store.async_save(self.to_cache())
+                self.hass.async_create_task(self.hass.config_entries.async_reload(self.config_entry.entry_id))
+            else:
+                self.async_save_cache()
+
     async def on_message(self, message):
+        # reader only parses and routes, handling happens on per device lanes
         payload = message.json()
+        message_type = payload.get("type")
+        if message_type == "event":
+            message_type = f"event.{payload.get('event', {}).get('event')}"
+        self.metrics.increment(f"messages_received.{message_type}")
+        self.metrics.increment("messages_received")
+
+        if payload.get("type") == "result":
+            # acknowledgement of a command, failed results do not carry a result payload
+            future: asyncio.Future = self.pending_commands.get(payload.get("messageId"))
+            if not future is None:
+                if not future.done():
+                    future.set_result(payload)
+                return
+        await self.lanes.async_dispatch(payload)
+
+    async def handle_lane_message(self, payload: dict):
+        started_at = time.monotonic()
+        try:
+            await self.process_message(payload)
+        finally:
+            self.metrics.observe("message_handler_latency", time.monotonic() - started_at)
+
+    async def process_message(self, payload: dict):
         message_type: str = payload["type"]
         # _LOGGER.debug(f"{DOMAIN} - on_message - {payload}")
         if not message_type in MESSAGE_TYPES_TO_PROCESS:
@@ -112,7 +246,8 @@ class EufySecurityDataUpdateCoordinator(DataUpdateCoordinator):
 
         if message_type == "result":
             message_id = payload["messageId"]
-            _LOGGER.debug(f"{DOMAIN} - on_message - {payload}")
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("%s - on_message - %s", DOMAIN, LazyPayload(payload))
             if not message_id in MESSAGE_IDS_TO_PROCESS:
                 if not GET_LIVESTREAM_STATUS_PLACEHOLDER in message_id:
                     return
@@ -128,6 +263,8 @@ class EufySecurityDataUpdateCoordinator(DataUpdateCoordinator):
                 serial_number = (payload["messageId"].replace(GET_LIVESTREAM_STATUS_PLACEHOLDER, "").replace(".", ""))
                 if result == True:
                     self.devices[serial_number].state[START_LIVESTREAM_AT_INITIALIZE] = True
+                    # entities restored from cache already exist, let them catch up with streaming
+                    self.hass.bus.async_fire(f"{DOMAIN}_{serial_number}_livestream_at_initialize")
 
         if message_type == "event":
             event_type = message["event"]
@@ -141,15 +278,26 @@ class EufySecurityDataUpdateCoordinator(DataUpdateCoordinator):
             event_data_type = EVENT_CONFIGURATION[event_type]["type"]
 
             if event_data_type == "state":
-                _LOGGER.debug(f"{DOMAIN} - on_message - {payload}")
+                if _LOGGER.isEnabledFor(logging.DEBUG):
+                    _LOGGER.debug("%s - on_message - %s", DOMAIN, LazyPayload(payload))
                 self.set_value_for_property(event_source, serial_number, event_property, event_value)
 
             if event_data_type == "event":
                 #with open("data.txt", "a") as file_object:
                     #file_object.write(json.dumps(message))
                     #file_object.write("\n")
+                if _LOGGER.isEnabledFor(logging.DEBUG) and self.video_log_sampler.sample() == True:
+                    _LOGGER.debug("%s - on_message - video data sampled 1/%s - %s - %s bytes - %s", DOMAIN, VIDEO_FRAME_LOG_SAMPLE_RATE, serial_number, len(event_value.get("data", [])), message.get("metadata"))
                 self.devices[serial_number].set_codec(message["metadata"]["videoCodec"].lower())
-                self.hass.bus.fire(f"{DOMAIN}_{serial_number}_event_received", event_value)
+                self.devices[serial_number].set_video_fps(message["metadata"].get("videoFPS"))
+                # awaited on video lane of the device, so frames are handled in order and a slow camera only delays itself
+                handler = self.video_handlers.get(serial_number)
+                if not handler is None:
+                    await handler(event_value)
+
+    def add_video_handler(self, serial_number: str, handler):
+        self.video_handlers[serial_number] = handler
+        return lambda: self.video_handlers.pop(serial_number, None)
 
     def set_value_for_property(self, source: str, serial_number: str, property_name: str, value: str):
         if isinstance(value, str):
@@ -160,7 +308,9 @@ class EufySecurityDataUpdateCoordinator(DataUpdateCoordinator):
         if source == "station":
             device: Device = self.stations[serial_number]
         device.state[property_name] = value
-        _LOGGER.debug(f"{DOMAIN} - set_event_for_entity - {source} / {serial_number} / {property_name} / {value}")
+        device.notify(property_name)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("%s - set_event_for_entity - %s / %s / %s / %s", DOMAIN, source, serial_number, property_name, LazyPayload(value))
 
     async def on_open(self):
         _LOGGER.debug(f"{DOMAIN} - on_open - executed")
@@ -173,75 +323,113 @@ class EufySecurityDataUpdateCoordinator(DataUpdateCoordinator):
 
     async def _async_update_data(self):
         try:
-            await self.async_send_message(json.dumps(POLL_REFRESH_MESSAGE))
+            await self.async_send_message(POLL_REFRESH_COMMAND.encode(), PRIORITY_BULK)
             return self.data
         except Exception as exception:
             raise UpdateFailed() from exception
 
-    async def async_send_message(self, message):
-        if self.ws.ws is None or self.ws.ws.closed == True:
+    async def async_send_message(self, message, priority: int = PRIORITY_CONTROL):
+        if self.ws is None or self.ws.ws is None or self.ws.ws.closed == True:
             await self.initialize_ws()
-        await self.ws.send_message(message)
+        await self.ws.send_message(message, priority)
+
+    async def async_send_command(self, command: CommandTemplate, **values) -> dict:
+        # unique message id per command, so server result can be matched to the waiting caller
+        message_id = f"{command.message_id}.{next(self.command_counter)}"
+        future: asyncio.Future = self.hass.loop.create_future()
+        self.pending_commands[message_id] = future
+        try:
+            await self.async_send_message(command.encode(messageId=message_id, **values))
+            payload = await asyncio.wait_for(future, COMMAND_TIMEOUT)
+        except asyncio.TimeoutError as ex:
+            raise HomeAssistantError(f"{command.command} for {values.get('serialNumber')} was not acknowledged in {COMMAND_TIMEOUT} seconds") from ex
+        finally:
+            self.pending_commands.pop(message_id, None)
+
+        if payload.get("success", False) == False:
+            raise HomeAssistantError(f"{command.command} for {values.get('serialNumber')} failed - {payload.get('errorCode')}")
+        return payload.get("result", {})
+
+    def get_diagnostics(self) -> dict:
+        websocket = {}
+        if not self.ws is None:
+            websocket = {**self.ws.send_metrics, "queue_depth": self.ws.queue_depth, "connected": not self.ws.ws is None and self.ws.ws.closed == False}
+        return {
+            "metrics": self.metrics.as_dict(),
+            "websocket": websocket,
+            "lanes": self.lanes.get_diagnostics(),
+            "stream_slots": self.stream_scheduler.get_diagnostics(),
+            "video_workers": None if self.video_worker_pool is None else self.video_worker_pool.get_diagnostics(),
+            "devices": {serial_number: device.metrics.as_dict() for serial_number, device in (self.devices or {}).items()},
+            "ffmpeg_logs": {serial_number: list(device.ffmpeg_log) for serial_number, device in (self.devices or {}).items() if not device.ffmpeg_log is None},
+        }
+
+    async def async_send_batch(self, commands: list, max_concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> dict:
+        # commands are pipelined, at most max_concurrency of them are waiting for acknowledgement at once
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def execute(command: dict) -> dict:
+            result = {"command": command["command"], "serial_number": command["serial_number"]}
+            async with semaphore:
+                started_at = time.monotonic()
+                try:
+                    method = getattr(self, BATCH_COMMANDS[command["command"]])
+                    arguments = [command["serial_number"]]
+                    if not command.get("value") is None:
+                        arguments.append(command["value"])
+                    result["result"] = await method(*arguments)
+                    result["success"] = True
+                except Exception as ex:  # pylint: disable=broad-except
+                    result["error"] = str(ex)
+                    result["success"] = False
+                result["duration"] = round(time.monotonic() - started_at, 3)
+            return result
+
+        started_at = time.monotonic()
+        results = await asyncio.gather(*[execute(command) for command in commands])
+        succeeded = len([result for result in results if result["success"] == True])
+        summary = {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "duration": round(time.monotonic() - started_at, 3),
+            "results": results,
+        }
+        _LOGGER.debug(f"{DOMAIN} - async_send_batch - total {summary['total']} - failed {summary['failed']} - duration {summary['duration']}")
+        return summary
 
     async def async_start_listening(self):
-        await self.async_send_message(json.dumps(SET_API_SCHEMA))
-        await self.async_send_message(json.dumps(START_LISTENING_MESSAGE))
+        await self.async_send_message(SET_API_SCHEMA_COMMAND.encode())
+        await self.async_send_message(START_LISTENING_COMMAND.encode())
 
     async def async_get_properties_metadata_for_device(self, serial_no: str):
-        message = GET_PROPERTIES_METADATA_MESSAGE.copy()
-        message["command"] = message["command"].format("device")
-        message["serialNumber"] = serial_no
-        await self.async_send_message(json.dumps(message))
+        message_id = GET_PROPERTIES_METADATA_COMMAND.message_id.replace("{serial_no}", serial_no)
+        await self.async_send_message(GET_PROPERTIES_METADATA_COMMAND.encode(messageId=message_id, serialNumber=serial_no), PRIORITY_BULK)
 
     async def async_get_properties_for_device(self, serial_no: str):
-        message = GET_PROPERTIES_MESSAGE.copy()
-        message["command"] = message["command"].format("device")
-        message["serialNumber"] = serial_no
-        await self.async_send_message(json.dumps(message))
+        await self.async_send_message(GET_PROPERTIES_COMMAND.encode(serialNumber=serial_no), PRIORITY_BULK)
 
     async def async_get_livestream_status(self, serial_no: str):
-        message = GET_LIVESTREAM_STATUS_MESSAGE.copy()
-        message["serialNumber"] = serial_no
-        message["messageId"] = message["messageId"].replace("{serial_no}", serial_no)
-        await self.async_send_message(json.dumps(message))
+        message_id = GET_LIVESTREAM_STATUS_COMMAND.message_id.replace("{serial_no}", serial_no)
+        await self.async_send_message(GET_LIVESTREAM_STATUS_COMMAND.encode(messageId=message_id, serialNumber=serial_no), PRIORITY_BULK)
 
     async def async_set_rtsp(self, serial_no: str, value: bool):
-        message = SET_RTSP_STREAM_MESSAGE.copy()
-        message["serialNumber"] = serial_no
-        message["value"] = value
-        await self.async_send_message(json.dumps(message))
+        return await self.async_send_command(SET_RTSP_STREAM_COMMAND, serialNumber=serial_no, value=value)
 
     async def async_set_livestream(self, serial_no: str, value: str):
-        message = SET_LIVESTREAM_MESSAGE.copy()
-        message["serialNumber"] = serial_no
-        message["command"] = message["command"].replace("{state}", value)
-        await self.async_send_message(json.dumps(message))
+        return await self.async_send_command(LIVESTREAM_COMMANDS[value], serialNumber=serial_no)
 
     async def async_set_device_state(self, serial_no: str, value: bool):
-        message = SET_DEVICE_STATE_MESSAGE.copy()
-        message["serialNumber"] = serial_no
-        message["value"] = value
-        await self.async_send_message(json.dumps(message))
+        return await self.async_send_command(SET_DEVICE_STATE_COMMAND, serialNumber=serial_no, value=value)
 
     async def async_set_guard_mode(self, serial_no: str, value: int):
-        message = SET_GUARD_MODE_MESSAGE.copy()
-        message["serialNumber"] = serial_no
-        message["mode"] = value
-        await self.async_send_message(json.dumps(message))
+        return await self.async_send_command(SET_GUARD_MODE_COMMAND, serialNumber=serial_no, mode=value)
 
     async def async_trigger_alarm(self, serial_no: str, duration: int = 10):
-        message = STATION_TRIGGER_ALARM.copy()
-        message["serialNumber"] = serial_no
-        message["seconds"] = duration
-        await self.async_send_message(json.dumps(message))
+        return await self.async_send_command(STATION_TRIGGER_ALARM_COMMAND, serialNumber=serial_no, seconds=duration)
 
     async def async_reset_alarm(self, serial_no: str):
-        message = STATION_RESET_ALARM.copy()
-        message["serialNumber"] = serial_no
-        await self.async_send_message(json.dumps(message))
+        return await self.async_send_command(STATION_RESET_ALARM_COMMAND, serialNumber=serial_no)
 
     async def async_set_lock(self, serial_no: str, value: bool):
-        message = SET_LOCK_MESSAGE.copy()
-        message["serialNumber"] = serial_no
-        message["value"] = value
-        await self.async_send_message(json.dumps(message))
\ No newline at end of file
+        return await self.async_send_command(SET_LOCK_COMMAND, serialNumber=serial_no, value=value)
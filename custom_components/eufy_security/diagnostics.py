@@ -0,0 +1,10 @@
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import EufySecurityDataUpdateCoordinator
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, config_entry: ConfigEntry) -> dict:
+    coordinator: EufySecurityDataUpdateCoordinator = hass.data[DOMAIN]
+    return coordinator.get_diagnostics()
@@ -0,0 +1,92 @@
+import json
+from json.encoder import encode_basestring
+
+from .const import (
+    GET_LIVESTREAM_STATUS_MESSAGE,
+    GET_PROPERTIES_MESSAGE,
+    GET_PROPERTIES_METADATA_MESSAGE,
+    POLL_REFRESH_MESSAGE,
+    SET_API_SCHEMA,
+    SET_DEVICE_STATE_MESSAGE,
+    SET_GUARD_MODE_MESSAGE,
+    SET_LIVESTREAM_MESSAGE,
+    SET_LOCK_MESSAGE,
+    SET_RTSP_STREAM_MESSAGE,
+    START_LISTENING_MESSAGE,
+    STATION_RESET_ALARM,
+    STATION_TRIGGER_ALARM,
+)
+
+try:
+    import orjson
+
+    def dumps(value) -> str:
+        return orjson.dumps(value).decode()
+
+except ImportError:
+    dumps = json.dumps
+
+JSON_CONSTANTS = {True: "true", False: "false", None: "null"}
+
+
+def encode_value(value) -> str:
+    # shortcuts for the value types used in commands, everything else goes through json backend
+    value_type = type(value)
+    if value_type is str:
+        return encode_basestring(value)
+    if value_type is int:
+        return str(value)
+    if value_type is bool or value is None:
+        return JSON_CONSTANTS[value]
+    return dumps(value)
+
+
+# message template compiled once into static json chunks around its variable fields
+# variable fields are messageId, keys with None value in template and keys given in fields
+class CommandTemplate:
+    def __init__(self, template: dict, fields: tuple = (), **overrides) -> None:
+        message = {**template, **overrides}
+        self.message_id: str = message["messageId"]
+        self.command: str = message["command"]
+        self.defaults: dict = message
+        self.fields: tuple = tuple(key for key, value in message.items() if key == "messageId" or value is None or key in fields)
+
+        chunks = []
+        chunk = "{"
+        for index, (key, value) in enumerate(message.items()):
+            if index > 0:
+                chunk = chunk + ","
+            chunk = chunk + dumps(key) + ":"
+            if key in self.fields:
+                chunks.append(chunk)
+                chunk = ""
+            else:
+                chunk = chunk + dumps(value)
+        chunks.append(chunk + "}")
+        self.chunks: tuple = tuple(chunks)
+
+    def encode(self, **values) -> str:
+        chunks = self.chunks
+        defaults = self.defaults
+        parts = [chunks[0]]
+        for index, key in enumerate(self.fields, 1):
+            parts.append(encode_value(values.get(key, defaults[key])))
+            parts.append(chunks[index])
+        return "".join(parts)
+
+
+SET_API_SCHEMA_COMMAND = CommandTemplate(SET_API_SCHEMA)
+START_LISTENING_COMMAND = CommandTemplate(START_LISTENING_MESSAGE)
+POLL_REFRESH_COMMAND = CommandTemplate(POLL_REFRESH_MESSAGE)
+GET_PROPERTIES_METADATA_COMMAND = CommandTemplate(GET_PROPERTIES_METADATA_MESSAGE, command=GET_PROPERTIES_METADATA_MESSAGE["command"].format("device"))
+GET_PROPERTIES_COMMAND = CommandTemplate(GET_PROPERTIES_MESSAGE, command=GET_PROPERTIES_MESSAGE["command"].format("device"))
+GET_LIVESTREAM_STATUS_COMMAND = CommandTemplate(GET_LIVESTREAM_STATUS_MESSAGE)
+SET_RTSP_STREAM_COMMAND = CommandTemplate(SET_RTSP_STREAM_MESSAGE)
+START_LIVESTREAM_COMMAND = CommandTemplate(SET_LIVESTREAM_MESSAGE, command=SET_LIVESTREAM_MESSAGE["command"].replace("{state}", "start"))
+STOP_LIVESTREAM_COMMAND = CommandTemplate(SET_LIVESTREAM_MESSAGE, command=SET_LIVESTREAM_MESSAGE["command"].replace("{state}", "stop"))
+SET_DEVICE_STATE_COMMAND = CommandTemplate(SET_DEVICE_STATE_MESSAGE)
+SET_GUARD_MODE_COMMAND = CommandTemplate(SET_GUARD_MODE_MESSAGE)
+STATION_TRIGGER_ALARM_COMMAND = CommandTemplate(STATION_TRIGGER_ALARM, fields=("seconds",))
+STATION_RESET_ALARM_COMMAND = CommandTemplate(STATION_RESET_ALARM)
+SET_LOCK_COMMAND = CommandTemplate(SET_LOCK_MESSAGE)
+LIVESTREAM_COMMANDS = {"start": START_LIVESTREAM_COMMAND, "stop": STOP_LIVESTREAM_COMMAND}
@@ -1,4 +1,5 @@
 import logging
+from typing import Any, Coroutine
 from homeassistant.config_entries import ConfigEntry
 
 from homeassistant.core import HomeAssistant
@@ -18,6 +19,18 @@ class EufySecurityEntity(CoordinatorEntity):
         self.entry: ConfigEntry = entry
         self.device: Device = device
 
+    async def async_send_optimistic(self, property_name: str, value, command: Coroutine[Any, Any, dict]):
+        # reflect the expected state right away, revert it if server does not acknowledge the command
+        previous_value = self.device.state.get(property_name)
+        self.device.state[property_name] = value
+        self.async_write_ha_state()
+        try:
+            return await command
+        except Exception:
+            self.device.state[property_name] = previous_value
+            self.async_write_ha_state()
+            raise
+
     @property
     def device_info(self):
         return {
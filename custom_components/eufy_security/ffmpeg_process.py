@@ -0,0 +1,258 @@
+import logging
+
+import asyncio
+from collections import deque
+from functools import partial
+import os
+from queue import Queue
+import select
+import subprocess
+import threading
+import time
+import traceback
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .metrics import Metrics
+from .video import is_keyframe
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+FFMPEG_LOG_LINES = 200
+FFMPEG_LINE_LIMIT = 1024 * 1024
+FFMPEG_WAIT_TIMEOUT = 5  # seconds
+FFMPEG_WRITE_TIMEOUT = 5  # seconds
+FFMPEG_OUTPUT_CHUNK = 65536
+# key=value lines written by -progress, kept as gauges
+FFMPEG_PROGRESS_GAUGES = {"fps": "ffmpeg_fps", "speed": "ffmpeg_speed", "bitrate": "ffmpeg_bitrate", "frame": "ffmpeg_frames", "drop_frames": "ffmpeg_drop_frames"}
+FFMPEG_ERROR_MARKERS = ("error", "invalid", "failed", "could not")
+FRAME_WRITER_QUEUE_SIZE = 64  # frames, a few seconds of video
+
+
+# ffmpeg process fed on stdin by video thread, stderr is drained on event loop so the pipe never fills up
+# last lines are kept in memory for diagnostics, progress lines are turned into metrics
+class ManagedFFmpeg:
+    def __init__(self, hass: HomeAssistant, name: str, binary: str, metrics: Metrics, log_lines: int = FFMPEG_LOG_LINES, write_timeout: float = FFMPEG_WRITE_TIMEOUT, on_output=None) -> None:
+        self.hass: HomeAssistant = hass
+        self.name: str = name
+        self.binary: str = binary
+        self.metrics: Metrics = metrics
+        self.write_timeout: float = write_timeout
+        # called on event loop with chunks of stdout, stdout is discarded without it
+        self.on_output = on_output
+        self.log: deque = deque(maxlen=log_lines)
+        self.process: subprocess.Popen = None
+        self.drain_task: asyncio.Task = None
+        self.output_task: asyncio.Task = None
+        # stdin is written on video thread and closed after exit, a closed descriptor could be reused while a write waits on it
+        self.write_lock: threading.Lock = threading.Lock()
+
+        # input and output progress, compared by watchdog to find a hung ffmpeg
+        self.bytes_written: int = 0
+        self.written_at: float = 0
+        self.progress_bytes: int = 0
+        self.progress_at: float = 0
+        self.progress_frame: str = None
+        self.stalled: bool = False
+
+    @property
+    def is_running(self) -> bool:
+        return not self.process is None and self.process.poll() is None
+
+    @property
+    def has_exited(self) -> bool:
+        return not self.process is None and not self.process.poll() is None
+
+    def is_stalled(self, timeout: float) -> bool:
+        if self.stalled == True:
+            return True
+        # input was written recently, but ffmpeg did not output a frame for it
+        now = time.monotonic()
+        return self.bytes_written > self.progress_bytes and now - self.written_at < timeout and now - self.progress_at > timeout
+
+    async def async_open(self, arguments: list) -> bool:
+        try:
+            process = await self.hass.async_add_executor_job(
+                partial(subprocess.Popen, [self.binary] + arguments, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL if self.on_output is None else subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+            )
+        except OSError as ex:
+            _LOGGER.error(f"{DOMAIN} {self.name} - ffmpeg - start failed: {ex}")
+            return False
+        # writes wait with select and a timeout, a hung ffmpeg must not block video thread forever
+        os.set_blocking(process.stdin.fileno(), False)
+        self.bytes_written = 0
+        self.progress_bytes = 0
+        self.progress_at = time.monotonic()
+        self.progress_frame = None
+        self.stalled = False
+        self.process = process
+        self.drain_task = self.hass.async_create_task(self.async_drain_stderr(process))
+        if not self.on_output is None:
+            self.output_task = self.hass.async_create_task(self.async_read_output(process))
+        return True
+
+    async def async_read_output(self, process: subprocess.Popen):
+        reader = asyncio.StreamReader(limit=FFMPEG_LINE_LIMIT)
+        transport, _ = await asyncio.get_event_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), process.stdout)
+        try:
+            while True:
+                data = await reader.read(FFMPEG_OUTPUT_CHUNK)
+                if len(data) == 0:
+                    break
+                self.on_output(data)
+        except Exception as ex:  # pylint: disable=broad-except
+            _LOGGER.error(f"{DOMAIN} {self.name} - ffmpeg - output exception: {ex}- traceback: {traceback.format_exc()}")
+        finally:
+            transport.close()
+
+    async def async_drain_stderr(self, process: subprocess.Popen):
+        reader = asyncio.StreamReader(limit=FFMPEG_LINE_LIMIT)
+        transport, _ = await asyncio.get_event_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), process.stderr)
+        try:
+            while True:
+                line = await reader.readline()
+                if len(line) == 0:
+                    break
+                self.handle_line(line.decode(errors="replace").rstrip())
+        except Exception as ex:  # pylint: disable=broad-except
+            _LOGGER.debug(f"{DOMAIN} {self.name} - ffmpeg - stderr drain exception: {ex}- traceback: {traceback.format_exc()}")
+        finally:
+            transport.close()
+
+        # stderr is closed when ffmpeg exits, process is reaped here
+        try:
+            return_code = await self.hass.async_add_executor_job(self.wait_and_close, process)
+        except subprocess.TimeoutExpired:
+            return
+        if return_code != 0 and return_code != -9:
+            self.metrics.increment("ffmpeg_failures")
+            _LOGGER.debug(f"{DOMAIN} {self.name} - ffmpeg - exited with {return_code} - last lines: {list(self.log)[-5:]}")
+
+    def wait_and_close(self, process: subprocess.Popen) -> int:
+        # called in executor, a write in progress fails fast on exited ffmpeg, so lock is not held for long
+        return_code = process.wait(FFMPEG_WAIT_TIMEOUT)
+        with self.write_lock:
+            process.stdin.close()
+        return return_code
+
+    def close_input(self, process: subprocess.Popen):
+        # called in executor, a write in progress is waited for
+        with self.write_lock:
+            process.stdin.close()
+
+    async def async_close(self, timeout: float) -> int:
+        # end of input lets ffmpeg finish its output, it is killed when that takes longer than timeout
+        process = self.process
+        if process is None:
+            return None
+        await self.hass.async_add_executor_job(self.close_input, process)
+        try:
+            await asyncio.wait_for(asyncio.shield(self.drain_task), timeout)
+        except asyncio.TimeoutError:
+            _LOGGER.debug(f"{DOMAIN} {self.name} - ffmpeg - did not exit in {timeout} seconds, kill it")
+            process.kill()
+            await self.drain_task
+        return process.returncode
+
+    def handle_line(self, line: str):
+        if len(line) == 0:
+            return
+        key, separator, value = line.partition("=")
+        if separator == "=" and not " " in key:
+            gauge = FFMPEG_PROGRESS_GAUGES.get(key)
+            if not gauge is None:
+                self.metrics.set(gauge, value.strip())
+            if key == "frame" and value != self.progress_frame:
+                self.progress_frame = value
+                self.progress_bytes = self.bytes_written
+                self.progress_at = time.monotonic()
+            return
+        self.log.append(line)
+        if any(marker in line.lower() for marker in FFMPEG_ERROR_MARKERS):
+            self.metrics.increment("ffmpeg_errors")
+
+    def write(self, frame_bytes):
+        if self.stalled == True:
+            raise TimeoutError("ffmpeg is stalled")
+        with self.write_lock:
+            process = self.process
+            if process is None or process.stdin.closed == True:
+                raise BrokenPipeError("ffmpeg input is closed")
+            file_descriptor = process.stdin.fileno()
+            view = memoryview(frame_bytes)
+            while len(view) > 0:
+                if len(select.select([], [file_descriptor], [], self.write_timeout)[1]) == 0:
+                    self.stalled = True
+                    raise TimeoutError(f"ffmpeg did not read input for {self.write_timeout} seconds")
+                view = view[os.write(file_descriptor, view):]
+        self.bytes_written = self.bytes_written + len(frame_bytes)
+        self.written_at = time.monotonic()
+
+    def get_log(self, lines: int = FFMPEG_LOG_LINES) -> list:
+        return list(self.log)[-lines:]
+
+    def kill(self):
+        if self.is_running == True:
+            self.process.kill()
+
+
+# feeds camera frames to a ManagedFFmpeg from a thread of its own, a slow or hung ffmpeg does not hold up video thread
+# frames that do not fit are dropped up to next key frame, frames without their reference frames would not decode
+class FrameWriter:
+    def __init__(self, name: str, ffmpeg: ManagedFFmpeg, metrics: Metrics, metric_prefix: str, size: int = FRAME_WRITER_QUEUE_SIZE) -> None:
+        self.name: str = name
+        self.ffmpeg: ManagedFFmpeg = ffmpeg
+        self.metrics: Metrics = metrics
+        self.metric_prefix: str = metric_prefix
+        self.size: int = size
+        self.queue: Queue = None
+        self.wait_for_keyframe: bool = True
+
+    def start(self):
+        # called on event loop after ffmpeg started, each stream gets its own queue and thread
+        self.stop()
+        self.wait_for_keyframe = True
+        self.queue = Queue(self.size)
+        threading.Thread(target=self.process_queue, args=(self.queue,), name=f"{self.name} frame writer", daemon=True).start()
+
+    def stop(self):
+        queue = self.queue
+        self.queue = None
+        if queue is None:
+            return
+        # waiting frames are dropped, writer thread ends on none
+        with queue.mutex:
+            queue.queue.clear()
+            queue.queue.append(None)
+            queue.not_empty.notify()
+
+    def put(self, frame_bytes, codec: str) -> bool:
+        # called on camera video thread, only thread putting frames, so queue can not fill up between check and put
+        queue = self.queue
+        if queue is None:
+            return False
+        if queue.full() == True:
+            with queue.mutex:
+                self.metrics.increment(f"{self.metric_prefix}_frames_dropped", len(queue.queue))
+                queue.queue.clear()
+            self.wait_for_keyframe = True
+        if self.wait_for_keyframe == True:
+            if is_keyframe(frame_bytes, codec) == False:
+                self.metrics.increment(f"{self.metric_prefix}_frames_dropped")
+                return False
+            self.wait_for_keyframe = False
+        queue.put_nowait(frame_bytes)
+        return True
+
+    def process_queue(self, queue: Queue):
+        while True:
+            frame_bytes = queue.get()
+            if frame_bytes is None:
+                return
+            try:
+                self.ffmpeg.write(frame_bytes)
+                self.metrics.increment(f"{self.metric_prefix}_frames_out")
+            except (TimeoutError, OSError) as ex:
+                self.metrics.increment(f"{self.metric_prefix}_frames_dropped")
+                _LOGGER.debug(f"{DOMAIN} {self.name} - {self.metric_prefix} - write failed - {ex}")
@@ -0,0 +1,139 @@
+import logging
+
+import asyncio
+import time
+import traceback
+from typing import Any, Callable, Coroutine
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .log import LazyPayload
+from .metrics import Metrics
+from .video import is_keyframe
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+LANE_CONTROL = "control"
+LANE_DEVICE = "device"
+LANE_VIDEO = "video"
+VIDEO_EVENTS = ["livestream video data", "livestream audio data"]
+# video lanes hold a few seconds of frames, control and device lanes push back on reader when full
+LANE_SIZES = {LANE_CONTROL: 256, LANE_DEVICE: 64, LANE_VIDEO: 128}
+# parameter sets and slice header of a frame are at its start, rest of frame is not converted to decide key frames
+KEYFRAME_PROBE_SIZE = 1024
+
+
+def get_lane_key(payload: dict):
+    # command results and messages without a device stay on control lane, in arrival order
+    if payload.get("type") == "event":
+        event = payload.get("event", {})
+        serial_number = event.get("serialNumber")
+        if not serial_number is None:
+            if event.get("event") in VIDEO_EVENTS:
+                return f"{LANE_VIDEO}.{serial_number}", LANE_VIDEO
+            return f"{LANE_DEVICE}.{serial_number}", LANE_DEVICE
+    return LANE_CONTROL, LANE_CONTROL
+
+
+def get_keyframe_flag(payload: dict):
+    # none for messages that are not video frames, like audio data
+    event = payload.get("event", {})
+    data = event.get("buffer", {}).get("data") if event.get("event") == VIDEO_EVENTS[0] else None
+    if data is None:
+        return None
+    return is_keyframe(bytes(data[:KEYFRAME_PROBE_SIZE]), str(event.get("metadata", {}).get("videoCodec", "")).lower())
+
+
+# messages of one lane are handled in order by its own task, lanes do not wait for each other
+class MessageLane:
+    def __init__(self, hass: HomeAssistant, name: str, lane_class: str, handler: Callable[[dict], Coroutine[Any, Any, None]], metrics: Metrics) -> None:
+        self.name: str = name
+        self.lane_class: str = lane_class
+        self.handler = handler
+        self.metrics: Metrics = metrics
+        self.queue: asyncio.Queue = asyncio.Queue(LANE_SIZES[lane_class])
+        self.processed: int = 0
+        self.dropped: int = 0
+        self.max_lag: float = 0
+        # video frames after dropped ones miss their reference frames, they are dropped up to next key frame
+        self.wait_for_keyframe: bool = False
+        self.task: asyncio.Task = hass.async_create_task(self.process_queue())
+
+    async def async_put(self, payload: dict):
+        if self.lane_class != LANE_VIDEO:
+            if self.queue.full() == True:
+                self.metrics.increment(f"lane_full.{self.lane_class}")
+            await self.queue.put((time.monotonic(), payload, None))
+            return
+
+        keyframe = get_keyframe_flag(payload)
+        if self.queue.full() == True:
+            # live video prefers newest frames, reader is not blocked
+            self.drop_to_keyframe()
+        if keyframe == True:
+            self.wait_for_keyframe = False
+        elif keyframe == False and self.wait_for_keyframe == True:
+            self.drop(1)
+            return
+        self.queue.put_nowait((time.monotonic(), payload, keyframe))
+
+    def drop_to_keyframe(self):
+        # waiting frames are dropped up to next waiting key frame, all of them when there is none
+        items = []
+        while self.queue.empty() == False:
+            items.append(self.queue.get_nowait())
+        start = next((index for index, item in enumerate(items) if index > 0 and item[2] == True), len(items))
+        if start == len(items):
+            self.wait_for_keyframe = True
+        self.drop(start)
+        for item in items[start:]:
+            self.queue.put_nowait(item)
+
+    def drop(self, count: int):
+        self.dropped = self.dropped + count
+        self.metrics.increment("lane_dropped.video", count)
+
+    async def process_queue(self):
+        while True:
+            queued_at, payload, _ = await self.queue.get()
+            started_at = time.monotonic()
+            lag = started_at - queued_at
+            self.max_lag = max(self.max_lag, lag)
+            self.metrics.observe(f"lane_lag.{self.lane_class}", lag)
+            try:
+                await self.handler(payload)
+            except Exception as ex:  # pylint: disable=broad-except
+                _LOGGER.error(f"{DOMAIN} - lane {self.name} - exception: %s - traceback: %s - message: %s", ex, traceback.format_exc(), LazyPayload(payload))
+            self.processed = self.processed + 1
+            self.metrics.observe(f"lane_handler_latency.{self.lane_class}", time.monotonic() - started_at)
+
+    def stop(self):
+        self.task.cancel()
+
+
+class MessageLanes:
+    def __init__(self, hass: HomeAssistant, handler: Callable[[dict], Coroutine[Any, Any, None]], metrics: Metrics) -> None:
+        self.hass: HomeAssistant = hass
+        self.handler = handler
+        self.metrics: Metrics = metrics
+        self.lanes: dict = {}
+
+    async def async_dispatch(self, payload: dict):
+        name, lane_class = get_lane_key(payload)
+        lane: MessageLane = self.lanes.get(name)
+        if lane is None:
+            lane = MessageLane(self.hass, name, lane_class, self.handler, self.metrics)
+            self.lanes[name] = lane
+        await lane.async_put(payload)
+
+    def get_diagnostics(self) -> dict:
+        return {
+            name: {"depth": lane.queue.qsize(), "max_lag": lane.max_lag, "processed": lane.processed, "dropped": lane.dropped}
+            for name, lane in self.lanes.items()
+        }
+
+    def stop(self):
+        for lane in self.lanes.values():
+            lane.stop()
+        self.lanes = {}
@@ -0,0 +1,367 @@
+import logging
+
+import asyncio
+from collections import deque
+import math
+import secrets
+import struct
+import time
+
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView, KEY_AUTHENTICATED
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+LLHLS_SEGMENTS = 6  # complete segments kept in playlist
+LLHLS_PART_SEGMENTS = 3  # parts are listed for this many last segments
+LLHLS_MIN_SEGMENT_DURATION = 1  # seconds, segments are cut at first key frame after it
+LLHLS_CONTENT_TYPES = {"m3u8": "application/vnd.apple.mpegurl", "mp4": "video/mp4", "m4s": "video/iso.segment"}
+SAMPLE_NON_SYNC = 0x00010000
+# fragmented mp4 on stdout, every fragment is an ll-hls part, new fragment starts at every key frame
+FFMPEG_LLHLS_OUTPUT = "-f mp4 -movflags empty_moov+default_base_moof+frag_keyframe -frag_duration {part_duration} pipe:1"
+
+
+def iter_boxes(data, start: int, end: int):
+    # iso bmff boxes in data[start:end] as (type, payload start, box end)
+    position = start
+    while position + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, position)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, position + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size or position + size > end:
+            return
+        yield box_type, position + header_size, position + size
+        position = position + size
+
+
+def find_box(data, start: int, end: int, path: list):
+    for box_type, payload_start, box_end in iter_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload_start, box_end
+            return find_box(data, payload_start, box_end, path[1:])
+    return None
+
+
+# single video track fragmented mp4, as written by ffmpeg with empty_moov and default_base_moof
+class TrackInfo:
+    def __init__(self, init_segment: bytes) -> None:
+        self.timescale: int = 90000
+        self.default_sample_duration: int = 0
+        self.default_sample_flags: int = 0
+        mdhd = find_box(init_segment, 0, len(init_segment), [b"moov", b"trak", b"mdia", b"mdhd"])
+        if not mdhd is None:
+            version = init_segment[mdhd[0]]
+            self.timescale = struct.unpack_from(">I", init_segment, mdhd[0] + (20 if version == 1 else 12))[0]
+        trex = find_box(init_segment, 0, len(init_segment), [b"moov", b"mvex", b"trex"])
+        if not trex is None:
+            self.default_sample_duration, _, self.default_sample_flags = struct.unpack_from(">III", init_segment, trex[0] + 12)
+
+    def parse_fragment(self, moof: bytes):
+        # duration in seconds and whether fragment starts with a sync sample
+        traf = find_box(moof, 0, len(moof), [b"moof", b"traf"])
+        if traf is None:
+            return 0, False
+        default_duration = self.default_sample_duration
+        default_flags = self.default_sample_flags
+        tfhd = find_box(moof, traf[0], traf[1], [b"tfhd"])
+        if not tfhd is None:
+            flags = struct.unpack_from(">I", moof, tfhd[0])[0] & 0xFFFFFF
+            position = tfhd[0] + 8
+            for flag, size in ((0x01, 8), (0x02, 4)):
+                if flags & flag:
+                    position = position + size
+            if flags & 0x08:
+                default_duration = struct.unpack_from(">I", moof, position)[0]
+                position = position + 4
+            if flags & 0x10:
+                position = position + 4
+            if flags & 0x20:
+                default_flags = struct.unpack_from(">I", moof, position)[0]
+
+        duration = 0
+        first_flags = None
+        for box_type, payload_start, _ in iter_boxes(moof, traf[0], traf[1]):
+            if box_type != b"trun":
+                continue
+            flags = struct.unpack_from(">I", moof, payload_start)[0] & 0xFFFFFF
+            sample_count = struct.unpack_from(">I", moof, payload_start + 4)[0]
+            position = payload_start + 8
+            if flags & 0x01:
+                position = position + 4
+            if flags & 0x04:
+                if first_flags is None:
+                    first_flags = struct.unpack_from(">I", moof, position)[0]
+                position = position + 4
+            for index in range(sample_count):
+                sample_duration = default_duration
+                if flags & 0x100:
+                    sample_duration = struct.unpack_from(">I", moof, position)[0]
+                    position = position + 4
+                if flags & 0x200:
+                    position = position + 4
+                if flags & 0x400:
+                    if index == 0 and first_flags is None:
+                        first_flags = struct.unpack_from(">I", moof, position)[0]
+                    position = position + 4
+                if flags & 0x800:
+                    position = position + 4
+                duration = duration + sample_duration
+        if first_flags is None:
+            first_flags = default_flags
+        return duration / self.timescale, first_flags & SAMPLE_NON_SYNC == 0
+
+
+class Segment:
+    def __init__(self, sequence: int, init_index: int, discontinuity: bool) -> None:
+        self.sequence: int = sequence
+        self.init_index: int = init_index
+        self.discontinuity: bool = discontinuity
+        self.parts: list = []  # (data, duration, independent)
+        self.duration: float = 0
+        self.complete: bool = False
+
+    def get_data(self) -> bytes:
+        return b"".join(data for data, _, _ in self.parts)
+
+
+# ll-hls playlist of one camera, built from fragmented mp4 written by ffmpeg to stdout
+# every moof + mdat pair is one part, segments are groups of parts starting with a key frame
+# fed and read on event loop, waiters of blocking playlist reload are woken up on every new part
+class LowLatencyPlaylist:
+    def __init__(self, name: str, part_duration: float) -> None:
+        self.name: str = name
+        self.part_duration: float = part_duration
+        self.token: str = secrets.token_urlsafe(16)
+        self.buffer: bytearray = bytearray()
+        self.init_segments: dict = {}
+        self.init_index: int = 0
+        self.init_data: bytes = b""
+        self.track: TrackInfo = None
+        self.moof: bytes = None
+        self.segments: deque = deque(maxlen=LLHLS_SEGMENTS + 1)
+        self.next_sequence: int = 0
+        self.discontinuity_sequence: int = 0
+        self.discontinuity: bool = False
+        self.max_part_duration: float = part_duration
+        self.max_segment_duration: float = LLHLS_MIN_SEGMENT_DURATION
+        # set when a part is added, waiters of that moment share it, next wait gets a new one
+        self.part_added: asyncio.Event = None
+        # called with every playlist request, and builds master playlist when variants exist
+        self.on_request = None
+        self.get_master = None
+
+    def start_stream(self):
+        # new ffmpeg process, it starts with a new init segment and a discontinuity
+        self.buffer = bytearray()
+        self.init_data = b""
+        self.moof = None
+        self.track = None
+        if len(self.segments) > 0:
+            self.segments[-1].complete = True
+            self.discontinuity = True
+
+    def feed(self, data: bytes):
+        self.buffer.extend(data)
+        position = 0
+        for box_type, _, box_end in iter_boxes(self.buffer, 0, len(self.buffer)):
+            self.handle_box(box_type, bytes(self.buffer[position:box_end]))
+            position = box_end
+        if position > 0:
+            del self.buffer[:position]
+
+    def handle_box(self, box_type: bytes, box: bytes):
+        if box_type in (b"ftyp", b"moov"):
+            self.init_data = self.init_data + box
+            if box_type == b"moov":
+                self.init_index = self.init_index + 1
+                self.init_segments[self.init_index] = self.init_data
+                # players only need init segments still referenced by playlist
+                for index in [index for index in self.init_segments if index < self.init_index - LLHLS_SEGMENTS]:
+                    self.init_segments.pop(index)
+                self.track = TrackInfo(self.init_data)
+                self.init_data = b""
+        elif box_type == b"moof":
+            self.moof = box
+        elif box_type == b"mdat" and not self.moof is None and not self.track is None:
+            duration, independent = self.track.parse_fragment(self.moof)
+            self.add_part(self.moof + box, duration, independent)
+            self.moof = None
+
+    def add_part(self, data: bytes, duration: float, independent: bool):
+        segment: Segment = self.segments[-1] if len(self.segments) > 0 else None
+        if segment is None or segment.complete == True or (independent == True and segment.duration >= LLHLS_MIN_SEGMENT_DURATION):
+            if not segment is None and segment.complete == False:
+                segment.complete = True
+                self.max_segment_duration = max(self.max_segment_duration, segment.duration)
+            if independent == False:
+                # a segment can only start with a key frame
+                return
+            # discontinuity sequence counts discontinuities that moved to or out of first playlist position
+            if len(self.segments) == self.segments.maxlen and self.segments[1].discontinuity == True:
+                self.discontinuity_sequence = self.discontinuity_sequence + 1
+            segment = Segment(self.next_sequence, self.init_index, self.discontinuity)
+            self.next_sequence = self.next_sequence + 1
+            self.discontinuity = False
+            self.segments.append(segment)
+        segment.parts.append((data, duration, independent))
+        segment.duration = segment.duration + duration
+        self.max_part_duration = max(self.max_part_duration, duration)
+        self.notify()
+
+    def notify(self):
+        # called on event loop with ffmpeg output, waiters are woken right away without a task
+        part_added = self.part_added
+        self.part_added = None
+        if not part_added is None:
+            part_added.set()
+
+    def has_part(self, sequence: int, part: int) -> bool:
+        # without a part number, whole segment is waited for
+        for segment in self.segments:
+            if segment.sequence == sequence:
+                return segment.complete == True or (not part is None and part < len(segment.parts))
+            if segment.sequence > sequence:
+                return True
+        return False
+
+    async def async_wait_for_part(self, sequence: int, part: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.has_part(sequence, part) == False:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self.part_added is None:
+                # created on first use, so it belongs to running loop
+                self.part_added = asyncio.Event()
+            try:
+                await asyncio.wait_for(self.part_added.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def get_segment(self, sequence: int) -> Segment:
+        for segment in self.segments:
+            if segment.sequence == sequence:
+                return segment
+        return None
+
+    def get_peak_bitrate(self, default: int) -> int:
+        # bits per second of heaviest complete segment, announced as variant bandwidth
+        bitrates = [sum(len(data) for data, _, _ in segment.parts) * 8 / segment.duration for segment in self.segments if segment.complete == True and segment.duration > 0]
+        return int(max(bitrates)) if len(bitrates) > 0 else default
+
+    def get_uri(self, file_name: str) -> str:
+        # players do not carry query of playlist url over to relative uris, so token is added to each
+        return f"{file_name}?token={self.token}"
+
+    def get_playlist(self) -> str:
+        segments = list(self.segments)
+        part_target = self.max_part_duration
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:9",
+            f"#EXT-X-TARGETDURATION:{math.ceil(self.max_segment_duration)}",
+            f"#EXT-X-PART-INF:PART-TARGET={part_target:.3f}",
+            f"#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK={3 * part_target:.3f}",
+            f"#EXT-X-MEDIA-SEQUENCE:{segments[0].sequence}",
+            f"#EXT-X-DISCONTINUITY-SEQUENCE:{self.discontinuity_sequence}",
+        ]
+        init_index = None
+        for index, segment in enumerate(segments):
+            if segment.discontinuity == True and index > 0:
+                lines.append("#EXT-X-DISCONTINUITY")
+            if segment.init_index != init_index:
+                init_index = segment.init_index
+                lines.append(f'#EXT-X-MAP:URI="{self.get_uri(f"init{init_index}.mp4")}"')
+            if index >= len(segments) - LLHLS_PART_SEGMENTS:
+                for part_index, (_, duration, independent) in enumerate(segment.parts):
+                    independent_attribute = ",INDEPENDENT=YES" if independent == True else ""
+                    lines.append(f'#EXT-X-PART:DURATION={duration:.3f},URI="{self.get_uri(f"part{segment.sequence}.{part_index}.m4s")}"{independent_attribute}')
+            if segment.complete == True:
+                lines.append(f"#EXTINF:{segment.duration:.3f},")
+                lines.append(self.get_uri(f"segment{segment.sequence}.m4s"))
+        last = segments[-1]
+        if last.complete == True:
+            lines.append(f'#EXT-X-PRELOAD-HINT:TYPE=PART,URI="{self.get_uri(f"part{last.sequence + 1}.0.m4s")}"')
+        else:
+            lines.append(f'#EXT-X-PRELOAD-HINT:TYPE=PART,URI="{self.get_uri(f"part{last.sequence}.{len(last.parts)}.m4s")}"')
+        return "\n".join(lines) + "\n"
+
+
+# serves ll-hls playlists of cameras, requests carry home assistant auth or playlist token
+class LowLatencyHlsView(HomeAssistantView):
+    url = "/api/eufy_security/llhls/{serial_number}/{file_name}"
+    name = "api:eufy_security:llhls"
+    requires_auth = False
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass: HomeAssistant = hass
+
+    async def get(self, request: web.Request, serial_number: str, file_name: str) -> web.Response:
+        playlists = getattr(self.hass.data.get(DOMAIN), "llhls_playlists", {})
+        playlist: LowLatencyPlaylist = playlists.get(serial_number)
+        if playlist is None:
+            raise web.HTTPNotFound()
+        if request.get(KEY_AUTHENTICATED, False) == False and not secrets.compare_digest(request.query.get("token", ""), playlist.token):
+            raise web.HTTPUnauthorized()
+
+        # blocking requests wait for a part up to three target durations
+        timeout = 3 * math.ceil(playlist.max_segment_duration)
+        name, _, extension = file_name.rpartition(".")
+        try:
+            body = await self.async_get_file(playlist, request, name, extension, timeout)
+        except ValueError as ex:
+            raise web.HTTPNotFound() from ex
+        if body is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=body, content_type=LLHLS_CONTENT_TYPES[extension], headers={"Cache-Control": "no-cache"})
+
+    async def async_get_file(self, playlist: LowLatencyPlaylist, request: web.Request, name: str, extension: str, timeout: float) -> bytes:
+        if name == "master" and extension == "m3u8":
+            body = None if playlist.get_master is None else playlist.get_master().encode()
+        elif name == "playlist" and extension == "m3u8":
+            if not playlist.on_request is None:
+                playlist.on_request(request)
+            body = await self.async_get_playlist(playlist, request, timeout)
+        elif name.startswith("init") and extension == "mp4":
+            body = playlist.init_segments.get(int(name[4:]))
+        elif name.startswith("segment") and extension == "m4s":
+            segment = playlist.get_segment(int(name[7:]))
+            body = None if segment is None or segment.complete == False else segment.get_data()
+        elif name.startswith("part") and extension == "m4s":
+            sequence, _, part = name[4:].partition(".")
+            body = await self.async_get_part(playlist, int(sequence), int(part), timeout)
+        else:
+            body = None
+        return body
+
+    async def async_get_playlist(self, playlist: LowLatencyPlaylist, request: web.Request, timeout: float) -> bytes:
+        if "_HLS_msn" in request.query:
+            sequence = int(request.query["_HLS_msn"])
+            part = int(request.query["_HLS_part"]) if "_HLS_part" in request.query else None
+            if len(playlist.segments) > 0 and sequence > playlist.segments[-1].sequence + 2:
+                raise web.HTTPBadRequest()
+            if await playlist.async_wait_for_part(sequence, part, timeout) == False:
+                raise web.HTTPServiceUnavailable()
+        elif len(playlist.segments) == 0 and await playlist.async_wait_for_part(0, 0, timeout) == False:
+            raise web.HTTPServiceUnavailable()
+        return playlist.get_playlist().encode()
+
+    async def async_get_part(self, playlist: LowLatencyPlaylist, sequence: int, part: int, timeout: float) -> bytes:
+        # preload hint points to a part that does not exist yet, request is held until it is written
+        segment = playlist.get_segment(sequence)
+        if segment is None or part >= len(segment.parts):
+            if await playlist.async_wait_for_part(sequence, part, timeout) == False:
+                return None
+            segment = playlist.get_segment(sequence)
+        if segment is None or part >= len(segment.parts):
+            return None
+        return segment.parts[part][0]
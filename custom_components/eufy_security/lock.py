@@ -38,8 +38,8 @@ class Lock(EufySecurityEntity, LockEntity):
     def is_locked(self):
         return self.device.state.get("locked")
 
-    async def async_lock(self):
-        await self.coordinator.async_set_lock(self.device.serial_number, True)
+    async def async_lock(self, **kwargs):
+        await self.async_send_optimistic("locked", True, self.coordinator.async_set_lock(self.device.serial_number, True))
 
-    async def async_unlock(self):
-        await self.coordinator.async_set_lock(self.device.serial_number, False)
\ No newline at end of file
+    async def async_unlock(self, **kwargs):
+        await self.async_send_optimistic("locked", False, self.coordinator.async_set_lock(self.device.serial_number, False))
\ No newline at end of file
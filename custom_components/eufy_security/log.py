@@ -0,0 +1,28 @@
+MAX_PAYLOAD_LENGTH = 512
+VIDEO_FRAME_LOG_SAMPLE_RATE = 100
+
+
+# payload is converted to text only when a log record is really emitted, long payloads are truncated
+class LazyPayload:
+    __slots__ = ("payload", "max_length")
+
+    def __init__(self, payload, max_length: int = MAX_PAYLOAD_LENGTH) -> None:
+        self.payload = payload
+        self.max_length = max_length
+
+    def __str__(self) -> str:
+        text = str(self.payload)
+        if len(text) > self.max_length:
+            return f"{text[:self.max_length]}... ({len(text)} chars)"
+        return text
+
+
+# lets first and then every rate-th call through, for logging high rate messages such as video frames
+class LogSampler:
+    def __init__(self, rate: int) -> None:
+        self.rate: int = rate
+        self.counter: int = 0
+
+    def sample(self) -> bool:
+        self.counter = self.counter + 1
+        return self.counter % self.rate == 1 or self.rate == 1
@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+# upper bounds in seconds, last bucket catches everything above
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, float("inf"))
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.total: float = 0
+        self.max: float = 0
+        self.buckets: list = [0] * len(HISTOGRAM_BUCKETS)
+
+    def observe(self, value: float):
+        self.count = self.count + 1
+        self.total = self.total + value
+        if value > self.max:
+            self.max = value
+        for index, upper_bound in enumerate(HISTOGRAM_BUCKETS):
+            if value <= upper_bound:
+                self.buckets[index] = self.buckets[index] + 1
+                break
+
+    @property
+    def average(self) -> float:
+        if self.count == 0:
+            return 0
+        return self.total / self.count
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "average": self.average,
+            "max": self.max,
+            "buckets": {str(upper_bound): value for upper_bound, value in zip(HISTOGRAM_BUCKETS, self.buckets)},
+        }
+
+
+# counters and histograms are updated from event loop and camera threads, plain int updates are good enough for metrics
+class Metrics:
+    def __init__(self) -> None:
+        self.counters: dict = defaultdict(int)
+        self.gauges: dict = {}
+        self.histograms: dict = defaultdict(Histogram)
+
+    def increment(self, name: str, value: int = 1):
+        self.counters[name] = self.counters[name] + value
+
+    def set(self, name: str, value):
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        self.histograms[name].observe(value)
+
+    def counter(self, name: str) -> int:
+        return self.counters.get(name, 0)
+
+    def gauge(self, name: str, default=None):
+        return self.gauges.get(name, default)
+
+    def histogram(self, name: str) -> Histogram:
+        # reading does not add an entry, a histogram without observations is empty
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            return Histogram()
+        return histogram
+
+    def as_dict(self) -> dict:
+        # camera threads may add entries meanwhile, dicts are copied in one step before they are iterated
+        histograms = list(self.histograms.items())
+        return {
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "histograms": {name: histogram.as_dict() for name, histogram in histograms},
+        }
@@ -0,0 +1,155 @@
+import logging
+
+import asyncio
+import time
+
+from aiohttp import web
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN
+from .ffmpeg_process import FrameWriter, ManagedFFmpeg
+from .metrics import Metrics
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+JPEG_END = b"\xff\xd9"
+MJPEG_BOUNDARY = "frame"
+MJPEG_IMAGE_TIMEOUT = 5  # seconds without an image before decoder is started again
+MJPEG_JPEG_QUALITY = 5  # mjpeg qscale, 2 is best and 31 is worst
+# decoded images are throttled by ffmpeg, so every client gets the same rate without decoding twice
+FFMPEG_MJPEG_OUTPUT = ["-an", "-vf", "fps={fps}", "-f", "image2pipe", "-c:v", "mjpeg", "-q:v", str(MJPEG_JPEG_QUALITY), "-nostats", "-progress", "pipe:2", "-loglevel", "{loglevel}", "pipe:1"]
+
+
+# splits jpeg images written back to back by ffmpeg, end marker can not occur inside entropy coded data
+class JpegReader:
+    def __init__(self, on_image) -> None:
+        self.on_image = on_image
+        self.buffer: bytearray = bytearray()
+
+    def reset(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes):
+        self.buffer.extend(data)
+        end = self.buffer.find(JPEG_END)
+        while end >= 0:
+            image = bytes(self.buffer[: end + len(JPEG_END)])
+            del self.buffer[: end + len(JPEG_END)]
+            self.on_image(image)
+            end = self.buffer.find(JPEG_END)
+
+
+# mjpeg clients of a camera share one decoder, images are fanned out to every connected client
+# a slow client skips images instead of holding others back, decoder runs only while a client is connected
+class MjpegStream:
+    def __init__(self, hass: HomeAssistant, name: str, binary: str, metrics: Metrics, fps: int, loglevel: str, async_open, async_close) -> None:
+        self.hass: HomeAssistant = hass
+        self.name: str = name
+        self.metrics: Metrics = metrics
+        self.fps: int = fps
+        self.loglevel: str = loglevel
+        # camera holds its stream and calls async_start with input of decoder, then releases stream on close
+        self.async_open = async_open
+        self.async_close = async_close
+        self.reader: JpegReader = JpegReader(self.publish)
+        # progress gauges of this ffmpeg are kept apart from camera's own ffmpeg
+        self.ffmpeg: ManagedFFmpeg = ManagedFFmpeg(hass, f"{name} mjpeg", binary, Metrics(), on_output=self.reader.feed)
+        self.clients: list = []
+        self.image: bytes = None
+        self.image_at: float = None
+        # p2p frames are queued by video thread and written to decoder's stdin by writer thread, other inputs are read by ffmpeg itself
+        self.writer: FrameWriter = FrameWriter(f"{name} mjpeg", self.ffmpeg, metrics, "mjpeg")
+        self.codec: str = None
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self.ffmpeg.is_running
+
+    def get_image(self, max_age: float) -> bytes:
+        if self.is_running == False or self.image_at is None or time.monotonic() - self.image_at > max_age:
+            return None
+        return self.image
+
+    async def async_start(self, input_arguments: list, codec: str = None) -> bool:
+        if self.ffmpeg.is_running == True:
+            return True
+        _LOGGER.debug(f"{DOMAIN} {self.name} - mjpeg - start decoder for {len(self.clients)} clients")
+        self.codec = codec
+        self.reader.reset()
+        output_arguments = [argument.format(fps=self.fps, loglevel=self.loglevel) for argument in FFMPEG_MJPEG_OUTPUT]
+        started = await self.ffmpeg.async_open(["-y"] + input_arguments + output_arguments)
+        if started == True:
+            if not codec is None:
+                self.writer.start()
+            self.metrics.increment("mjpeg_decoder_starts")
+        return started
+
+    def stop(self):
+        self.writer.stop()
+        if self.ffmpeg.is_running == True:
+            _LOGGER.debug(f"{DOMAIN} {self.name} - mjpeg - stop decoder")
+            self.ffmpeg.kill()
+
+    def on_frame(self, frame_bytes, codec: str):
+        # called on camera video thread
+        if self.codec is None or self.ffmpeg.is_running == False:
+            return
+        if codec != self.codec:
+            # decoder is started again with new codec after it is stopped by camera
+            return
+        self.writer.put(frame_bytes, codec)
+
+    def publish(self, image: bytes):
+        self.image = image
+        self.image_at = time.monotonic()
+        self.metrics.increment("mjpeg_images")
+        for queue in self.clients:
+            if queue.full() == True:
+                queue.get_nowait()
+                self.metrics.increment("mjpeg_images_skipped")
+            queue.put_nowait(image)
+
+    async def async_open_decoder(self):
+        # first client, or decoder stopped while clients are connected, eg stream was restarted
+        async with self.lock:
+            if self.ffmpeg.is_running == False and len(self.clients) > 0:
+                await self.async_open()
+
+    async def async_handle_request(self, request: web.Request) -> web.StreamResponse:
+        queue: asyncio.Queue = asyncio.Queue(1)
+        self.clients.append(queue)
+        self.metrics.set("mjpeg_clients", len(self.clients))
+        try:
+            await self.async_open_decoder()
+            response = web.StreamResponse()
+            response.content_type = f"multipart/x-mixed-replace;boundary={MJPEG_BOUNDARY}"
+            await response.prepare(request)
+            while True:
+                try:
+                    image = await asyncio.wait_for(queue.get(), MJPEG_IMAGE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    await self.async_open_decoder()
+                    continue
+                await response.write(f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(image)}\r\n\r\n".encode() + image + b"\r\n")
+        except HomeAssistantError as ex:
+            _LOGGER.debug(f"{DOMAIN} {self.name} - mjpeg - stream could not be started: {ex}")
+            raise web.HTTPServiceUnavailable() from ex
+        except ConnectionResetError:
+            # client left
+            pass
+        finally:
+            self.clients.remove(queue)
+            self.metrics.set("mjpeg_clients", len(self.clients))
+            if len(self.clients) == 0:
+                # request task may be cancelled, so decoder is stopped in its own task
+                self.hass.async_create_task(self.async_close_decoder())
+        return response
+
+    async def async_close_decoder(self):
+        async with self.lock:
+            if len(self.clients) > 0:
+                return
+            self.stop()
+            await self.async_close()
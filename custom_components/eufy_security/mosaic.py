@@ -0,0 +1,164 @@
+import logging
+
+import asyncio
+import math
+import os
+import time
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_call_later
+
+from .const import DOMAIN
+from .ffmpeg_process import ManagedFFmpeg
+from .metrics import Metrics
+from .mjpeg import JpegReader
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+MOSAIC_TILE_WIDTH = 640
+MOSAIC_TILE_HEIGHT = 360
+MOSAIC_IDLE_TIMEOUT = 30  # seconds without an image request before ffmpeg is stopped
+MOSAIC_FIRST_IMAGE_TIMEOUT = 10  # seconds
+MOSAIC_RESTART_DELAY = 3  # seconds, changes of several cameras are applied with one restart
+MOSAIC_JPEG_QUALITY = 5  # mjpeg qscale, 2 is best and 31 is worst
+
+TILE_LIVE = "live"
+TILE_PICTURE = "picture"
+TILE_EMPTY = "empty"
+
+
+def get_mosaic_layout(count: int) -> str:
+    # tiles fill rows of an almost square grid, left to right
+    columns = math.ceil(math.sqrt(count))
+    return "|".join(f"{(index % columns) * MOSAIC_TILE_WIDTH}_{(index // columns) * MOSAIC_TILE_HEIGHT}" for index in range(count))
+
+
+def get_mosaic_arguments(tiles: list, fps: int, loglevel: str) -> list:
+    # tiles are (kind, source), every tile is one input of a single filter graph
+    arguments = ["-y"]
+    filters = []
+    for index, (kind, source) in enumerate(tiles):
+        if kind == TILE_LIVE:
+            arguments = arguments + ["-fflags", "nobuffer", "-i", source]
+        elif kind == TILE_PICTURE:
+            # still pictures are read at output rate, otherwise they would be looped as fast as ffmpeg can
+            arguments = arguments + ["-re", "-loop", "1", "-framerate", str(fps), "-i", source]
+        else:
+            arguments = arguments + ["-f", "lavfi", "-i", f"color=c=black:s={MOSAIC_TILE_WIDTH}x{MOSAIC_TILE_HEIGHT}:r={fps}"]
+        filters.append(
+            f"[{index}:v]setpts=PTS-STARTPTS,fps={fps},"
+            f"scale={MOSAIC_TILE_WIDTH}:{MOSAIC_TILE_HEIGHT}:force_original_aspect_ratio=decrease,"
+            f"pad={MOSAIC_TILE_WIDTH}:{MOSAIC_TILE_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1[tile{index}]"
+        )
+    if len(tiles) == 1:
+        filters.append("[tile0]null[mosaic]")
+    else:
+        filters.append("".join(f"[tile{index}]" for index in range(len(tiles))) + f"xstack=inputs={len(tiles)}:layout={get_mosaic_layout(len(tiles))}:fill=black[mosaic]")
+    return arguments + [
+        "-filter_complex", ";".join(filters),
+        "-map", "[mosaic]",
+        "-an",
+        "-f", "image2pipe",
+        "-c:v", "mjpeg",
+        "-q:v", str(MOSAIC_JPEG_QUALITY),
+        "-nostats",
+        "-progress", "pipe:2",
+        "-loglevel", loglevel,
+        "pipe:1",
+    ]
+
+
+# grid of several cameras composed by one ffmpeg filter graph, streaming cameras are live tiles and others show their last picture
+# ffmpeg writes jpeg images to stdout, only latest image is kept, it runs only while images are requested
+class MosaicCompositor:
+    def __init__(self, hass: HomeAssistant, name: str, binary: str, metrics: Metrics, fps: int, loglevel: str, directory: str, get_tiles) -> None:
+        self.hass: HomeAssistant = hass
+        self.name: str = name
+        self.metrics: Metrics = metrics
+        self.fps: int = fps
+        self.loglevel: str = loglevel
+        # still pictures are written here, ffmpeg reads them as looped inputs
+        self.directory: str = directory
+        # coroutine returning tiles as (kind, source)
+        self.get_tiles = get_tiles
+        self.reader: JpegReader = JpegReader(self.on_image)
+        self.ffmpeg: ManagedFFmpeg = ManagedFFmpeg(hass, name, binary, metrics, on_output=self.reader.feed)
+        self.image: bytes = None
+        self.image_event: asyncio.Event = None
+        self.requested_at: float = None
+        self.restart_callback = None
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self.ffmpeg.is_running
+
+    def is_requested(self) -> bool:
+        return not self.requested_at is None and time.monotonic() - self.requested_at < MOSAIC_IDLE_TIMEOUT
+
+    def on_image(self, image: bytes):
+        self.image = image
+        self.metrics.increment("mosaic_images")
+        if not self.image_event is None:
+            self.image_event.set()
+
+    def write_picture(self, serial_number: str, picture: bytes) -> str:
+        # called in executor
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{serial_number}.jpg")
+        with open(path, "wb") as picture_file:
+            picture_file.write(picture)
+        return path
+
+    async def async_start(self):
+        async with self.lock:
+            if self.ffmpeg.is_running == True:
+                return
+            tiles = await self.get_tiles()
+            if len(tiles) == 0:
+                return
+            _LOGGER.debug(f"{DOMAIN} {self.name} - mosaic - start with {[kind for kind, _ in tiles]}")
+            self.reader.reset()
+            self.image_event = asyncio.Event()
+            if await self.ffmpeg.async_open(get_mosaic_arguments(tiles, self.fps, self.loglevel)) == True:
+                self.metrics.increment("mosaic_starts")
+
+    def stop(self):
+        if not self.restart_callback is None:
+            self.restart_callback()
+            self.restart_callback = None
+        if self.ffmpeg.is_running == True:
+            _LOGGER.debug(f"{DOMAIN} {self.name} - mosaic - stop")
+            self.ffmpeg.kill()
+
+    async def async_get_image(self) -> bytes:
+        self.requested_at = time.monotonic()
+        if self.ffmpeg.is_running == False:
+            await self.async_start()
+        if self.image is None and not self.image_event is None:
+            try:
+                await asyncio.wait_for(self.image_event.wait(), MOSAIC_FIRST_IMAGE_TIMEOUT)
+            except asyncio.TimeoutError:
+                _LOGGER.debug(f"{DOMAIN} {self.name} - mosaic - no image yet - last lines: {self.ffmpeg.get_log(5)}")
+        return self.image
+
+    def schedule_restart(self):
+        # a camera started or stopped streaming, or took a new picture, so graph inputs change
+        if self.ffmpeg.is_running == False or not self.restart_callback is None:
+            return
+        self.restart_callback = async_call_later(self.hass, MOSAIC_RESTART_DELAY, self.async_restart)
+
+    async def async_restart(self, executed_at=None):
+        self.restart_callback = None
+        self.ffmpeg.kill()
+        # previous process has to be reaped, otherwise it still counts as running
+        await self.ffmpeg.drain_task
+        if self.is_requested() == True:
+            await self.async_start()
+
+    async def async_check(self, event_time=None):
+        if self.is_requested() == False:
+            self.stop()
+        elif self.ffmpeg.has_exited == True:
+            _LOGGER.warning(f"{DOMAIN} {self.name} - mosaic - ffmpeg exited, restarting - last lines: {self.ffmpeg.get_log(5)}")
+            await self.async_start()
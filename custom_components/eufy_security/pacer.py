@@ -0,0 +1,63 @@
+import time
+
+from .metrics import Metrics
+
+# frames are held back at most this many frame intervals after arrival, pacing only smooths jitter of a burst
+PACING_JITTER_BUDGET = 1  # frame intervals
+# and never longer than this, whatever the frame rate
+MAX_PACING_DELAY = 0.1  # seconds
+# arrival this far off schedule is a gap in stream or a camera not running at its reported rate, schedule restarts from arrival
+MAX_PACING_LAG = 1  # seconds
+JITTER_GAIN = 1 / 16
+
+
+# p2p frames carry no timestamps, only fps in metadata
+# frames are given slots on a constant rate schedule anchored at arrival, presentation time is the slot
+# early frames of a burst wait for their slot, bounded by jitter budget, late frames are released at once
+# jitter is the rfc 3550 interarrival jitter against the nominal frame interval
+class FramePacer:
+    def __init__(self, metrics: Metrics) -> None:
+        self.metrics: Metrics = metrics
+        self.reset()
+
+    def reset(self):
+        self.started_at: float = None
+        self.anchor: float = None
+        self.index: int = 0
+        self.fps: int = None
+        self.last_received_at: float = None
+        self.jitter: float = 0
+
+    def schedule(self, received_at: float, fps: int):
+        # returns seconds to wait before frame is written and its presentation time from start of stream
+        now = time.monotonic()
+        interval = 1 / fps
+        if not self.last_received_at is None:
+            arrival_interval = received_at - self.last_received_at
+            self.jitter = self.jitter + (abs(arrival_interval - interval) - self.jitter) * JITTER_GAIN
+            self.metrics.observe("frame_interarrival", arrival_interval)
+            self.metrics.set("frame_jitter", round(self.jitter * 1000, 2))
+        self.last_received_at = received_at
+
+        if self.anchor is None:
+            self.started_at = received_at
+            self.anchor = received_at
+            self.index = 0
+        elif fps != self.fps:
+            # rate change keeps presentation time continuous
+            self.anchor = self.anchor + self.index / self.fps
+            self.index = 0
+        self.fps = fps
+
+        due = self.anchor + self.index * interval
+        if abs(received_at - due) > MAX_PACING_LAG:
+            self.metrics.increment("pacer_resyncs")
+            if received_at < due:
+                # presentation time must not go backwards, it continues from previous frame instead
+                self.started_at = self.started_at - (due - received_at)
+            self.anchor = received_at
+            self.index = 0
+            due = received_at
+        self.index = self.index + 1
+        release_at = min(due, received_at + min(interval * PACING_JITTER_BUDGET, MAX_PACING_DELAY))
+        return max(0, release_at - now), due - self.started_at
@@ -0,0 +1,92 @@
+import logging
+
+import asyncio
+import cProfile
+import io
+import pstats
+import threading
+import time
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+TOP_HOTSPOTS = 15
+# camera threads hand over their profiles on their next loop iteration after capture ends
+THREAD_COLLECT_DELAY = 1  # seconds
+
+
+class EufySecurityProfiler:
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass: HomeAssistant = hass
+        self.active: bool = False
+        self.run_id: int = 0
+        self.loop_profile: cProfile.Profile = None
+        self.thread_profiles: list = []
+        self.lock = threading.Lock()
+
+    def update_thread_profile(self, thread_profile):
+        # called by camera threads on every loop iteration, only an attribute check while no capture is running
+        if self.active == True and thread_profile is None:
+            profile = cProfile.Profile()
+            profile.enable()
+            return (self.run_id, profile)
+        if self.active == False and not thread_profile is None:
+            self.collect_thread_profile(thread_profile)
+            return None
+        return thread_profile
+
+    def collect_thread_profile(self, thread_profile):
+        run_id, profile = thread_profile
+        profile.disable()
+        with self.lock:
+            if run_id == self.run_id:
+                self.thread_profiles.append(profile)
+
+    async def async_profile(self, duration: float) -> str:
+        if self.active == True:
+            raise HomeAssistantError("Profiling is already running")
+
+        self.run_id = self.run_id + 1
+        self.thread_profiles = []
+        self.loop_profile = cProfile.Profile()
+        # event loop thread covers websocket reader, coordinator and camera coroutines
+        self.loop_profile.enable()
+        self.active = True
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            self.active = False
+            self.loop_profile.disable()
+
+        await asyncio.sleep(THREAD_COLLECT_DELAY)
+        path, hotspots = await self.hass.async_add_executor_job(self.write_results)
+        _LOGGER.info("%s - profile written to %s - top hotspots:\n%s", DOMAIN, path, hotspots)
+        self.hass.components.persistent_notification.async_create(
+            f"Profile written to `{path}`\n\nTop hotspots:\n```\n{hotspots}\n```",
+            title="Eufy Security Profile",
+            notification_id=f"{DOMAIN}_profile",
+        )
+        return path
+
+    def write_results(self):
+        with self.lock:
+            profiles = [self.loop_profile] + self.thread_profiles
+            self.thread_profiles = []
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+
+        base_path = self.hass.config.path(f"{DOMAIN}_profile_{int(time.time())}")
+        stats.dump_stats(f"{base_path}.prof")
+
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(DOMAIN, TOP_HOTSPOTS)
+        hotspots = output.getvalue()
+        with open(f"{base_path}.txt", "w") as file_object:
+            file_object.write(hotspots)
+        return f"{base_path}.prof", hotspots[max(hotspots.find("ncalls"), 0):]
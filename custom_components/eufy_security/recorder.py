@@ -0,0 +1,202 @@
+import logging
+
+import asyncio
+from collections import deque
+from datetime import datetime
+import os
+import threading
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .ffmpeg_process import ManagedFFmpeg
+from .metrics import Metrics
+from .video import DEFAULT_VIDEO_FPS, is_keyframe
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+MAX_PRE_ROLL_BYTES = 8 * 1024 * 1024
+MAX_CLIP_DURATION = 300  # seconds, clip is closed even if events keep extending it
+CLIP_CLOSE_TIMEOUT = 10  # seconds
+
+
+# keeps last seconds of p2p frames as complete groups of pictures, so a clip always starts with a key frame
+# frames are kept by reference, nothing is copied into the buffer or into the clip
+class PreRollBuffer:
+    def __init__(self, seconds: float, max_bytes: int = MAX_PRE_ROLL_BYTES) -> None:
+        self.seconds: float = seconds
+        self.max_bytes: int = max_bytes
+        self.gops: deque = deque()
+        self.size: int = 0
+
+    def add(self, received_at: float, frame_bytes, keyframe: bool):
+        if keyframe == True:
+            self.gops.append((received_at, []))
+        elif len(self.gops) == 0:
+            # frames before first key frame cannot be decoded
+            return
+        self.gops[-1][1].append(frame_bytes)
+        self.size = self.size + len(frame_bytes)
+        self.evict(received_at)
+
+    def evict(self, now: float):
+        # oldest group is dropped when the next one still covers pre-roll, or when buffer is over its byte budget
+        while len(self.gops) > 1 and (self.gops[1][0] <= now - self.seconds or self.size > self.max_bytes):
+            _, frames = self.gops.popleft()
+            self.size = self.size - sum(len(frame_bytes) for frame_bytes in frames)
+        if self.size > self.max_bytes:
+            # a single group over budget, eg long key frame interval, is dropped and buffer starts again at next key frame
+            self.clear()
+
+    def frames(self):
+        for _, frames in self.gops:
+            yield from frames
+
+    def clear(self):
+        self.gops.clear()
+        self.size = 0
+
+
+# records p2p frames into mp4 clips without transcoding, pre-roll is written first, live frames follow until clip ends
+# frames are written on camera thread with a write timeout, clip ffmpeg is started and closed on event loop
+# so its start and the mp4 rewrite at its end never hold up the video thread
+class ClipRecorder:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        name: str,
+        serial_number: str,
+        ffmpeg_binary: str,
+        directory: str,
+        pre_roll: float,
+        duration: float,
+        retention: int,
+        metrics: Metrics,
+        on_clip_recorded=None,
+        get_fps=None,
+    ) -> None:
+        self.hass: HomeAssistant = hass
+        self.name: str = name
+        self.serial_number: str = serial_number
+        self.ffmpeg_binary: str = ffmpeg_binary
+        self.directory: str = directory
+        self.duration: float = duration
+        self.retention: int = retention
+        self.metrics: Metrics = metrics
+        self.on_clip_recorded = on_clip_recorded
+        # raw input has no timestamps, they are derived from camera's frame rate like for camera's own ffmpeg
+        self.get_fps = get_fps
+
+        self.pre_roll: PreRollBuffer = PreRollBuffer(pre_roll)
+        self.record_until: float = 0
+        self.ffmpeg: ManagedFFmpeg = None
+        self.open_future = None
+        # pre-roll is written once clip ffmpeg runs, frames arriving before are kept in pre-roll
+        self.pre_roll_pending: bool = False
+        self.clip_path: str = None
+        self.clip_started_at: float = 0
+        self.lock = threading.Lock()
+
+    @property
+    def is_recording(self) -> bool:
+        return not self.ffmpeg is None
+
+    def trigger(self):
+        # every trigger extends the running clip, capped by MAX_CLIP_DURATION
+        self.record_until = time.monotonic() + self.duration
+
+    def add_frame(self, frame_bytes, codec: str):
+        received_at = time.monotonic()
+        with self.lock:
+            self.pre_roll.add(received_at, frame_bytes, is_keyframe(frame_bytes, codec))
+            self.metrics.set("pre_roll_bytes", self.pre_roll.size)
+
+            if self.is_recording == True:
+                if received_at > self.record_until or received_at - self.clip_started_at > MAX_CLIP_DURATION:
+                    self.close_clip()
+                elif self.ffmpeg.is_running == True:
+                    if self.pre_roll_pending == True:
+                        # pre-roll already holds this frame
+                        self.pre_roll_pending = False
+                        for pre_roll_frame in self.pre_roll.frames():
+                            if self.write(pre_roll_frame) == False:
+                                break
+                    else:
+                        self.write(frame_bytes)
+            elif received_at <= self.record_until and len(self.pre_roll.gops) > 0:
+                # pre-roll starts with a key frame and already holds this frame
+                self.open_clip(codec, received_at, (None if self.get_fps is None else self.get_fps()) or DEFAULT_VIDEO_FPS)
+
+    def open_clip(self, codec: str, started_at: float, fps: int):
+        os.makedirs(self.directory, exist_ok=True)
+        # milliseconds keep clips of events in the same second apart, names still sort by time for retention
+        self.clip_path = os.path.join(self.directory, f"{self.serial_number}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}.mp4")
+        self.clip_started_at = started_at
+        _LOGGER.debug(f"{DOMAIN} {self.name} - recorder - open clip {self.clip_path}")
+        # clip ffmpeg errors are kept apart from camera's own ffmpeg metrics
+        self.ffmpeg = ManagedFFmpeg(self.hass, f"{self.name} recorder", self.ffmpeg_binary, Metrics())
+        self.pre_roll_pending = True
+        arguments = [
+            "-hide_banner",
+            "-loglevel", "error",
+            "-framerate", str(fps),
+            "-f", codec,
+            "-i", "-",
+            "-c", "copy",
+            "-movflags", "+faststart",
+            "-y", self.clip_path,
+        ]
+        self.open_future = asyncio.run_coroutine_threadsafe(self.ffmpeg.async_open(arguments), self.hass.loop)
+
+    def write(self, frame_bytes) -> bool:
+        try:
+            self.ffmpeg.write(frame_bytes)
+            self.metrics.increment("clip_frames")
+            return True
+        except (TimeoutError, OSError) as ex:
+            # stalled or exited clip ffmpeg, clip is given up instead of holding video thread
+            _LOGGER.error(f"{DOMAIN} {self.name} - recorder - write failed: {ex}")
+            self.close_clip()
+            return False
+
+    def finish(self):
+        # stream stopped, clip is closed with what it has
+        with self.lock:
+            self.record_until = 0
+            if self.is_recording == True:
+                self.close_clip()
+            self.pre_roll.clear()
+            self.metrics.set("pre_roll_bytes", 0)
+
+    def close_clip(self):
+        # called on video thread, ffmpeg is closed and reaped on event loop
+        asyncio.run_coroutine_threadsafe(self.async_close_clip(self.ffmpeg, self.open_future, self.clip_path), self.hass.loop)
+        self.ffmpeg = None
+        self.open_future = None
+        self.clip_path = None
+        self.pre_roll_pending = False
+        self.record_until = 0
+
+    async def async_close_clip(self, ffmpeg: ManagedFFmpeg, open_future, clip_path: str):
+        # clip may be closed before its ffmpeg was started
+        if await asyncio.wrap_future(open_future) == False:
+            self.metrics.increment("clips_failed")
+            return
+        return_code = await ffmpeg.async_close(CLIP_CLOSE_TIMEOUT)
+        _LOGGER.debug(f"{DOMAIN} {self.name} - recorder - clip closed {clip_path} - {return_code}")
+        if return_code != 0:
+            self.metrics.increment("clips_failed")
+            return
+        self.metrics.increment("clips_recorded")
+        await self.hass.async_add_executor_job(self.apply_retention)
+        if not self.on_clip_recorded is None:
+            self.on_clip_recorded(clip_path)
+
+    def apply_retention(self):
+        clips = sorted(file_name for file_name in os.listdir(self.directory) if file_name.endswith(".mp4"))
+        for file_name in clips[: max(len(clips) - self.retention, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except OSError as ex:
+                _LOGGER.debug(f"{DOMAIN} {self.name} - recorder - retention remove failed {file_name}: {ex}")
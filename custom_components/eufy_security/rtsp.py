@@ -0,0 +1,267 @@
+import logging
+
+from base64 import b64encode
+import random
+import select
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+
+from .const import DOMAIN
+from .metrics import Metrics
+from .video import get_parameter_sets, is_keyframe, iter_nal_units
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+RTSP_TIMEOUT = 5  # seconds
+RTSP_RECONNECT_DELAY = 5  # seconds
+RTSP_TEARDOWN_TIMEOUT = 1  # seconds to wait for a packet in flight before teardown is skipped
+RTP_PAYLOAD_TYPE = 96
+RTP_CLOCK_RATE = 90000
+# payload per rtp packet, larger nal units are fragmented
+MAX_RTP_PAYLOAD = 1400
+# server reports are read every this many frames
+DRAIN_INTERVAL_FRAMES = 15
+H264_FU_A = 28
+HEVC_FU = 49
+
+
+class RtspError(Exception):
+    pass
+
+
+# publishes h264 / hevc annex b frames to an rtsp server (ANNOUNCE, SETUP, RECORD) over tcp interleaved rtp
+# runs on camera video thread, replaces the ffmpeg relay process for rtsp add-on
+class RtspPublisher:
+    def __init__(self, name: str, url: str, metrics: Metrics) -> None:
+        self.name: str = name
+        self.url: str = url
+        self.metrics: Metrics = metrics
+        parsed_url = urlparse(url)
+        self.host: str = parsed_url.hostname
+        self.port: int = parsed_url.port or 554
+
+        self.active: bool = False
+        self.socket: socket.socket = None
+        self.codec: str = None
+        self.cseq: int = 0
+        self.session: str = None
+        self.sequence: int = random.randint(0, 0xFFFF)
+        self.ssrc: int = random.randint(0, 0xFFFFFFFF)
+        self.frame_index: int = 0
+        self.retry_at: float = 0
+        # packets are written on video thread, teardown in executor, so it is not sent in the middle of a packet
+        self.send_lock: threading.Lock = threading.Lock()
+
+    def start(self):
+        self.active = True
+        self.retry_at = 0
+
+    def stop(self) -> tuple:
+        # called on event loop, connection is detached right away and returned for teardown, which may block
+        self.active = False
+        sock, session = self.socket, self.session
+        self.socket = None
+        self.session = None
+        return sock, session
+
+    def teardown(self, sock: socket.socket, session: str):
+        # called in executor, server ends recording session right away instead of waiting for its timeout
+        # response is not read, video thread may be reading server reports on same socket
+        if sock is None:
+            return
+        if not session is None and self.send_lock.acquire(timeout=RTSP_TEARDOWN_TIMEOUT) == True:
+            try:
+                sock.sendall(self.encode_request("TEARDOWN", self.url, {}, session))
+            except OSError as ex:
+                _LOGGER.debug(f"{DOMAIN} {self.name} - rtsp publisher - teardown failed: {ex}")
+            finally:
+                self.send_lock.release()
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def disconnect(self):
+        # socket is dropped first, so a send in progress on video thread fails instead of using a closed socket
+        sock = self.socket
+        self.socket = None
+        self.session = None
+        if not sock is None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def publish(self, frame_bytes, codec: str, presentation_time: float):
+        if self.socket is None or self.codec != codec:
+            # server is told about the stream with parameter sets of a key frame
+            if time.monotonic() < self.retry_at or is_keyframe(frame_bytes, codec) == False:
+                self.metrics.increment("frames_dropped")
+                return
+            try:
+                self.disconnect()
+                self.connect(frame_bytes, codec)
+            except (OSError, RtspError) as ex:
+                _LOGGER.error(f"{DOMAIN} {self.name} - rtsp publisher - connect to {self.url} failed: {ex}")
+                self.metrics.increment("rtsp_connect_errors")
+                self.retry_at = time.monotonic() + RTSP_RECONNECT_DELAY
+                self.disconnect()
+                self.metrics.increment("frames_dropped")
+                return
+
+        try:
+            self.send_access_unit(frame_bytes, codec, presentation_time)
+            self.metrics.increment("frames_out")
+        except (OSError, ValueError) as ex:
+            # value error is raised by select when socket is closed by stop on event loop
+            self.metrics.increment("frames_dropped")
+            if self.active == True:
+                _LOGGER.error(f"{DOMAIN} {self.name} - rtsp publisher - send failed: {ex}")
+                self.metrics.increment("rtsp_send_errors")
+            self.disconnect()
+
+    def connect(self, frame_bytes, codec: str):
+        self.socket = socket.create_connection((self.host, self.port), RTSP_TIMEOUT)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.cseq = 0
+        sdp = self.get_sdp(get_parameter_sets(frame_bytes, codec), codec)
+        self.request("ANNOUNCE", self.url, {"Content-Type": "application/sdp"}, sdp.encode())
+        headers = self.request("SETUP", f"{self.url}/trackID=0", {"Transport": "RTP/AVP/TCP;unicast;interleaved=0-1;mode=record"})
+        self.session = headers.get("session", "").split(";")[0]
+        self.request("RECORD", self.url, {"Range": "npt=0.000-"})
+        self.codec = codec
+        self.frame_index = 0
+        _LOGGER.debug(f"{DOMAIN} {self.name} - rtsp publisher - recording to {self.url} - {codec}")
+
+    def get_sdp(self, parameter_sets: dict, codec: str) -> str:
+        encoded = {name: b64encode(value).decode() for name, value in parameter_sets.items()}
+        if codec == "hevc":
+            rtpmap = "H265/90000"
+            fmtp = ";".join(f"sprop-{name}={value}" for name, value in encoded.items())
+        else:
+            rtpmap = "H264/90000"
+            fmtp = "packetization-mode=1"
+            if not parameter_sets.get("sps") is None:
+                fmtp = f"{fmtp};profile-level-id={parameter_sets['sps'][1:4].hex()}"
+            fmtp = f"{fmtp};sprop-parameter-sets={','.join(encoded.values())}"
+        return (
+            "v=0\r\n"
+            "o=- 0 0 IN IP4 127.0.0.1\r\n"
+            f"s={DOMAIN}\r\n"
+            f"c=IN IP4 {self.host}\r\n"
+            "t=0 0\r\n"
+            f"m=video 0 RTP/AVP {RTP_PAYLOAD_TYPE}\r\n"
+            f"a=rtpmap:{RTP_PAYLOAD_TYPE} {rtpmap}\r\n"
+            f"a=fmtp:{RTP_PAYLOAD_TYPE} {fmtp}\r\n"
+            "a=control:trackID=0\r\n"
+        )
+
+    def encode_request(self, method: str, url: str, headers: dict, session: str, body: bytes = b"") -> bytes:
+        self.cseq = self.cseq + 1
+        lines = [f"{method} {url} RTSP/1.0", f"CSeq: {self.cseq}", f"User-Agent: {DOMAIN}"]
+        if not session is None:
+            lines.append(f"Session: {session}")
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if len(body) > 0:
+            lines.append(f"Content-Length: {len(body)}")
+        return "\r\n".join(lines).encode() + b"\r\n\r\n" + body
+
+    def request(self, method: str, url: str, headers: dict, body: bytes = b"") -> dict:
+        self.socket.sendall(self.encode_request(method, url, headers, self.session, body))
+
+        status_line, response_headers = self.read_response()
+        if status_line.split(" ")[1] != "200":
+            raise RtspError(f"{method} rejected - {status_line}")
+        return response_headers
+
+    def read_response(self):
+        data = b""
+        while not b"\r\n\r\n" in data:
+            chunk = self.socket.recv(4096)
+            if len(chunk) == 0:
+                raise RtspError("connection closed by server")
+            data = data + chunk
+        head, body = data.split(b"\r\n\r\n", 1)
+        lines = head.decode(errors="replace").split("\r\n")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        remaining = int(headers.get("content-length", 0)) - len(body)
+        while remaining > 0:
+            chunk = self.socket.recv(remaining)
+            if len(chunk) == 0:
+                raise RtspError("connection closed by server")
+            remaining = remaining - len(chunk)
+        return lines[0], headers
+
+    def drain_incoming(self):
+        # server sends rtcp receiver reports, they are not used but must not fill up receive buffer
+        # socket has a timeout, so readiness is checked with select instead of a non blocking recv
+        sock = self.socket
+        if sock is None:
+            raise OSError("rtsp publisher is disconnected")
+        while len(select.select([sock], [], [], 0)[0]) > 0:
+            if len(sock.recv(65536)) == 0:
+                raise OSError("connection closed by server")
+
+    def send_access_unit(self, frame_bytes, codec: str, presentation_time: float):
+        # paced presentation time of camera, not frame count, so rtp clock follows gaps in stream
+        timestamp = int(presentation_time * RTP_CLOCK_RATE) & 0xFFFFFFFF
+        self.frame_index = self.frame_index + 1
+        if self.frame_index % DRAIN_INTERVAL_FRAMES == 0:
+            self.drain_incoming()
+
+        nal_units = list(iter_nal_units(frame_bytes))
+        for index, nal_unit in enumerate(nal_units):
+            last_nal_unit = index == len(nal_units) - 1
+            if len(nal_unit) <= MAX_RTP_PAYLOAD:
+                self.send_rtp(last_nal_unit, timestamp, (nal_unit,))
+            elif codec == "hevc":
+                self.send_hevc_fragments(nal_unit, last_nal_unit, timestamp)
+            else:
+                self.send_h264_fragments(nal_unit, last_nal_unit, timestamp)
+
+    def send_h264_fragments(self, nal_unit, last_nal_unit: bool, timestamp: int):
+        indicator = (nal_unit[0] & 0xE0) | H264_FU_A
+        nal_type = nal_unit[0] & 0x1F
+        self.send_fragments(nal_unit[1:], bytes((indicator,)), nal_type, last_nal_unit, timestamp)
+
+    def send_hevc_fragments(self, nal_unit, last_nal_unit: bool, timestamp: int):
+        payload_header = bytes(((nal_unit[0] & 0x81) | (HEVC_FU << 1), nal_unit[1]))
+        nal_type = (nal_unit[0] >> 1) & 0x3F
+        self.send_fragments(nal_unit[2:], payload_header, nal_type, last_nal_unit, timestamp)
+
+    def send_fragments(self, payload, payload_header: bytes, nal_type: int, last_nal_unit: bool, timestamp: int):
+        fragment_size = MAX_RTP_PAYLOAD - len(payload_header) - 1
+        for offset in range(0, len(payload), fragment_size):
+            first = offset == 0
+            last = offset + fragment_size >= len(payload)
+            fu_header = (0x80 if first else 0) | (0x40 if last else 0) | nal_type
+            self.send_rtp(last_nal_unit and last, timestamp, (payload_header + bytes((fu_header,)), payload[offset:offset + fragment_size]))
+
+    def send_rtp(self, marker: bool, timestamp: int, payload_parts: tuple):
+        sock = self.socket
+        if sock is None:
+            raise OSError("rtsp publisher is disconnected")
+        length = 12 + sum(len(part) for part in payload_parts)
+        header = struct.pack(
+            "!cBHBBHII",
+            b"$",
+            0,
+            length,
+            0x80,
+            (0x80 if marker else 0) | RTP_PAYLOAD_TYPE,
+            self.sequence,
+            timestamp,
+            self.ssrc,
+        )
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        # header and payload views are handed to kernel together, frame is not copied into a packet buffer
+        with self.send_lock:
+            sent = sock.sendmsg((header,) + tuple(payload_parts))
+            if sent < length + 4:
+                sock.sendall(b"".join((header,) + tuple(payload_parts))[sent:])
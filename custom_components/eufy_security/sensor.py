@@ -8,16 +8,38 @@ from homeassistant.const import (
     PERCENTAGE,
     DEVICE_CLASS_BATTERY,
     DEVICE_CLASS_SIGNAL_STRENGTH,
+    ENTITY_CATEGORY_DIAGNOSTIC,
+    TIME_MILLISECONDS,
 )
 from homeassistant.core import HomeAssistant
 
-from .const import DOMAIN, Device
+from .const import DOMAIN, NAME, Device
 from. const import get_child_value
 from .entity import EufySecurityEntity
 from .coordinator import EufySecurityDataUpdateCoordinator
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
+# value functions receive coordinator for integration level sensors and device for device level ones
+DIAGNOSTIC_INSTRUMENTS = [
+    ("messages_received", "Messages Received", lambda source: source.metrics.counter("messages_received"), None),
+    ("message_handler_latency", "Message Handler Latency", lambda source: round(source.metrics.histogram("message_handler_latency").average * 1000, 2), TIME_MILLISECONDS),
+    ("websocket_reconnects", "WebSocket Reconnects", lambda source: source.metrics.counter("websocket_reconnects"), None),
+    ("send_queue_depth", "Send Queue Depth", lambda source: None if source.ws is None else source.ws.queue_depth, None),
+]
+CAMERA_DIAGNOSTIC_INSTRUMENTS = [
+    ("frames_in", "Frames In", lambda source: source.metrics.counter("frames_in"), None),
+    ("frames_out", "Frames Out", lambda source: source.metrics.counter("frames_out"), None),
+    ("frames_dropped", "Frames Dropped", lambda source: source.metrics.counter("frames_dropped"), None),
+    ("ffmpeg_restarts", "FFmpeg Restarts", lambda source: source.metrics.counter("ffmpeg_restarts"), None),
+    ("ffmpeg_stalls", "FFmpeg Stalls", lambda source: source.metrics.counter("ffmpeg_stalls"), None),
+    ("ffmpeg_errors", "FFmpeg Errors", lambda source: source.metrics.counter("ffmpeg_errors"), None),
+    ("time_to_first_frame", "Time to First Frame", lambda source: round(source.metrics.histogram("time_to_first_frame").average * 1000, 2), TIME_MILLISECONDS),
+    ("snapshot_latency", "Snapshot Latency", lambda source: round(source.metrics.histogram("snapshot_latency").average * 1000, 2), TIME_MILLISECONDS),
+    ("frame_jitter", "Frame Jitter", lambda source: source.metrics.gauge("frame_jitter", 0), TIME_MILLISECONDS),
+    ("clips_recorded", "Clips Recorded", lambda source: source.metrics.counter("clips_recorded"), None),
+]
+
 
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_devices):
     coordinator: EufySecurityDataUpdateCoordinator = hass.data[DOMAIN]
@@ -36,6 +58,14 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
             if not get_child_value(device.__dict__, key) is None:
                 entities.append(EufySecuritySensor(coordinator, config_entry, device, id, description, key, unit, icon, device_class))
 
+    if coordinator.config.diagnostic_sensors == True:
+        for id, description, value_function, unit in DIAGNOSTIC_INSTRUMENTS:
+            entities.append(EufySecurityDiagnosticSensor(coordinator, config_entry, None, id, description, value_function, unit))
+        for device in coordinator.devices.values():
+            if device.is_camera() == True:
+                for id, description, value_function, unit in CAMERA_DIAGNOSTIC_INSTRUMENTS:
+                    entities.append(EufySecurityDiagnosticSensor(coordinator, config_entry, device, id, description, value_function, unit))
+
     async_add_devices(entities, True)
 
 
@@ -80,3 +110,53 @@ class EufySecuritySensor(EufySecurityEntity):
     @property
     def state_attributes(self):
         return {"state": self.device.state, "properties": self.device.properties}
+
+
+class EufySecurityDiagnosticSensor(EufySecurityEntity):
+    def __init__(self, coordinator: EufySecurityDataUpdateCoordinator, config_entry: ConfigEntry, device: Device, id: str, description: str, value_function, unit: str):
+        super().__init__(coordinator, config_entry, device)
+        self._id = id
+        self.description = description
+        self.value_function = value_function
+        self.unit = unit
+        self._attr_entity_category = ENTITY_CATEGORY_DIAGNOSTIC
+
+    @property
+    def source(self):
+        if self.device is None:
+            return self.coordinator
+        return self.device
+
+    @property
+    def state(self):
+        return self.value_function(self.source)
+
+    @property
+    def unit_of_measurement(self):
+        return self.unit
+
+    @property
+    def icon(self):
+        return "mdi:chart-line"
+
+    @property
+    def device_info(self):
+        if self.device is None:
+            return None
+        return super().device_info
+
+    @property
+    def name(self):
+        if self.device is None:
+            return f"{NAME} {self.description}"
+        return f"{self.device.name} {self.description}"
+
+    @property
+    def id(self):
+        if self.device is None:
+            return f"{DOMAIN}_{self._id}_diagnostic_sensor"
+        return f"{DOMAIN}_{self.device.serial_number}_{self._id}_diagnostic_sensor"
+
+    @property
+    def unique_id(self):
+        return self.id
@@ -0,0 +1,89 @@
+import logging
+
+import asyncio
+import time
+from itertools import count
+
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN
+from .metrics import Metrics
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+STREAM_SLOT_TIMEOUT = 30  # seconds
+
+
+# limits concurrent p2p streams per station, lower priority value wins
+# a request with higher priority than the weakest active stream preempts it, otherwise it waits in queue
+class StreamScheduler:
+    def __init__(self, max_streams_per_station: int, metrics: Metrics) -> None:
+        self.max_streams_per_station: int = max_streams_per_station
+        self.metrics: Metrics = metrics
+        self.active: dict = {}
+        self.waiting: dict = {}
+        self.sequence = count()
+
+    def is_limited(self) -> bool:
+        return self.max_streams_per_station > 0
+
+    async def async_request_slot(self, session):
+        active = self.active.setdefault(session.station, set())
+        if self.is_limited() == False or session in active:
+            active.add(session)
+            return
+
+        started_at = time.monotonic()
+        if len(active) >= self.max_streams_per_station:
+            weakest = max(active, key=lambda active_session: active_session.priority)
+            if weakest.priority > session.priority:
+                _LOGGER.debug(f"{DOMAIN} - stream scheduler - {session.name} preempts {weakest.name}")
+                self.metrics.increment("stream_preemptions")
+                self.release_slot(weakest, False)
+                await weakest.async_preempt()
+            else:
+                future: asyncio.Future = asyncio.get_event_loop().create_future()
+                waiter = (session.priority, next(self.sequence), session, future)
+                self.waiting.setdefault(session.station, []).append(waiter)
+                _LOGGER.debug(f"{DOMAIN} - stream scheduler - {session.name} waits for a slot on {session.station}")
+                try:
+                    await asyncio.wait_for(future, STREAM_SLOT_TIMEOUT)
+                except asyncio.TimeoutError as ex:
+                    raise HomeAssistantError(f"No stream slot became available for {session.name} in {STREAM_SLOT_TIMEOUT} seconds") from ex
+                finally:
+                    if waiter in self.waiting[session.station]:
+                        self.waiting[session.station].remove(waiter)
+
+        active.add(session)
+        self.metrics.observe("stream_slot_wait", time.monotonic() - started_at)
+        self.metrics.set(f"active_streams.{session.station}", len(active))
+
+    def register(self, session):
+        # stream started outside of scheduler still occupies a slot
+        active = self.active.setdefault(session.station, set())
+        active.add(session)
+        self.metrics.set(f"active_streams.{session.station}", len(active))
+
+    def release_slot(self, session, grant_waiting: bool = True):
+        active = self.active.get(session.station, set())
+        if not session in active:
+            return
+        active.discard(session)
+        self.metrics.set(f"active_streams.{session.station}", len(active))
+
+        waiting = [waiter for waiter in self.waiting.get(session.station, []) if not waiter[3].done()]
+        if grant_waiting == True and len(waiting) > 0 and len(active) < self.max_streams_per_station:
+            # slot is taken right away, so nobody can jump in before the waiter resumes
+            waiter = min(waiting, key=lambda item: (item[2].priority, item[1]))
+            self.waiting[session.station].remove(waiter)
+            active.add(waiter[2])
+            waiter[3].set_result(True)
+
+    def get_diagnostics(self) -> dict:
+        return {
+            station: {
+                "active": [session.name for session in sessions],
+                "waiting": [waiter[2].name for waiter in self.waiting.get(station, [])],
+            }
+            for station, sessions in self.active.items()
+        }
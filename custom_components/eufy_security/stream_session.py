@@ -0,0 +1,167 @@
+import logging
+
+import asyncio
+from typing import Any, Callable, Coroutine
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_call_later
+
+from .const import DOMAIN
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+CONSUMER_VIEWER = "viewer"
+CONSUMER_SERVICE = "service"
+CONSUMER_RING = "ring"
+CONSUMER_PREWARM = "prewarm"
+CONSUMER_SNAPSHOT = "snapshot"
+CONSUMER_RECORDER = "recorder"
+CONSUMER_WEBRTC = "webrtc"
+CONSUMER_ABR = "abr"
+CONSUMER_MJPEG = "mjpeg"
+
+# lower value is more important when streams compete for a station slot
+PRIORITY_RING = 0
+PRIORITY_MOTION = 1
+PRIORITY_VIEWER = 2
+PRIORITY_SNAPSHOT = 3
+CONSUMER_PRIORITIES = {
+    CONSUMER_RING: PRIORITY_RING,
+    CONSUMER_PREWARM: PRIORITY_MOTION,
+    CONSUMER_RECORDER: PRIORITY_MOTION,
+    CONSUMER_VIEWER: PRIORITY_VIEWER,
+    CONSUMER_SERVICE: PRIORITY_VIEWER,
+    CONSUMER_WEBRTC: PRIORITY_VIEWER,
+    CONSUMER_ABR: PRIORITY_VIEWER,
+    CONSUMER_MJPEG: PRIORITY_VIEWER,
+    CONSUMER_SNAPSHOT: PRIORITY_SNAPSHOT,
+}
+
+
+# reference counts consumers of a camera stream, source is started once for the first consumer
+# and stopped after grace period when last consumer leaves, acquiring within grace period cancels the stop
+class StreamSession:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        name: str,
+        start_function: Callable[[], Coroutine[Any, Any, None]],
+        stop_function: Callable[[], Coroutine[Any, Any, None]],
+        grace_period: float,
+        scheduler=None,
+        station: str = None,
+    ) -> None:
+        self.hass: HomeAssistant = hass
+        self.name: str = name
+        self.start_function = start_function
+        self.stop_function = stop_function
+        self.grace_period: float = grace_period
+        # only p2p sources are scheduled, they compete for station resources
+        self.scheduler = scheduler
+        self.station: str = station
+
+        self.consumers: dict = {}
+        # called when session drops every consumer at once, so their owners know to acquire again
+        self.on_consumers_dropped = None
+        self.active: bool = False
+        self.stop_callback = None
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    @property
+    def consumer_count(self) -> int:
+        return sum(self.consumers.values())
+
+    @property
+    def priority(self) -> int:
+        return min([CONSUMER_PRIORITIES.get(consumer, PRIORITY_VIEWER) for consumer in self.consumers] or [PRIORITY_SNAPSHOT])
+
+    def has_consumer(self, consumer: str) -> bool:
+        return self.consumers.get(consumer, 0) > 0
+
+    async def async_acquire(self, consumer: str, start: bool = True) -> bool:
+        # with start False, consumer only holds an already running source, eg snapshots
+        if start == False and self.active == False:
+            return False
+        self.consumers[consumer] = self.consumers.get(consumer, 0) + 1
+        self.cancel_pending_stop()
+        async with self.lock:
+            if self.active == False:
+                _LOGGER.debug(f"{DOMAIN} {self.name} - stream session - start for {consumer}")
+                try:
+                    if not self.scheduler is None:
+                        await self.scheduler.async_request_slot(self)
+                    await self.start_function()
+                except Exception:
+                    self.remove_consumer(consumer)
+                    self.release_slot()
+                    raise
+                self.active = True
+        return True
+
+    async def async_release(self, consumer: str):
+        if self.has_consumer(consumer) == False:
+            return
+        self.remove_consumer(consumer)
+        if len(self.consumers) == 0 and self.active == True and self.stop_callback is None:
+            _LOGGER.debug(f"{DOMAIN} {self.name} - stream session - last consumer {consumer} left, stop in {self.grace_period} seconds")
+            self.stop_callback = async_call_later(self.hass, self.grace_period, self.async_stop_if_idle)
+
+    async def async_stop_if_idle(self, executed_at=None):
+        self.stop_callback = None
+        async with self.lock:
+            if len(self.consumers) == 0 and self.active == True:
+                _LOGGER.debug(f"{DOMAIN} {self.name} - stream session - idle, stop")
+                self.active = False
+                self.release_slot()
+                await self.stop_function()
+
+    async def async_stop(self):
+        # explicit stop, every consumer is dropped
+        self.drop_consumers()
+        self.cancel_pending_stop()
+        async with self.lock:
+            self.active = False
+            self.release_slot()
+            await self.stop_function()
+
+    async def async_preempt(self):
+        # slot is taken by a more important stream, its slot is already released by scheduler
+        # preempted session holds its lock only while starting or stopping itself, it never waits on preempting session
+        _LOGGER.debug(f"{DOMAIN} {self.name} - stream session - preempted")
+        self.drop_consumers()
+        self.cancel_pending_stop()
+        async with self.lock:
+            self.active = False
+            await self.stop_function()
+
+    def release_slot(self):
+        if not self.scheduler is None:
+            self.scheduler.release_slot(self)
+
+    def remove_consumer(self, consumer: str):
+        self.consumers[consumer] = self.consumers.get(consumer, 0) - 1
+        if self.consumers[consumer] <= 0:
+            self.consumers.pop(consumer)
+
+    def drop_consumers(self):
+        self.consumers.clear()
+        if not self.on_consumers_dropped is None:
+            self.on_consumers_dropped()
+
+    def cancel_pending_stop(self):
+        if not self.stop_callback is None:
+            self.stop_callback()
+            self.stop_callback = None
+
+    def on_source_started(self):
+        # started outside of session, eg catch up at startup, it is not stopped unless a consumer joins and leaves
+        self.active = True
+        if not self.scheduler is None:
+            self.scheduler.register(self)
+
+    def on_source_stopped(self):
+        # camera or server stopped the stream, consumers have to acquire again
+        self.active = False
+        self.drop_consumers()
+        self.cancel_pending_stop()
+        self.release_slot()
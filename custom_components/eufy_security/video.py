@@ -0,0 +1,71 @@
+START_CODE = b"\x00\x00\x01"
+DEFAULT_VIDEO_FPS = 15
+
+# h264 nal unit types
+H264_NAL_SLICE = 1
+H264_NAL_IDR = 5
+H264_NAL_SPS = 7
+H264_NAL_PPS = 8
+# hevc nal unit types, 16 to 21 are random access points
+HEVC_NAL_IRAP_FIRST = 16
+HEVC_NAL_IRAP_LAST = 21
+HEVC_NAL_VCL_LAST = 31
+HEVC_NAL_VPS = 32
+HEVC_NAL_SPS = 33
+HEVC_NAL_PPS = 34
+
+
+def nal_unit_type(header: int, codec: str) -> int:
+    if codec == "hevc":
+        return (header >> 1) & 0x3F
+    return header & 0x1F
+
+
+def iter_nal_unit_types(frame_bytes, codec: str):
+    # annex b stream, nal header follows every start code, emulation prevention keeps start codes out of payloads
+    position = frame_bytes.find(START_CODE)
+    while position != -1 and position + 3 < len(frame_bytes):
+        yield nal_unit_type(frame_bytes[position + 3], codec)
+        position = frame_bytes.find(START_CODE, position + 3)
+
+
+def iter_nal_units(frame_bytes):
+    # nal units without start codes, as views into the frame so nothing is copied
+    view = memoryview(frame_bytes)
+    position = frame_bytes.find(START_CODE)
+    while position != -1:
+        start = position + 3
+        position = frame_bytes.find(START_CODE, start)
+        end = len(frame_bytes) if position == -1 else position
+        # leading zero of a 4 byte start code, nal units never end with a zero byte
+        while end > start and frame_bytes[end - 1] == 0:
+            end = end - 1
+        if end > start:
+            yield view[start:end]
+
+
+def is_keyframe(frame_bytes, codec: str) -> bool:
+    # parameter sets come right before the key frame, first picture slice decides otherwise
+    for nal_type in iter_nal_unit_types(frame_bytes, codec):
+        if codec == "hevc":
+            if nal_type == HEVC_NAL_VPS or HEVC_NAL_IRAP_FIRST <= nal_type <= HEVC_NAL_IRAP_LAST:
+                return True
+            if nal_type <= HEVC_NAL_VCL_LAST:
+                return False
+        else:
+            if nal_type in (H264_NAL_SPS, H264_NAL_IDR):
+                return True
+            if H264_NAL_SLICE <= nal_type < H264_NAL_IDR:
+                return False
+    return False
+
+
+def get_parameter_sets(frame_bytes, codec: str) -> dict:
+    # vps, sps and pps of a key frame, needed to describe the stream before first picture is sent
+    names = {HEVC_NAL_VPS: "vps", HEVC_NAL_SPS: "sps", HEVC_NAL_PPS: "pps"} if codec == "hevc" else {H264_NAL_SPS: "sps", H264_NAL_PPS: "pps"}
+    parameter_sets = {}
+    for nal_unit in iter_nal_units(frame_bytes):
+        name = names.get(nal_unit_type(nal_unit[0], codec))
+        if not name is None and parameter_sets.get(name) is None:
+            parameter_sets[name] = bytes(nal_unit)
+    return parameter_sets
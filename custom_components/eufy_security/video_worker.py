@@ -0,0 +1,258 @@
+import logging
+
+import multiprocessing
+from multiprocessing import shared_memory
+import runpy
+import struct
+import threading
+
+from . import video_worker_process
+from .const import DOMAIN
+from .video_worker_process import (
+    FFMPEG_WRITE_TIMEOUT,
+    FRAMES_DROPPED_OFFSET,
+    FRAMES_OUT_OFFSET,
+    HEAD_OFFSET,
+    HEADER_SIZE,
+    LENGTH_FORMAT,
+    LENGTH_SIZE,
+    MESSAGE_CLOSE,
+    MESSAGE_FRAMES,
+    MESSAGE_OPEN,
+    MESSAGE_STOP,
+    STATE_IDLE,
+    STATE_OFFSET,
+    STATE_RUNNING,
+    STATE_STALLED,
+    TAIL_OFFSET,
+    VIDEO_RING_SIZE,
+    WORKER_JOIN_TIMEOUT,
+    WORKER_RUN_NAME,
+    WRAP_MARKER,
+    read_counter,
+    write_counter,
+)
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+
+# several camera threads send to one worker, a pipe with a lock is cheaper than a queue with its feeder thread
+class WorkerConnection:
+    def __init__(self, connection) -> None:
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def put(self, message: tuple) -> bool:
+        with self.lock:
+            try:
+                self.connection.send(message)
+                return True
+            except OSError as ex:
+                # worker died, its cameras are restarted by watchdog and get a new worker
+                _LOGGER.debug(f"{DOMAIN} video worker - send failed: {ex}")
+                return False
+
+
+# producer side of a camera ring, lives in home assistant process and is written by camera video thread
+# single producer and single consumer, producer only moves head and consumer only moves tail
+# head is announced over worker pipe once per burst, the lock and the pipe write order ring writes before worker reads
+class VideoChannel:
+    def __init__(self, serial_number: str, pool, worker_index: int, size: int = VIDEO_RING_SIZE) -> None:
+        self.serial_number: str = serial_number
+        self.pool = pool
+        self.worker_index: int = worker_index
+        self.process = None
+        self.worker_connection: WorkerConnection = None
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + size)
+        self.buffer = self.shared_memory.buf
+        self.capacity: int = size
+        self.head: int = 0
+        self.announced_head: int = 0
+        self.opened: bool = False
+        self.frames_dropped: int = 0
+        # video thread writes while pool shuts down in executor, ring is only unmapped between writes
+        self.lock: threading.Lock = threading.Lock()
+        self.stopped: bool = False
+
+    @property
+    def is_worker_alive(self) -> bool:
+        return not self.process is None and self.process.is_alive() == True
+
+    @property
+    def is_running(self) -> bool:
+        with self.lock:
+            if self.opened == False or self.stopped == True or self.is_worker_alive == False:
+                return False
+            return read_counter(self.buffer, STATE_OFFSET) in (STATE_IDLE, STATE_RUNNING)
+
+    @property
+    def is_stalled(self) -> bool:
+        # a dead worker leaves state at running, it does not drain ring anymore either
+        with self.lock:
+            if self.opened == False or self.stopped == True:
+                return False
+            return self.is_worker_alive == False or read_counter(self.buffer, STATE_OFFSET) == STATE_STALLED
+
+    @property
+    def frames_out(self) -> int:
+        with self.lock:
+            if self.stopped == True:
+                return 0
+            return read_counter(self.buffer, FRAMES_OUT_OFFSET)
+
+    def open(self, arguments: list, write_timeout: float = FFMPEG_WRITE_TIMEOUT):
+        # may spawn a worker, so it is called in executor
+        process, worker_connection = self.pool.get_worker(self.worker_index)
+        with self.lock:
+            if self.stopped == True:
+                return
+            if not process is self.process:
+                # ring of a dead worker is not drained anymore, new worker starts from current head
+                write_counter(self.buffer, TAIL_OFFSET, self.head)
+                write_counter(self.buffer, STATE_OFFSET, STATE_IDLE)
+                self.announced_head = self.head
+                self.process = process
+                self.worker_connection = worker_connection
+            # frames written before worker starts ffmpeg wait in ring
+            self.opened = True
+            self.worker_connection.put((MESSAGE_OPEN, self.serial_number, self.shared_memory.name, arguments, self.capacity, write_timeout))
+
+    def close(self):
+        with self.lock:
+            self.opened = False
+            if self.stopped == True or self.worker_connection is None:
+                return
+            self.worker_connection.put((MESSAGE_CLOSE, self.serial_number))
+
+    def write(self, frame_bytes) -> bool:
+        with self.lock:
+            if self.stopped == True:
+                return False
+            length = len(frame_bytes)
+            record_size = LENGTH_SIZE + length
+            position = self.head % self.capacity
+            # records are never split, tail of ring is skipped when record does not fit
+            skip = self.capacity - position if self.capacity - position < record_size else 0
+            free = self.capacity - (self.head - read_counter(self.buffer, TAIL_OFFSET))
+            if record_size + skip > free:
+                # worker is behind, frame is dropped instead of blocking video thread
+                self.announce()
+                self.frames_dropped = self.frames_dropped + 1
+                return False
+
+            if skip > 0:
+                if skip >= LENGTH_SIZE:
+                    struct.pack_into(LENGTH_FORMAT, self.buffer, HEADER_SIZE + position, WRAP_MARKER)
+                self.head = self.head + skip
+                position = 0
+            start = HEADER_SIZE + position + LENGTH_SIZE
+            self.buffer[start:start + length] = frame_bytes
+            struct.pack_into(LENGTH_FORMAT, self.buffer, HEADER_SIZE + position, length)
+            self.head = self.head + record_size
+            write_counter(self.buffer, HEAD_OFFSET, self.head)
+            return True
+
+    def flush(self):
+        with self.lock:
+            if self.stopped == False:
+                self.announce()
+
+    def announce(self):
+        # called with lock held
+        if self.head != self.announced_head and not self.worker_connection is None:
+            self.announced_head = self.head
+            self.worker_connection.put((MESSAGE_FRAMES, self.serial_number, self.head))
+
+    def get_diagnostics(self) -> dict:
+        with self.lock:
+            if self.stopped == True:
+                return {"running": False}
+            return {
+                "running": self.opened == True and self.is_worker_alive == True and read_counter(self.buffer, STATE_OFFSET) in (STATE_IDLE, STATE_RUNNING),
+                "worker_alive": self.is_worker_alive,
+                "frames_out": read_counter(self.buffer, FRAMES_OUT_OFFSET),
+                "frames_dropped": self.frames_dropped + read_counter(self.buffer, FRAMES_DROPPED_OFFSET),
+                "ring_used": self.head - read_counter(self.buffer, TAIL_OFFSET),
+            }
+
+    def stop(self):
+        # waits for a write in progress, later writes of video thread are dropped
+        with self.lock:
+            self.stopped = True
+            self.opened = False
+
+    def release(self):
+        # only after stop and after workers exited, nothing maps ring anymore but this process
+        self.buffer.release()
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+
+# ffmpeg feeding of cameras is spread over worker processes, so video work is not bound to home assistant's gil
+# cameras are assigned to workers round robin, each camera gets its own shared memory ring
+class VideoWorkerPool:
+    def __init__(self, size: int) -> None:
+        self.size: int = size
+        self.context = multiprocessing.get_context("spawn")
+        self.workers: list = []
+        self.channels: list = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def start(self):
+        # spawning is slow, it is done once at setup instead of on first stream
+        with self.lock:
+            for _ in range(self.size):
+                self.workers.append(self.spawn_worker())
+
+    def spawn_worker(self) -> tuple:
+        receive_connection, send_connection = self.context.Pipe(duplex=False)
+        # worker runs its file by path, a target of this package would import integration and home assistant in worker
+        process = self.context.Process(
+            target=runpy.run_path,
+            args=(video_worker_process.__file__,),
+            kwargs={"init_globals": {"connection": receive_connection}, "run_name": WORKER_RUN_NAME},
+            name="eufy_security_video_worker",
+            daemon=True,
+        )
+        process.start()
+        receive_connection.close()
+        return process, WorkerConnection(send_connection)
+
+    def get_worker(self, index: int) -> tuple:
+        # a crashed or killed worker is replaced when one of its cameras opens a stream again
+        with self.lock:
+            process, worker_connection = self.workers[index]
+            if process.is_alive() == False:
+                _LOGGER.warning(f"{DOMAIN} video worker {index} - exited with code {process.exitcode}, respawning")
+                worker_connection.connection.close()
+                self.workers[index] = self.spawn_worker()
+            return self.workers[index]
+
+    def create_channel(self, serial_number: str) -> VideoChannel:
+        channel = VideoChannel(serial_number, self, len(self.channels) % self.size)
+        self.channels.append(channel)
+        return channel
+
+    def get_diagnostics(self) -> dict:
+        return {
+            "workers": [process.is_alive() for process, _ in self.workers],
+            "channels": {channel.serial_number: channel.get_diagnostics() for channel in self.channels},
+        }
+
+    def shutdown(self):
+        # video threads may still write, channels are stopped before workers and rings go away
+        for channel in self.channels:
+            channel.stop()
+        with self.lock:
+            for process, worker_connection in self.workers:
+                worker_connection.put((MESSAGE_STOP,))
+            for process, worker_connection in self.workers:
+                process.join(WORKER_JOIN_TIMEOUT)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+                worker_connection.connection.close()
+            self.workers = []
+        for channel in self.channels:
+            channel.release()
+        self.channels = []
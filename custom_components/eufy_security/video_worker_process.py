@@ -0,0 +1,159 @@
+import logging
+
+import os
+import select
+from multiprocessing import shared_memory
+import struct
+import subprocess
+
+# entry point of video worker processes, spawned children run this file by its path instead of importing it
+# so they do not import the integration package and home assistant with it, keep it on the standard library only
+_LOGGER: logging.Logger = logging.getLogger("custom_components.eufy_security")
+
+WORKER_RUN_NAME = "__eufy_security_video_worker__"
+
+VIDEO_RING_SIZE = 8 * 1024 * 1024  # bytes per camera, about 30 seconds of 2 Mbps video
+WORKER_POLL_TIMEOUT = 1  # seconds
+WORKER_JOIN_TIMEOUT = 5  # seconds
+FFMPEG_CLOSE_TIMEOUT = 5  # seconds
+FFMPEG_WRITE_TIMEOUT = 5  # seconds
+
+# ring header, head and tail are running byte counters, so used space is head - tail
+HEADER_SIZE = 64
+HEAD_OFFSET = 0
+TAIL_OFFSET = 8
+FRAMES_OUT_OFFSET = 16
+FRAMES_DROPPED_OFFSET = 24
+STATE_OFFSET = 32
+LENGTH_FORMAT = "<I"
+LENGTH_SIZE = 4
+WRAP_MARKER = 0xFFFFFFFF
+
+STATE_IDLE = 0
+STATE_RUNNING = 1
+STATE_FAILED = 2
+# ffmpeg stopped reading its input, frames are dropped until camera's watchdog restarts it
+STATE_STALLED = 3
+
+MESSAGE_OPEN = "open"
+MESSAGE_FRAMES = "frames"
+MESSAGE_CLOSE = "close"
+MESSAGE_STOP = "stop"
+
+
+def read_counter(buffer, offset: int) -> int:
+    return struct.unpack_from("<Q", buffer, offset)[0]
+
+
+def write_counter(buffer, offset: int, value: int):
+    struct.pack_into("<Q", buffer, offset, value)
+
+
+def write_with_timeout(file_descriptor: int, data, timeout: float) -> bool:
+    # same as ManagedFFmpeg.write, a hung ffmpeg must not block worker and every other camera on it
+    view = memoryview(data)
+    while len(view) > 0:
+        if len(select.select([], [file_descriptor], [], timeout)[1]) == 0:
+            return False
+        view = view[os.write(file_descriptor, view):]
+    return True
+
+
+# consumer side of a camera ring, lives in worker process and feeds ffmpeg of the camera
+class WorkerChannel:
+    def __init__(self, shared_memory_name: str, arguments: list, capacity: int, write_timeout: float) -> None:
+        self.shared_memory = shared_memory.SharedMemory(name=shared_memory_name)
+        self.buffer = self.shared_memory.buf
+        self.capacity: int = capacity
+        self.write_timeout: float = write_timeout
+        self.tail: int = read_counter(self.buffer, TAIL_OFFSET)
+        self.process: subprocess.Popen = None
+        self.stalled: bool = False
+        try:
+            self.process = subprocess.Popen(arguments, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, bufsize=0)
+            os.set_blocking(self.process.stdin.fileno(), False)
+            write_counter(self.buffer, STATE_OFFSET, STATE_RUNNING)
+        except OSError as ex:
+            _LOGGER.error(f"video worker - ffmpeg start failed: {ex}")
+            write_counter(self.buffer, STATE_OFFSET, STATE_FAILED)
+
+    def drain(self, head: int):
+        frames_out = read_counter(self.buffer, FRAMES_OUT_OFFSET)
+        frames_dropped = read_counter(self.buffer, FRAMES_DROPPED_OFFSET)
+        while self.tail < head:
+            position = self.tail % self.capacity
+            if self.capacity - position < LENGTH_SIZE:
+                self.tail = self.tail + self.capacity - position
+                continue
+            length = struct.unpack_from(LENGTH_FORMAT, self.buffer, HEADER_SIZE + position)[0]
+            if length == WRAP_MARKER:
+                self.tail = self.tail + self.capacity - position
+                continue
+            start = HEADER_SIZE + position + LENGTH_SIZE
+            if self.stalled == True:
+                # frames are given back without waiting on ffmpeg again
+                frames_dropped = frames_dropped + 1
+            elif not self.process is None and self.process.poll() is None:
+                try:
+                    # written straight from shared memory, frame is not copied in worker
+                    if write_with_timeout(self.process.stdin.fileno(), self.buffer[start:start + length], self.write_timeout) == True:
+                        frames_out = frames_out + 1
+                    else:
+                        self.stalled = True
+                        frames_dropped = frames_dropped + 1
+                        write_counter(self.buffer, STATE_OFFSET, STATE_STALLED)
+                except OSError:
+                    frames_dropped = frames_dropped + 1
+                    write_counter(self.buffer, STATE_OFFSET, STATE_FAILED)
+            else:
+                frames_dropped = frames_dropped + 1
+                write_counter(self.buffer, STATE_OFFSET, STATE_FAILED)
+            # slot is given back after write returned
+            self.tail = self.tail + LENGTH_SIZE + length
+            write_counter(self.buffer, TAIL_OFFSET, self.tail)
+        write_counter(self.buffer, FRAMES_OUT_OFFSET, frames_out)
+        write_counter(self.buffer, FRAMES_DROPPED_OFFSET, frames_dropped)
+
+    def close(self):
+        if not self.process is None:
+            try:
+                if self.stalled == True:
+                    # hung ffmpeg would not exit on end of input
+                    self.process.kill()
+                self.process.stdin.close()
+                self.process.wait(FFMPEG_CLOSE_TIMEOUT)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+        # frames left behind belong to the stopped stream, next stream starts from current head
+        write_counter(self.buffer, TAIL_OFFSET, read_counter(self.buffer, HEAD_OFFSET))
+        write_counter(self.buffer, STATE_OFFSET, STATE_IDLE)
+        self.buffer.release()
+        self.shared_memory.close()
+
+
+def run_worker(connection):
+    channels = {}
+    while True:
+        if connection.poll(WORKER_POLL_TIMEOUT) == False:
+            continue
+        message = connection.recv()
+        if message[0] == MESSAGE_FRAMES:
+            channel = channels.get(message[1])
+            if not channel is None:
+                channel.drain(message[2])
+        elif message[0] == MESSAGE_OPEN:
+            if message[1] in channels:
+                channels.pop(message[1]).close()
+            channels[message[1]] = WorkerChannel(message[2], message[3], message[4], message[5])
+        elif message[0] == MESSAGE_CLOSE:
+            if message[1] in channels:
+                channels.pop(message[1]).close()
+        elif message[0] == MESSAGE_STOP:
+            for channel in channels.values():
+                channel.close()
+            return
+
+
+if __name__ == WORKER_RUN_NAME:
+    # connection is handed over by pool as a global of this run
+    run_worker(connection)  # noqa: F821
@@ -0,0 +1,163 @@
+import logging
+
+import asyncio
+from fractions import Fraction
+import time
+import traceback
+
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN
+from .metrics import Metrics
+from .video import is_keyframe
+
+try:
+    from aiortc import RTCPeerConnection, RTCRtpSender, RTCSessionDescription
+    from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
+    from av import Packet
+except ImportError:
+    # aiortc is optional, webrtc output stays off without it
+    RTCPeerConnection = None
+    MediaStreamTrack = object
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+WEBRTC_MAX_PEERS = 4  # per camera
+WEBRTC_QUEUE_SIZE = 30  # frames per peer, about two seconds
+WEBRTC_TIME_BASE = Fraction(1, 90000)
+WEBRTC_CODEC = "h264"
+
+
+def is_webrtc_available() -> bool:
+    return not RTCPeerConnection is None
+
+
+# video track of one peer, p2p frames are handed to aiortc as encoded packets, so they are only packetized into rtp
+class PassthroughVideoTrack(MediaStreamTrack):
+    kind = "video"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.queue: asyncio.Queue = asyncio.Queue(WEBRTC_QUEUE_SIZE)
+        # a peer can only start decoding at a key frame
+        self.wait_for_keyframe: bool = True
+        self.started_at: float = None
+
+    def put_frame(self, frame_bytes, received_at: float, keyframe: bool) -> bool:
+        if self.wait_for_keyframe == True:
+            if keyframe == False:
+                return False
+            self.wait_for_keyframe = False
+        if self.queue.full() == True:
+            # peer is behind, frames up to next key frame would not decode anyway
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.wait_for_keyframe = True
+            return False
+        self.queue.put_nowait((frame_bytes, received_at))
+        return True
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        frame_bytes, received_at = await self.queue.get()
+        if self.started_at is None:
+            self.started_at = received_at
+        packet = Packet(bytes(frame_bytes))
+        packet.pts = int((received_at - self.started_at) * WEBRTC_TIME_BASE.denominator)
+        packet.time_base = WEBRTC_TIME_BASE
+        return packet
+
+
+# webrtc peers of a camera, fed from camera's frame listeners without transcoding
+class WebRtcOutput:
+    def __init__(self, hass: HomeAssistant, name: str, metrics: Metrics, on_peer_closed) -> None:
+        self.hass: HomeAssistant = hass
+        self.name: str = name
+        self.metrics: Metrics = metrics
+        self.on_peer_closed = on_peer_closed
+        self.peers: dict = {}
+
+    def on_frame(self, frame_bytes, codec: str):
+        # called on camera video thread, peers are fed on event loop
+        if len(self.peers) == 0:
+            return
+        if codec != WEBRTC_CODEC:
+            self.metrics.increment("webrtc_frames_dropped")
+            return
+        self.hass.loop.call_soon_threadsafe(self.push_frame, frame_bytes, time.monotonic(), is_keyframe(frame_bytes, codec))
+
+    def push_frame(self, frame_bytes, received_at: float, keyframe: bool):
+        for track in self.peers.values():
+            if track.put_frame(frame_bytes, received_at, keyframe) == True:
+                self.metrics.increment("webrtc_frames_out")
+            else:
+                self.metrics.increment("webrtc_frames_dropped")
+
+    async def async_handle_offer(self, offer_sdp: str) -> str:
+        if len(self.peers) >= WEBRTC_MAX_PEERS:
+            raise HomeAssistantError(f"{self.name} already has {WEBRTC_MAX_PEERS} webrtc peers")
+        peer_connection = RTCPeerConnection()
+        track = PassthroughVideoTrack()
+
+        @peer_connection.on("connectionstatechange")
+        async def on_connection_state_change():
+            _LOGGER.debug(f"{DOMAIN} {self.name} - webrtc - connection {peer_connection.connectionState}")
+            if peer_connection.connectionState in ("failed", "closed"):
+                await self.async_close_peer(peer_connection)
+
+        try:
+            # transceiver is created before offer is applied, so it takes video line of offer with h264 as only codec
+            transceiver = peer_connection.addTransceiver(track, direction="sendonly")
+            transceiver.setCodecPreferences([codec for codec in RTCRtpSender.getCapabilities("video").codecs if codec.mimeType == "video/H264"])
+            await peer_connection.setRemoteDescription(RTCSessionDescription(sdp=offer_sdp, type="offer"))
+            await peer_connection.setLocalDescription(await peer_connection.createAnswer())
+        except Exception as ex:
+            await peer_connection.close()
+            _LOGGER.error(f"{DOMAIN} {self.name} - webrtc - offer failed: {ex}- traceback: {traceback.format_exc()}")
+            raise HomeAssistantError(f"{self.name} webrtc offer failed: {ex}") from ex
+        self.peers[peer_connection] = track
+        self.metrics.increment("webrtc_peers")
+        return peer_connection.localDescription.sdp
+
+    async def async_close_peer(self, peer_connection):
+        track = self.peers.pop(peer_connection, None)
+        if track is None:
+            return
+        track.stop()
+        await peer_connection.close()
+        await self.on_peer_closed()
+
+    async def async_close(self):
+        for peer_connection in list(self.peers.keys()):
+            await self.async_close_peer(peer_connection)
+
+
+# signalling for webrtc peers outside of home assistant frontend, offer sdp in and answer sdp out
+class WebRtcView(HomeAssistantView):
+    url = "/api/eufy_security/webrtc/{serial_number}"
+    name = "api:eufy_security:webrtc"
+    requires_auth = True
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass: HomeAssistant = hass
+
+    async def post(self, request: web.Request, serial_number: str) -> web.Response:
+        handlers = getattr(self.hass.data.get(DOMAIN), "webrtc_offer_handlers", {})
+        handler = handlers.get(serial_number)
+        if handler is None:
+            raise web.HTTPNotFound()
+        try:
+            offer = await request.json()
+        except ValueError as ex:
+            raise web.HTTPBadRequest() from ex
+        if offer.get("type") != "offer" or not isinstance(offer.get("sdp"), str):
+            raise web.HTTPBadRequest()
+        try:
+            answer_sdp = await handler(offer["sdp"])
+        except HomeAssistantError as ex:
+            return self.json_message(str(ex), 503)
+        return self.json({"type": "answer", "sdp": answer_sdp})
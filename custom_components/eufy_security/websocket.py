@@ -2,14 +2,21 @@ import logging
 
 import asyncio
 import aiohttp
+import time
 import traceback
+from itertools import count
 from typing import Any, Coroutine, Text
 from typing import Callable  # noqa pylint: disable=unused-import
 
 from .const import DOMAIN
+from .log import LazyPayload
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
+# lower value is sent first, bulk fetches must not delay user initiated commands
+PRIORITY_CONTROL = 0
+PRIORITY_BULK = 1
+
 
 class EufySecurityWebSocket:
     def __init__(
@@ -22,6 +29,7 @@ class EufySecurityWebSocket:
         message_callback: Callable[[], Coroutine[Any, Any, None]],
         close_callback: Callable[[], Coroutine[Any, Any, None]],
         error_callback: Callable[[Text], Coroutine[Any, Any, None]],
+        rate_limit: float = 0,
     ):
         self.hass = hass
         self.host = host
@@ -36,6 +44,14 @@ class EufySecurityWebSocket:
         self.ws: aiohttp.ClientWebSocketResponse = None
         self.loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
 
+        # single writer task drains outbound queue, rate_limit is messages per second and 0 disables it
+        self.rate_limit: float = rate_limit
+        self.send_queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.send_counter = count()
+        self.writer_task: asyncio.Task = None
+        self.next_send_at: float = 0
+        self.send_metrics: dict = {"sent": 0, "failed": 0, "max_queue_depth": 0, "max_wait": 0.0}
+
     async def set_ws(self):
         while True:
             if self.ws is None or self.ws.closed == True:
@@ -61,7 +77,7 @@ class EufySecurityWebSocket:
             try:
                 await self.on_message(msg)
             except Exception as ex:  # pylint: disable=broad-except
-                _LOGGER.error(f"{DOMAIN} - Exception - process_messages: %s - traceback: %s - message: %s", ex, traceback.format_exc(), msg)
+                _LOGGER.error(f"{DOMAIN} - Exception - process_messages: %s - traceback: %s - message: %s", ex, traceback.format_exc(), LazyPayload(msg))
 
     async def on_message(self, message):
         if self.message_callback is not None:
@@ -79,6 +95,65 @@ class EufySecurityWebSocket:
             self.ws = None
             asyncio.run_coroutine_threadsafe(self.close_callback(), self.loop)
 
-    async def send_message(self, message):
-        _LOGGER.debug(f"{DOMAIN} - WebSocket message sent. %s", message)
-        await self.ws.send_str(message)
+    @property
+    def queue_depth(self) -> int:
+        return self.send_queue.qsize()
+
+    async def send_message(self, message, priority: int = PRIORITY_CONTROL):
+        future: asyncio.Future = self.loop.create_future()
+        self.send_queue.put_nowait((priority, next(self.send_counter), time.monotonic(), message, future))
+        self.send_metrics["max_queue_depth"] = max(self.send_metrics["max_queue_depth"], self.send_queue.qsize())
+        if self.writer_task is None or self.writer_task.done():
+            self.writer_task = self.loop.create_task(self.process_send_queue())
+        await future
+
+    async def process_send_queue(self):
+        while True:
+            burst = 0
+            item = await self.send_queue.get()
+            while True:
+                await self.send_queued_message(*item)
+                burst = burst + 1
+                # keep writing while messages are waiting, one log line per burst
+                if self.send_queue.empty():
+                    break
+                item = self.send_queue.get_nowait()
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("%s - WebSocket messages sent. %s - queue depth %s", DOMAIN, burst, self.send_queue.qsize())
+
+    async def send_queued_message(self, priority: int, sequence: int, queued_at: float, message: str, future: asyncio.Future):
+        try:
+            if self.rate_limit > 0:
+                delay = self.next_send_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.next_send_at = max(self.next_send_at, time.monotonic()) + 1 / self.rate_limit
+            self.send_metrics["max_wait"] = max(self.send_metrics["max_wait"], time.monotonic() - queued_at)
+            if self.ws is None or self.ws.closed == True:
+                raise ConnectionError("WebSocket is not connected")
+            await self.ws.send_str(message)
+            self.send_metrics["sent"] = self.send_metrics["sent"] + 1
+            if not future.done():
+                future.set_result(True)
+        except asyncio.CancelledError:
+            # writer is cancelled on close, sender of message in flight must not wait forever
+            if not future.done():
+                future.set_exception(ConnectionError("WebSocket is closed"))
+            raise
+        except Exception as ex:  # pylint: disable=broad-except
+            self.send_metrics["failed"] = self.send_metrics["failed"] + 1
+            if not future.done():
+                future.set_exception(ex)
+
+    async def async_close(self):
+        # socket is replaced on reconnect or unloaded, its writer and connection must not outlive it
+        self.close_callback = None
+        if not self.writer_task is None:
+            self.writer_task.cancel()
+            self.writer_task = None
+        while self.send_queue.empty() == False:
+            future: asyncio.Future = self.send_queue.get_nowait()[4]
+            if not future.done():
+                future.set_exception(ConnectionError("WebSocket is closed"))
+        if not self.ws is None and self.ws.closed == False:
+            await self.ws.close()